@@ -1,73 +1,101 @@
 
-import mido
 import base64
-import io
+import struct
 
-# Create a new MIDI file with one track
-mid = mido.MidiFile()
-track = mido.MidiTrack()
-mid.tracks.append(track)
+# The file has a fixed shape, so the MIDI bytes are written directly rather
+# than built up from mido messages and re-serialized by MidiFile.save()
 
-# Add program change (instrument selection - trumpet)
-track.append(mido.Message('program_change', program=56, time=0))
-
-# Create a simple melody (Happy Birthday)
-# Note: time is in ticks, 480 ticks = quarter note at default tempo
-
-# Happy
-track.append(mido.Message('note_on', note=67, velocity=100, time=0))
-track.append(mido.Message('note_off', note=67, velocity=64, time=240))
+TICKS_PER_BEAT = 480  # 480 ticks = quarter note at default tempo
 
-# Birth-
-track.append(mido.Message('note_on', note=67, velocity=100, time=0))
-track.append(mido.Message('note_off', note=67, velocity=64, time=240))
+NOTE_ON = 0x90
+NOTE_OFF = 0x80
+PROGRAM_CHANGE = 0xC0
+END_OF_TRACK = b'\xff\x2f\x00'
 
-# -day
-track.append(mido.Message('note_on', note=69, velocity=100, time=0))
-track.append(mido.Message('note_off', note=69, velocity=64, time=480))
 
-# to
-track.append(mido.Message('note_on', note=67, velocity=100, time=0))
-track.append(mido.Message('note_off', note=67, velocity=64, time=480))
+def vlq(value):
+    """Encode a delta time as a MIDI variable-length quantity"""
+    data = bytearray([value & 0x7F])
+    value >>= 7
+    while value:
+        data.insert(0, (value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(data)
 
-# you
-track.append(mido.Message('note_on', note=72, velocity=100, time=0))
-track.append(mido.Message('note_off', note=72, velocity=64, time=480))
 
-# Happy
-track.append(mido.Message('note_on', note=71, velocity=100, time=0))
-track.append(mido.Message('note_off', note=71, velocity=64, time=960))
+def event(delta, status, *data):
+    """A channel message preceded by its delta time, as (delta, status, data)"""
+    return delta, status, bytes(data)
 
-# Add a drum track
-drum_track = mido.MidiTrack()
-mid.tracks.append(drum_track)
 
-# Set drums (channel 9)
-for i in range(4):
-    # Bass drum
-    drum_track.append(mido.Message('note_on', note=36, velocity=100, time=0 if i == 0 else 480, channel=9))
-    drum_track.append(mido.Message('note_off', note=36, velocity=0, time=10, channel=9))
+def track_chunk(events):
+    """Build an MTrk chunk from events, adding the end of track
     
-    # Hi-hat
-    drum_track.append(mido.Message('note_on', note=42, velocity=80, time=230, channel=9))
-    drum_track.append(mido.Message('note_off', note=42, velocity=0, time=10, channel=9))
-    
-    # Snare (on beats 2 and 4)
-    if i % 2 == 1:
-        drum_track.append(mido.Message('note_on', note=38, velocity=100, time=230, channel=9))
-        drum_track.append(mido.Message('note_off', note=38, velocity=0, time=10, channel=9))
-    else:
-        drum_track.append(mido.Message('note_on', note=42, velocity=60, time=230, channel=9))
-        drum_track.append(mido.Message('note_off', note=42, velocity=0, time=10, channel=9))
-
-# End of track
-track.append(mido.MetaMessage('end_of_track', time=0))
-drum_track.append(mido.MetaMessage('end_of_track', time=0))
-
-# Convert to bytes
-buffer = io.BytesIO()
-mid.save(file=buffer)
-midi_data = buffer.getvalue()
+    Uses running status: a status byte is only written when it differs from
+    the previous message's, which saves a byte per message in runs of notes.
+    A note_off with velocity 0 is written as the equivalent note_on with
+    velocity 0, so alternating note_on/note_off runs share one status.
+    """
+    body = bytearray()
+    last_status = None
+    for delta, status, data in events:
+        if status & 0xF0 == NOTE_OFF and data[1] == 0:
+            status = NOTE_ON | (status & 0x0F)
+        body += vlq(delta)
+        if status != last_status:
+            body.append(status)
+            last_status = status
+        body += data
+    body += vlq(0) + END_OF_TRACK
+    return b'MTrk' + struct.pack('>I', len(body)) + bytes(body)
+
+
+# Create a simple melody (Happy Birthday) as (note, length in ticks)
+MELODY = [
+    (67, 240),  # Happy
+    (67, 240),  # Birth-
+    (69, 480),  # -day
+    (67, 480),  # to
+    (72, 480),  # you
+    (71, 960),  # Happy
+]
+
+# Add program change (instrument selection - trumpet)
+melody_events = [event(0, PROGRAM_CHANGE, 56)]
+for note, length in MELODY:
+    melody_events.append(event(0, NOTE_ON, note, 100))
+    melody_events.append(event(length, NOTE_OFF, note, 64))
+
+# Add a drum track (channel 9)
+DRUMS = 9
+HIT_LENGTH = 10  # ticks from each drum hit to its note_off
+
+# One bar of drums as (delta ticks, note, velocity) hits: bass drum, hi-hat,
+# then a quiet hi-hat, or a snare on beats 2 and 4
+BASS_DRUM, SNARE, HI_HAT = 36, 38, 42
+HAT_BAR = [(480, BASS_DRUM, 100), (230, HI_HAT, 80), (230, HI_HAT, 60)]
+SNARE_BAR = [(480, BASS_DRUM, 100), (230, HI_HAT, 80), (230, SNARE, 100)]
+
+
+def drum_bar(hits, first_delta=None):
+    """Build a bar of drum hit events, optionally overriding the first hit's delta"""
+    if first_delta is not None:
+        hits = [(first_delta,) + hits[0][1:]] + hits[1:]
+    events = []
+    for delta, note, velocity in hits:
+        events.append(event(delta, NOTE_ON | DRUMS, note, velocity))
+        events.append(event(HIT_LENGTH, NOTE_OFF | DRUMS, note, 0))
+    return events
+
+
+# Each bar's events are built once and repeated; the opening bass drum is at time 0
+hat_bar = drum_bar(HAT_BAR)
+snare_bar = drum_bar(SNARE_BAR)
+drum_events = drum_bar(HAT_BAR, first_delta=0) + snare_bar + hat_bar + snare_bar
+
+# Header: format 1, two tracks
+header = b'MThd' + struct.pack('>IHHH', 6, 1, 2, TICKS_PER_BEAT)
+midi_data = header + track_chunk(melody_events) + track_chunk(drum_events)
 
 # Convert to base64
 base64_data = base64.b64encode(midi_data).decode('utf-8')
@@ -3,19 +3,20 @@
 """
 Example script to play a C major scale using the MCP MIDI server
 """
+import asyncio
 import json
-import requests
-import time
+
+import httpx
 
 # Server configuration
 SERVER_URL = "http://127.0.0.1:8080"
-MCP_ENDPOINT = f"{SERVER_URL}/mcp"
+MCP_ENDPOINT = "/mcp"
 
 # C major scale notes (MIDI numbers)
 C_MAJOR_SCALE = [60, 62, 64, 65, 67, 69, 71, 72]
 
 
-def send_mcp_request(method: str, params: dict):
+async def send_mcp_request(client: httpx.AsyncClient, method: str, params: dict):
     """Send an MCP request to the server"""
     payload = {
         "jsonrpc": "2.0",
@@ -24,72 +25,80 @@ def send_mcp_request(method: str, params: dict):
         "params": params
     }
     
-    response = requests.post(MCP_ENDPOINT, json=payload)
+    response = await client.post(MCP_ENDPOINT, json=payload)
     return response.json()
 
 
-def play_note(note, duration=0.5, velocity=80, channel=0):
-    """Play a note for a specific duration"""
-    # Send note_on
-    send_mcp_request("midi.note_on", {
-        "note": note,
-        "velocity": velocity,
-        "channel": channel
-    })
+async def send_mcp_batch(client: httpx.AsyncClient, calls):
+    """Send several MCP requests to the server in a single JSON-RPC batch"""
+    payload = [
+        {
+            "jsonrpc": "2.0",
+            "id": f"example-{i}",
+            "method": method,
+            "params": params
+        }
+        for i, (method, params) in enumerate(calls, start=1)
+    ]
     
-    # Wait for the specified duration
-    time.sleep(duration)
+    response = await client.post(MCP_ENDPOINT, json=payload)
+    return response.json()
+
+
+def note_events(notes, start=0.0, duration=0.5, velocity=80, channel=0):
+    """Build timestamped note_on/note_off events for notes played one after another
     
-    # Send note_off
-    send_mcp_request("midi.note_off", {
-        "note": note,
-        "channel": channel
-    })
+    Returns the events and the time at which the last note ends.
+    """
+    events = []
+    t = start
+    for note in notes:
+        events.append({"t": t, "type": "note_on", "note": note, "velocity": velocity, "channel": channel})
+        events.append({"t": t + duration, "type": "note_off", "note": note, "channel": channel})
+        t += duration
+    return events, t
 
 
-def main():
+async def main():
     """Main function"""
-    # List available MIDI ports
-    response = send_mcp_request("midi.discover", {})
-    print("Available MIDI ports:")
-    for port in response.get("result", {}).get("ports", []):
-        print(f"- [{port['id']}] {port['name']}")
-    
-    # Connect to the first port (default)
-    port_id = 0
-    print(f"\nConnecting to port {port_id}...")
-    send_mcp_request("midi.connect", {"port_id": port_id})
-    
-    # Set instrument to Acoustic Grand Piano (program 0)
-    print("Setting instrument to Acoustic Grand Piano...")
-    send_mcp_request("midi.program_change", {"program": 0, "channel": 0})
-    
-    # Play the C major scale ascending
-    print("\nPlaying C major scale ascending...")
-    for note in C_MAJOR_SCALE:
-        print(f"Playing note {note}")
-        play_note(note)
-    
-    # Play the C major scale descending
-    print("\nPlaying C major scale descending...")
-    for note in reversed(C_MAJOR_SCALE):
-        print(f"Playing note {note}")
-        play_note(note)
-    
-    # Play a C major chord
-    print("\nPlaying C major chord...")
-    send_mcp_request("midi.note_on", {"note": 60, "velocity": 80, "channel": 0})
-    send_mcp_request("midi.note_on", {"note": 64, "velocity": 80, "channel": 0})
-    send_mcp_request("midi.note_on", {"note": 67, "velocity": 80, "channel": 0})
-    
-    time.sleep(1.0)
-    
-    send_mcp_request("midi.note_off", {"note": 60, "channel": 0})
-    send_mcp_request("midi.note_off", {"note": 64, "channel": 0})
-    send_mcp_request("midi.note_off", {"note": 67, "channel": 0})
+    # One client for the whole run, so every request reuses the same connection
+    async with httpx.AsyncClient(base_url=SERVER_URL) as client:
+        # List available MIDI ports while connecting to the first port (default)
+        # and setting up the instrument, as neither depends on the other
+        port_id = 0
+        print(f"Connecting to port {port_id}...")
+        print("Setting instrument to Acoustic Grand Piano...")
+        response, _ = await asyncio.gather(
+            send_mcp_request(client, "midi.discover", {}),
+            send_mcp_batch(client, [
+                ("midi.connect", {"port_id": port_id}),
+                ("midi.program_change", {"program": 0, "channel": 0}),  # Acoustic Grand Piano
+            ]),
+        )
+        
+        print("\nAvailable MIDI ports:")
+        for port in response.get("result", {}).get("ports", []):
+            print(f"- [{port['id']}] {port['name']}")
+        
+        # Schedule the C major scale ascending then descending in a single request,
+        # so the server handles the note timing rather than our own sleeps
+        print("\nPlaying C major scale ascending and descending...")
+        events, end_time = note_events(C_MAJOR_SCALE + C_MAJOR_SCALE[::-1])
+        await send_mcp_request(client, "midi.schedule", {"events": events, "port_id": port_id})
+        
+        # Wait for the scale to finish
+        await asyncio.sleep(end_time)
+        
+        # Play a C major chord
+        print("\nPlaying C major chord...")
+        await send_mcp_request(client, "midi.chord_on", {"notes": [60, 64, 67], "velocity": 80, "channel": 0})
+        
+        await asyncio.sleep(1.0)
+        
+        await send_mcp_request(client, "midi.chord_off", {"notes": [60, 64, 67], "channel": 0})
     
     print("\nDone!")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
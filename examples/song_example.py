@@ -18,32 +18,35 @@ import mido
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('song_example')
 
+# One reusable message per type; midi_callback updates the fields in place
+# rather than constructing a new mido.Message for every event
+_NOTE_ON = mido.Message('note_on')
+_NOTE_OFF = mido.Message('note_off', velocity=0)
+_PROGRAM_CHANGE = mido.Message('program_change')
+_CONTROL_CHANGE = mido.Message('control_change')
+
 def midi_callback(message_type, params):
     """Send MIDI messages to the output port"""
     try:
         if message_type == "note_on":
-            msg = mido.Message('note_on', 
-                              note=params.get("note", 60), 
-                              velocity=params.get("velocity", 64), 
-                              channel=params.get("channel", 0))
+            msg = _NOTE_ON
+            msg.note = params.get("note", 60)
+            msg.velocity = params.get("velocity", 64)
         elif message_type == "note_off":
-            msg = mido.Message('note_off', 
-                              note=params.get("note", 60), 
-                              velocity=0, 
-                              channel=params.get("channel", 0))
+            msg = _NOTE_OFF
+            msg.note = params.get("note", 60)
         elif message_type == "program_change":
-            msg = mido.Message('program_change', 
-                              program=params.get("program", 0), 
-                              channel=params.get("channel", 0))
+            msg = _PROGRAM_CHANGE
+            msg.program = params.get("program", 0)
         elif message_type == "control_change":
-            msg = mido.Message('control_change', 
-                              control=params.get("control", 0),
-                              value=params.get("value", 0),
-                              channel=params.get("channel", 0))
+            msg = _CONTROL_CHANGE
+            msg.control = params.get("control", 0)
+            msg.value = params.get("value", 0)
         else:
             logger.warning(f"Unknown message type: {message_type}")
             return False
         
+        msg.channel = params.get("channel", 0)
         midi_out.send(msg)
         return True
     except Exception as e:
@@ -106,18 +109,15 @@ async def create_and_play_song():
     songs = manager.get_all_songs()
     logger.info(f"Available songs: {', '.join(songs.keys())}")
     
-    # Play each song
+    # Play each song, waiting for it to finish before starting the next
     logger.info("Playing scale song...")
-    manager.play_song("C Major Scale")
-    await asyncio.sleep(scale_song.duration + 1)  # Wait for the song to finish
+    await manager.play_song_async(scale_song.name)
     
     logger.info("Playing chord progression...")
-    manager.play_song("Simple Progression")
-    await asyncio.sleep(chord_song.duration + 1)  # Wait for the song to finish
+    await manager.play_song_async(chord_song.name)
     
     logger.info("Playing custom melody...")
-    manager.play_song("Custom Melody")
-    await asyncio.sleep(melody.duration + 1)  # Wait for the song to finish
+    await manager.play_song_async(melody.name)
 
 async def main():
     """Main entry point"""
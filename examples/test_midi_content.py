@@ -1,7 +1,9 @@
 
-import requests
+import asyncio
+import base64
 import json
-import time
+
+import httpx
 
 # Base URL of the MCP-MIDI server
 BASE_URL = "http://localhost:8080"
@@ -9,10 +11,18 @@ BASE_URL = "http://localhost:8080"
 # The base64-encoded MIDI data from our generate_midi.py script
 MIDI_DATA = """TVRoZAAAAAYAAQACAeBNVHJrAAAAPQDAOACQQ2SBcIBDQACQQ2SBcIBDQACQRWSDYIBFQACQQ2SDYIBDQACQSGSDYIBIQACQR2SHQIBHQAD/LwBNVHJrAAAAbwCZJGQKiSQAgWaZKlAKiSoAgWaZKjwKiSoAg2CZJGQKiSQAgWaZKlAKiSoAgWaZJmQKiSYAg2CZJGQKiSQAgWaZKlAKiSoAgWaZKjwKiSoAg2CZJGQKiSQAgWaZKlAKiSoAgWaZJmQKiSYAAP8vAA=="""
 
-def main():
+# Decoded once, and uploaded as raw bytes rather than base64 inside JSON
+MIDI_BYTES = base64.b64decode(MIDI_DATA)
+
+async def main():
+    # One client for the whole run, so every request reuses the same connection
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+        await run(client)
+
+async def run(client):
     # Step 1: Check if the server is running
     try:
-        response = requests.get(f"{BASE_URL}/midi/ports")
+        response = await client.get("/midi/ports")
         if response.status_code != 200:
             print("Server not responding correctly. Is it running?")
             return
@@ -24,27 +34,29 @@ def main():
         
         print(f"Found {len(ports)} MIDI ports: {ports}")
         
-        # Step 2: Connect to the first available MIDI port
+        # Step 2 and 3: Connect to the first available MIDI port and load the
+        # MIDI content; these don't depend on each other so run them together
         port_id = ports[0]["id"]
-        response = requests.post(f"{BASE_URL}/midi/connect/{port_id}")
-        if response.status_code != 200:
+        connect_response, load_response = await asyncio.gather(
+            client.post(f"/midi/connect/{port_id}"),
+            client.post(
+                "/midi/load_binary",
+                params={"name": "Happy Birthday"},
+                content=MIDI_BYTES,
+                headers={"Content-Type": "application/octet-stream"}
+            ),
+        )
+        if connect_response.status_code != 200:
             print(f"Failed to connect to MIDI port {port_id}")
             return
         
         print(f"Connected to MIDI port {port_id}")
         
-        # Step 3: Load the MIDI content
-        payload = {
-            "data": MIDI_DATA,
-            "name": "Happy Birthday"
-        }
-        
-        response = requests.post(f"{BASE_URL}/midi/load_content", json=payload)
-        if response.status_code != 200:
-            print(f"Failed to load MIDI content: {response.text}")
+        if load_response.status_code != 200:
+            print(f"Failed to load MIDI content: {load_response.text}")
             return
         
-        print(f"Loaded MIDI content: {response.json()}")
+        print(f"Loaded MIDI content: {load_response.json()}")
         
         # Step 4: Play the MIDI file
         payload = {
@@ -52,7 +64,7 @@ def main():
             "port_id": port_id
         }
         
-        response = requests.post(f"{BASE_URL}/midi/play_file", json=payload)
+        response = await client.post("/midi/play_file", json=payload)
         if response.status_code != 200:
             print(f"Failed to play MIDI file: {response.text}")
             return
@@ -61,10 +73,10 @@ def main():
         
         # Wait for the music to finish (approximately)
         print("Waiting for the music to finish...")
-        time.sleep(10)
+        await asyncio.sleep(10)
         
         # Step 5: Stop any remaining notes
-        response = requests.post(f"{BASE_URL}/midi/all_notes_off")
+        response = await client.post("/midi/all_notes_off")
         
         print("Test completed successfully!")
     
@@ -72,4 +84,4 @@ def main():
         print(f"Error occurred: {e}")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -4,6 +4,10 @@ Emergency script to turn off all MIDI notes
 """
 import rtmidi
 
+# Raw "All Notes Off" (CC 123) messages for every channel, then "All Sound Off" (CC 120)
+RESET_MESSAGES = [bytes((0xB0 | channel, control, 0))
+                  for control in (123, 120) for channel in range(16)]
+
 # Create a MIDI output object
 midi_out = rtmidi.MidiOut()
 
@@ -16,15 +20,11 @@ if ports:
     midi_out.open_port(0)
     print(f"Connected to: {ports[0]}")
     
-    # Send "All Notes Off" message on all 16 MIDI channels
-    for channel in range(16):
-        midi_out.send_message([0xB0 | channel, 123, 0])
-        print(f"Sent All Notes Off to channel {channel+1}")
-    
-    # Also send All Sound Off for good measure
-    for channel in range(16):
-        midi_out.send_message([0xB0 | channel, 120, 0])
-        print(f"Sent All Sound Off to channel {channel+1}")
+    # Send All Notes Off, then All Sound Off for good measure, on all 16 channels
+    # (rtmidi takes one message per send_message call)
+    for message in RESET_MESSAGES:
+        midi_out.send_message(message)
+    print("Sent All Notes Off and All Sound Off to channels 1-16")
     
     # Close the port
     midi_out.close_port()
@@ -2,28 +2,24 @@
 """
 Clean up lock files in the project
 """
-import os
 import sys
+from pathlib import Path
 
 def main():
     """Main entry point"""
-    # Change to the project root directory
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    os.chdir(project_root)
+    # Lock files live in the project root, one level above this script
+    project_root = Path(__file__).resolve().parent.parent
     
     print("Cleaning up lock files...")
     
-    # Remove old lockfile
-    if os.path.exists("uv.lock"):
-        print("Removing old uv.lock file...")
-        os.remove("uv.lock")
-        print("Old lockfile removed")
-    
-    if os.path.exists("uv.lock.old"):
-        print("Removing old uv.lock.old file...")
-        os.remove("uv.lock.old")
-        print("Old backup lockfile removed")
+    # Remove old lockfiles with a single unlink() each, skipping any that are missing
+    for name in ("uv.lock", "uv.lock.old"):
+        lockfile = project_root / name
+        try:
+            lockfile.unlink()
+            print(f"Removed old {name} file")
+        except FileNotFoundError:
+            pass
     
     print("\nLockfiles removed; to regenerate the lockfile, run:")
     print("uv pip compile -o uv.lock pyproject.toml")
@@ -2,8 +2,27 @@
 """
 Simple test script to send MIDI notes to Deluge
 """
+import logging
 import time
-import rtmidi
+
+# Per-note messages are logged at DEBUG, so normal runs don't write to the
+# terminal between MIDI sends
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger("deluge_test")
+
+# Status bytes per channel byte (0-15), so sending a note is a lookup
+_NOTE_ON = tuple(0x90 | c for c in range(16))
+_NOTE_OFF = tuple(0x80 | c for c in range(16))
+_PROGRAM_CHANGE = tuple(0xC0 | c for c in range(16))
+
+# Reused for every note message and filled in place before each send
+_note_message = bytearray(3)
+
+def sleep_until(deadline):
+    """Sleep until a time.monotonic() deadline (returns at once if it has passed)"""
+    remaining = deadline - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
 
 def play_note(midi_out, note, velocity=80, duration=0.5, channel=1):
     # Channel in MIDI is 0-15, but users often think of channels as 1-16
@@ -11,29 +30,37 @@ def play_note(midi_out, note, velocity=80, duration=0.5, channel=1):
     
     # Note On message: [Status byte, Note number, Velocity]
     # Status byte: 0x90 for Note On on channel 1, add channel_byte for other channels
-    note_on = [0x90 | channel_byte, note, velocity]
-    midi_out.send_message(note_on)
-    print(f"Note On: {note} on channel {channel} with velocity {velocity}")
+    _note_message[0] = _NOTE_ON[channel_byte]
+    _note_message[1] = note
+    _note_message[2] = velocity
+    midi_out.send_message(_note_message)
+    note_on_time = time.monotonic()
+    logger.debug("Note On: %d on channel %d with velocity %d", note, channel, velocity)
     
-    # Wait for duration
-    time.sleep(duration)
+    # Wait for duration, measured from when the note was sent
+    sleep_until(note_on_time + duration)
     
     # Note Off message: [Status byte, Note number, 0]
     # Status byte: 0x80 for Note Off on channel 1, add channel_byte for other channels
-    note_off = [0x80 | channel_byte, note, 0]
-    midi_out.send_message(note_off)
-    print(f"Note Off: {note} on channel {channel}")
+    _note_message[0] = _NOTE_OFF[channel_byte]
+    _note_message[1] = note
+    _note_message[2] = 0
+    midi_out.send_message(_note_message)
+    logger.debug("Note Off: %d on channel %d", note, channel)
 
 def set_program(midi_out, program, channel=1):
     channel_byte = max(0, min(15, channel - 1))
     
     # Program Change message: [Status byte, Program number]
     # Status byte: 0xC0 for Program Change on channel 1, add channel_byte for other channels
-    program_change = [0xC0 | channel_byte, program]
+    program_change = (_PROGRAM_CHANGE[channel_byte], program)
     midi_out.send_message(program_change)
     print(f"Program Change: {program} on channel {channel}")
 
 def main():
+    # Imported here so loading this module doesn't load the rtmidi extension
+    import rtmidi
+    
     # Create a MIDI output object
     midi_out = rtmidi.MidiOut()
     
@@ -58,9 +85,12 @@ def main():
         
         # Play a simple scale on channel 1
         print("Playing C major scale...")
-        for note in [60, 62, 64, 65, 67, 69, 71, 72]:  # C4 to C5
+        # Each note starts at a fixed offset from the start of the scale, so time
+        # spent sending doesn't accumulate as drift
+        start_time = time.monotonic()
+        for i, note in enumerate([60, 62, 64, 65, 67, 69, 71, 72]):  # C4 to C5
+            sleep_until(start_time + i * 0.4)  # 0.3s note plus a small gap
             play_note(midi_out, note, velocity=80, duration=0.3, channel=1)
-            time.sleep(0.1)  # Small gap between notes
         
         # Play a chord
         print("Playing C major chord...")
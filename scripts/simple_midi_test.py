@@ -5,6 +5,12 @@ Very simple test script for MIDI output
 import time
 import rtmidi
 
+# Messages are fixed, so build them once: program change to synth lead (80),
+# then note on/off for C4 (60) on channel 1
+PROGRAM_CHANGE = bytes((0xC0, 80))
+NOTE_ON = bytes((0x90, 60, 100))
+NOTE_OFF = bytes((0x80, 60, 0))
+
 # Create a MIDI output object
 midi_out = rtmidi.MidiOut()
 
@@ -19,15 +25,15 @@ if ports:
     
     try:
         # Set to a synth sound (program change: channel 1, program 80)
-        midi_out.send_message([0xC0, 80])
+        midi_out.send_message(PROGRAM_CHANGE)
         print("Sent program change to synth lead (80) on channel 1")
         time.sleep(0.1)
         
         # Play a simple C note (channel 1, note C4, velocity 100)
         print("Playing C4 note...")
-        midi_out.send_message([0x90, 60, 100])  # Note On: channel 1, C4 (60), velocity 100
+        midi_out.send_message(NOTE_ON)  # Note On: channel 1, C4 (60), velocity 100
         time.sleep(1.0)  # Play for 1 second
-        midi_out.send_message([0x80, 60, 0])    # Note Off: channel 1, C4 (60)
+        midi_out.send_message(NOTE_OFF)  # Note Off: channel 1, C4 (60)
         print("Note off.")
         
     finally:
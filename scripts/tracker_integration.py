@@ -25,10 +25,9 @@ def load_tracker_file(path, name=None):
         return f"Error: File {path} does not exist"
     
     try:
+        # Parse the tracker file as it is read, rather than reading it all first
         with open(path, 'r') as f:
-            content = f.read()
-        
-        song = parse_tracker_file(content)
+            song = parse_tracker_file(f)
         
         if name is None:
             name = os.path.basename(path).replace('.', '_')
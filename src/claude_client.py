@@ -5,12 +5,52 @@ import json
 import logging
 import re
 import requests
-from typing import Dict, Any, List, Optional, Union
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library is used without it
+    orjson = None
 
 logger = logging.getLogger("claude_client")
 
-# Regex pattern for MIDI command extraction
-MIDI_COMMAND_PATTERN = r"```midi\s+(.*?)```"
+# Regex for MIDI command extraction, compiled once at import
+MIDI_COMMAND_RE = re.compile(r"```midi\s+(.*?)```", re.DOTALL)
+
+# Commands are sent in batches of at most this many, so a long response starts
+# playing before all of its commands have been parsed
+MIDI_BATCH_SIZE = 32
+
+# Command type -> (MCP method, parameter names, parameter defaults)
+# Every parameter has a default, so a command merged over its defaults can be
+# subscripted directly
+MIDI_COMMAND_HANDLERS = {
+    "note_on": ("midi.note_on", ("note", "velocity", "channel", "port_id"),
+                {"note": None, "velocity": 64, "channel": 0, "port_id": 0}),
+    "note_off": ("midi.note_off", ("note", "velocity", "channel", "port_id"),
+                 {"note": None, "velocity": 0, "channel": 0, "port_id": 0}),
+    "program_change": ("midi.program_change", ("program", "channel", "port_id"),
+                       {"program": 0, "channel": 0, "port_id": 0}),
+    "control_change": ("midi.control_change", ("control", "value", "channel", "port_id"),
+                       {"control": 0, "value": 0, "channel": 0, "port_id": 0}),
+    "discover": ("midi.discover", (), {}),
+    "connect": ("midi.connect", ("port_id",), {"port_id": 0}),
+}
+
+
+def dumps_json(payload: Any) -> bytes:
+    """Serialize a JSON-RPC payload straight to the bytes sent on the wire"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(data: Union[str, bytes]) -> Any:
+    """Parse a JSON-RPC response body"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 class ClaudeClient:
@@ -25,29 +65,40 @@ class ClaudeClient:
         self.mcp_server_url = mcp_server_url
         self.mcp_endpoint = f"{mcp_server_url}/mcp"
         self.request_id = 0
+        
+        # Reuse connections to the server across requests (HTTP keep-alive)
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        # Payloads are serialized by dumps_json and posted as raw bytes
+        self.session.headers["Content-Type"] = "application/json"
     
-    def extract_midi_commands(self, text: str) -> List[Dict[str, Any]]:
-        """Extract MIDI commands from Claude's response
+    def iter_midi_commands(self, text: str) -> Iterator[Dict[str, Any]]:
+        """Parse MIDI commands from Claude's response one block at a time
         
         Args:
             text: Claude's response text
             
-        Returns:
-            List of parsed MIDI commands
+        Yields:
+            Parsed MIDI commands, in the order they appear
         """
-        commands = []
-        matches = re.finditer(MIDI_COMMAND_PATTERN, text, re.DOTALL)
-        
-        for match in matches:
+        for match in MIDI_COMMAND_RE.finditer(text):
             command_text = match.group(1).strip()
             try:
-                command = json.loads(command_text)
-                commands.append(command)
-            except json.JSONDecodeError as e:
+                yield loads_json(command_text)
+            except ValueError as e:
                 logger.error(f"Failed to parse MIDI command: {e}")
                 logger.debug(f"Command text: {command_text}")
+    
+    def extract_midi_commands(self, text: str) -> List[Dict[str, Any]]:
+        """Extract MIDI commands from Claude's response
         
-        return commands
+        Args:
+            text: Claude's response text
+            
+        Returns:
+            List of parsed MIDI commands
+        """
+        return list(self.iter_midi_commands(text))
     
     def send_mcp_request(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """Send an MCP request to the server
@@ -69,67 +120,65 @@ class ClaudeClient:
             "params": params
         }
         
-        response = requests.post(self.mcp_endpoint, json=payload)
-        return response.json()
+        response = self.session.post(self.mcp_endpoint, data=dumps_json(payload))
+        return loads_json(response.content)
+    
+    def send_mcp_batch(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Send several MCP requests to the server as one JSON-RPC batch
+        
+        Args:
+            calls: List of (method, params) tuples
+            
+        Returns:
+            Server responses, in the same order as ``calls``
+        """
+        if not calls:
+            return []
+        
+        payload = []
+        for method, params in calls:
+            self.request_id += 1
+            payload.append({
+                "jsonrpc": "2.0",
+                "id": f"claude-{self.request_id}",
+                "method": method,
+                "params": params
+            })
+        
+        response = self.session.post(self.mcp_endpoint, data=dumps_json(payload))
+        
+        # Batch responses may come back in any order, so match them up by id
+        responses = {item.get("id"): item for item in loads_json(response.content)}
+        return [responses.get(request["id"], {}) for request in payload]
     
     def process_claude_response(self, response_text: str) -> List[Dict[str, Any]]:
         """Process Claude's response and execute any MIDI commands
         
+        Commands are parsed as they are reached and sent to the server in
+        batch requests of up to MIDI_BATCH_SIZE commands, so the first batch
+        goes out before the rest of the response has been parsed.
+        
         Args:
             response_text: Claude's response text
             
         Returns:
             List of results from executed commands
         """
-        commands = self.extract_midi_commands(response_text)
         results = []
+        calls = []
         
-        for cmd in commands:
-            cmd_type = cmd.get("type", "")
-            
-            if cmd_type == "note_on":
-                result = self.send_mcp_request("midi.note_on", {
-                    "note": cmd.get("note"),
-                    "velocity": cmd.get("velocity", 64),
-                    "channel": cmd.get("channel", 0),
-                    "port_id": cmd.get("port_id", 0)
-                })
-                results.append(result)
-            
-            elif cmd_type == "note_off":
-                result = self.send_mcp_request("midi.note_off", {
-                    "note": cmd.get("note"),
-                    "velocity": cmd.get("velocity", 0),
-                    "channel": cmd.get("channel", 0),
-                    "port_id": cmd.get("port_id", 0)
-                })
-                results.append(result)
-            
-            elif cmd_type == "program_change":
-                result = self.send_mcp_request("midi.program_change", {
-                    "program": cmd.get("program", 0),
-                    "channel": cmd.get("channel", 0),
-                    "port_id": cmd.get("port_id", 0)
-                })
-                results.append(result)
-            
-            elif cmd_type == "control_change":
-                result = self.send_mcp_request("midi.control_change", {
-                    "control": cmd.get("control", 0),
-                    "value": cmd.get("value", 0),
-                    "channel": cmd.get("channel", 0),
-                    "port_id": cmd.get("port_id", 0)
-                })
-                results.append(result)
+        for cmd in self.iter_midi_commands(response_text):
+            handler = MIDI_COMMAND_HANDLERS.get(cmd.get("type", ""))
+            if handler is None:
+                continue
             
-            elif cmd_type == "discover":
-                result = self.send_mcp_request("midi.discover", {})
-                results.append(result)
+            method, param_names, defaults = handler
+            normalized = {**defaults, **cmd}
+            calls.append((method, {name: normalized[name] for name in param_names}))
             
-            elif cmd_type == "connect":
-                result = self.send_mcp_request("midi.connect", {
-                    "port_id": cmd.get("port_id", 0)
-                })
-                results.append(result)
+            if len(calls) >= MIDI_BATCH_SIZE:
+                results.extend(self.send_mcp_batch(calls))
+                calls = []
         
+        results.extend(self.send_mcp_batch(calls))
         return results
@@ -3,17 +3,17 @@
 Main entry point for the MCP MIDI project
 """
 import argparse
+import asyncio
 import logging
-import multiprocessing
 import os
 import signal
 import sys
-import time
-from typing import Dict, List, Optional, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Any
 
-from claude_client import ClaudeClient
-import uvicorn
-from server import app
+# The server, uvicorn and the Claude client are imported where they are used,
+# so --help and argument errors don't pay for loading them (and rtmidi)
+if TYPE_CHECKING:
+    import uvicorn
 
 # Configure logging
 logging.basicConfig(
@@ -23,24 +23,52 @@ logging.basicConfig(
 logger = logging.getLogger("mcp_midi_main")
 
 # Global state
-server_process = None
 claude_client = None
 
 
-def start_server(host: str, port: int, debug: bool = False):
-    """Start the MCP MIDI server in a separate process
+def create_server(host: str, port: int, debug: bool = False) -> "uvicorn.Server":
+    """Create the MCP MIDI server to run in this process
     
     Args:
         host: Host to bind to
         port: Port to bind to
         debug: Enable debug mode
     """
+    import uvicorn
+    from server import app
+    
     if debug:
         log_level = "debug"
     else:
         log_level = "info"
     
-    uvicorn.run(app, host=host, port=port, log_level=log_level)
+    config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+    return uvicorn.Server(config)
+
+
+async def run(args: argparse.Namespace):
+    """Run the server, and the Claude client unless disabled, in one event loop"""
+    global claude_client
+    
+    server = create_server(args.host, args.port, args.debug)
+    
+    if args.mcp_mode:
+        # MCP mode for Claude Desktop integration
+        logger.info(f"MCP MIDI Server running in MCP mode at http://{args.host}:{args.port}")
+        logger.info("Ready for Claude Desktop integration")
+    elif not args.server_only:
+        # Initialize Claude client
+        from claude_client import ClaudeClient
+        claude_client = ClaudeClient(f"http://{args.host}:{args.port}")
+        
+        # Example of Claude client usage
+        logger.info("MCP MIDI Bridge is running")
+        logger.info("Claude can now send MIDI commands via formatted code blocks")
+    else:
+        logger.info(f"MCP MIDI Server running at http://{args.host}:{args.port}")
+    
+    # Serves until the server is shut down (e.g. Ctrl+C)
+    await server.serve()
 
 
 def main():
@@ -60,41 +88,12 @@ def main():
     if args.debug:
         logger.setLevel(logging.DEBUG)
     
-    # Run the server in a separate process
-    server_process = multiprocessing.Process(
-        target=start_server,
-        args=(args.host, args.port, args.debug)
-    )
-    server_process.start()
-    
     try:
-        if args.mcp_mode:
-            # MCP mode for Claude Desktop integration
-            logger.info(f"MCP MIDI Server running in MCP mode at http://{args.host}:{args.port}")
-            logger.info("Ready for Claude Desktop integration")
-            server_process.join()
-        elif not args.server_only:
-            # Initialize Claude client
-            claude_client = ClaudeClient(f"http://{args.host}:{args.port}")
-            
-            # Example of Claude client usage
-            logger.info("MCP MIDI Bridge is running")
-            logger.info("Claude can now send MIDI commands via formatted code blocks")
-            
-            # Keep the main process running
-            while True:
-                time.sleep(1)
-        else:
-            # Keep the main process running in server-only mode
-            logger.info(f"MCP MIDI Server running at http://{args.host}:{args.port}")
-            server_process.join()
-    
+        asyncio.run(run(args))
     except KeyboardInterrupt:
-        logger.info("Shutting down...")
+        pass
     finally:
-        if server_process and server_process.is_alive():
-            server_process.terminate()
-            server_process.join()
+        logger.info("Shutting down...")
 
 
 if __name__ == "__main__":
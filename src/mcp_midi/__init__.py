@@ -1,7 +1,9 @@
 from . import server
 from .song import song, manager
 from . import all_notes_off
+from . import messages
 from . import midi_file
+from . import smf
 from . import tracker_interface
 import asyncio
 
@@ -12,4 +14,4 @@ def main():
 
 
 # Expose important items at package level
-__all__ = ["main", "server", "song", "all_notes_off", "midi_file", "tracker_interface"]
+__all__ = ["main", "server", "song", "all_notes_off", "messages", "midi_file", "smf", "tracker_interface"]
@@ -3,75 +3,106 @@ MIDI All Notes Off Utility
 Provides functionality to ensure no notes are left hanging
 """
 import logging
-from typing import Optional, Callable, List, Dict
+from typing import Optional, Callable, List
 
 import mido
 
+from . import messages
+
 logger = logging.getLogger("mcp_midi.all_notes_off")
 
-# Track active notes per channel
-active_notes: Dict[int, List[int]] = {}
-for channel in range(16):
-    active_notes[channel] = []
+# Track active notes per channel, as a bitset with bit n set while note n is on.
+# Only touched from the event loop (port writer threads never register notes
+# or run all_notes_off), so the read-modify-writes need no lock
+active_notes: List[int] = [0] * 16
 
 def register_note_on(note: int, channel: int = 0):
-    """Register a note as active to track it"""
-    if note not in active_notes[channel]:
-        active_notes[channel].append(note)
-        logger.debug(f"Registered note {note} on channel {channel}")
+    """Register a note as active to track it
+    
+    Notes or channels outside the MIDI range are ignored: they can't be
+    sent, so all_notes_off couldn't turn them off either.
+    """
+    if not (0 <= note <= 127 and 0 <= channel <= 15):
+        return
+    bit = 1 << note
+    if active_notes[channel] & bit:
+        return
+    active_notes[channel] |= bit
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Registered note %d on channel %d", note, channel)
 
 def register_note_off(note: int, channel: int = 0):
     """Unregister a note when it's turned off"""
-    if note in active_notes[channel]:
-        active_notes[channel].remove(note)
-        logger.debug(f"Unregistered note {note} on channel {channel}")
+    if not (0 <= note <= 127 and 0 <= channel <= 15):
+        return
+    bit = 1 << note
+    if not active_notes[channel] & bit:
+        return
+    active_notes[channel] &= ~bit
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Unregistered note %d on channel %d", note, channel)
 
 def all_notes_off(midi_port: Optional[mido.ports.BaseOutput] = None, 
                  send_midi_callback: Optional[Callable] = None,
-                 channels: List[int] = None):
+                 channels: List[int] = None,
+                 send_midi_batch_callback: Optional[Callable] = None):
     """Send note_off messages for all active notes
     
     Args:
         midi_port: The MIDI port to send messages to (direct)
         send_midi_callback: Function to send MIDI messages (API-based)
         channels: List of channels to clear (default: all channels)
+        send_midi_batch_callback: Function to send a list of (type, params)
+            MIDI messages in one call; used instead of send_midi_callback
     """
+    if not midi_port and not send_midi_callback and not send_midi_batch_callback:
+        return
+    
     if channels is None:
         channels = list(range(16))  # Default to all 16 MIDI channels
     
-    logger.info(f"Sending all notes off for channels: {channels}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Sending all notes off for channels: %s", channels)
+    
+    # With a batch callback, messages are collected and sent in one call
+    batch = [] if send_midi_batch_callback else None
     
     for channel in channels:
-        # Method 1: Send note_off for each active note we're tracking
-        notes_to_turn_off = active_notes[channel].copy()
-        for note in notes_to_turn_off:
+        # Method 1: Send note_off for each active note we're tracking, lowest
+        # note first, clearing the channel's bits as we take them
+        bits = active_notes[channel]
+        active_notes[channel] = 0
+        while bits:
+            note = (bits & -bits).bit_length() - 1
+            bits &= bits - 1
+            
             if midi_port:
-                msg = mido.Message('note_off', note=note, velocity=0, channel=channel)
-                midi_port.send(msg)
+                midi_port.send(messages.note_off(note, 0, channel))
             
-            if send_midi_callback:
+            if batch is not None:
+                batch.append(("note_off", {"note": note, "velocity": 0, "channel": channel}))
+            elif send_midi_callback:
                 send_midi_callback("note_off", {
                     "note": note,
                     "velocity": 0,
                     "channel": channel
                 })
-            
-            active_notes[channel].remove(note)
         
         # Method 2: Send All Notes Off controller message (CC 123)
         if midi_port:
-            msg = mido.Message('control_change', control=123, value=0, channel=channel)
-            midi_port.send(msg)
+            midi_port.send(messages.ALL_NOTES_OFF[channel])
         
-        if send_midi_callback:
+        if batch is not None:
+            batch.append(("control_change", {"control": 123, "value": 0, "channel": channel}))
+        elif send_midi_callback:
             send_midi_callback("control_change", {
                 "control": 123,  # All Notes Off
                 "value": 0,
                 "channel": channel
             })
         
-        logger.info(f"All notes off sent for channel {channel}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("All notes off sent for channel %d", channel)
     
-    # Clear our tracking
-    for channel in channels:
-        active_notes[channel] = []
+    if batch:
+        send_midi_batch_callback(batch)
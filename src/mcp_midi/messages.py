@@ -0,0 +1,53 @@
+"""
+MIDI Message Cache
+Provides shared mido messages so hot send paths don't construct and
+validate a new message for every event
+"""
+from functools import lru_cache
+from operator import index
+
+from mido.frozen import FrozenMessage
+
+# All Notes Off (CC 123) for each channel
+ALL_NOTES_OFF = tuple(
+    FrozenMessage('control_change', control=123, value=0, channel=channel)
+    for channel in range(16)
+)
+
+# The messages are frozen, so identical sends can safely share one object.
+# Arguments go through operator.index before the cache lookup: 60 and 60.0
+# hash alike, so otherwise whether a float is rejected would depend on what
+# was cached first. index() rejects floats, as mido does, and turns bools
+# and other integer types into plain ints
+
+@lru_cache(maxsize=4096)
+def _note_on(note: int, velocity: int, channel: int) -> FrozenMessage:
+    return FrozenMessage('note_on', note=note, velocity=velocity, channel=channel)
+
+@lru_cache(maxsize=4096)
+def _note_off(note: int, velocity: int, channel: int) -> FrozenMessage:
+    return FrozenMessage('note_off', note=note, velocity=velocity, channel=channel)
+
+@lru_cache(maxsize=4096)
+def _control_change(control: int, value: int, channel: int) -> FrozenMessage:
+    return FrozenMessage('control_change', control=control, value=value, channel=channel)
+
+@lru_cache(maxsize=2048)
+def _program_change(program: int, channel: int) -> FrozenMessage:
+    return FrozenMessage('program_change', program=program, channel=channel)
+
+def note_on(note: int, velocity: int = 64, channel: int = 0) -> FrozenMessage:
+    """Get a note_on message"""
+    return _note_on(index(note), index(velocity), index(channel))
+
+def note_off(note: int, velocity: int = 0, channel: int = 0) -> FrozenMessage:
+    """Get a note_off message"""
+    return _note_off(index(note), index(velocity), index(channel))
+
+def control_change(control: int, value: int, channel: int = 0) -> FrozenMessage:
+    """Get a control_change message"""
+    return _control_change(index(control), index(value), index(channel))
+
+def program_change(program: int, channel: int = 0) -> FrozenMessage:
+    """Get a program_change message"""
+    return _program_change(index(program), index(channel))
@@ -3,61 +3,203 @@ MIDI File Handler
 Reads and plays standard MIDI files
 """
 import asyncio
+import bisect
 import logging
+import mmap
 import os
-from typing import Dict, List, Optional, Any, Union, Callable
+import queue
+import threading
+from collections import defaultdict, deque
+from functools import partial
+from typing import Dict, List, Optional, Any, Tuple, Union, Callable
 
 import mido
 
 from .song.song import Song
 from .all_notes_off import all_notes_off
+from .smf import read_smf
 
 logger = logging.getLogger("mcp_midi.midi_file")
 
+DEFAULT_TEMPO = 500000  # 120 BPM, in microseconds per beat
+
+def _build_tempo_map(tempo_changes: List[Tuple[int, int]],
+                     ticks_per_beat: int) -> Tuple[List[int], List[float], List[float]]:
+    """Build a tempo map for converting absolute ticks to seconds
+    
+    Args:
+        tempo_changes: (absolute tick, tempo) for every set_tempo in the file
+        ticks_per_beat: The file's ticks per beat
+    
+    Returns:
+        Parallel lists of the tick each tempo starts at, the time in seconds
+        at that tick, and the seconds per tick under that tempo
+    """
+    changes = sorted(tempo_changes, key=lambda change: change[0])
+    
+    ticks = [0]
+    seconds = [0.0]
+    scales = [DEFAULT_TEMPO / (ticks_per_beat * 1e6)]
+    for tick, tempo in changes:
+        scale = tempo / (ticks_per_beat * 1e6)
+        if tick == ticks[-1]:
+            # A later change at the same tick replaces the earlier one
+            scales[-1] = scale
+            continue
+        seconds.append(seconds[-1] + (tick - ticks[-1]) * scales[-1])
+        ticks.append(tick)
+        scales.append(scale)
+    
+    return ticks, seconds, scales
+
+def _note_on_params(message: mido.Message) -> Tuple[str, Dict[str, Any]]:
+    return 'note_on', {'channel': message.channel, 'note': message.note, 'velocity': message.velocity}
+
+def _note_off_params(message: mido.Message) -> Tuple[str, Dict[str, Any]]:
+    return 'note_off', {'channel': message.channel, 'note': message.note, 'velocity': 0}
+
+def _program_change_params(message: mido.Message) -> Tuple[str, Dict[str, Any]]:
+    return 'program_change', {'channel': message.channel, 'program': message.program}
+
+def _control_change_params(message: mido.Message) -> Tuple[str, Dict[str, Any]]:
+    return 'control_change', {'channel': message.channel, 'control': message.control, 'value': message.value}
+
+# Message type -> converter to the (type, params) form taken by MIDI callbacks
+_CALLBACK_PARAMS = {
+    'note_on': _note_on_params,
+    'note_off': _note_off_params,
+    'program_change': _program_change_params,
+    'control_change': _control_change_params,
+}
+
+def _callback_params(message: mido.Message) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Convert a MIDI message to the (type, params) form taken by MIDI callbacks"""
+    convert = _CALLBACK_PARAMS.get(message.type)
+    return convert(message) if convert else None
+
+def _build_timeline(
+    midi_file: mido.MidiFile
+) -> Tuple[List[float], List[mido.Message], List[Optional[Tuple[str, Dict[str, Any]]]]]:
+    """Flatten a MIDI file into the absolute send times and messages for playback
+    
+    Returns:
+        Parallel lists of each message's time in seconds from the start,
+        in order, the (non-meta) messages themselves, and their callback
+        (type, params) form (None for types callbacks don't take), so
+        replaying a file builds no params dicts
+    """
+    times = []
+    messages = []
+    callback_messages = []
+    elapsed = 0.0
+    
+    # Iterating a MidiFile merges its tracks, with delta times in seconds
+    for message in midi_file:
+        elapsed += message.time
+        if not message.is_meta:
+            times.append(elapsed)
+            messages.append(message)
+            callback_messages.append(_callback_params(message))
+    
+    return times, messages, callback_messages
+
+def _send_messages(port, messages: List[mido.Message]) -> None:
+    """Send messages to a port in order"""
+    for message in messages:
+        port.send(message)
+
+class _MessageCollector:
+    """Stands in for a MIDI port, appending sent messages to a list"""
+    
+    def __init__(self, messages: List[mido.Message]):
+        self.send = messages.append
+
 class MidiFilePlayer:
     """Class for handling MIDI file loading and playback"""
     
     def __init__(self):
         self.midi_files = {}  # Dictionary of loaded MIDI files
+        self.timelines = {}  # Flattened playback timelines, built on first play
+        self.file_data = {}  # Raw bytes of files loaded from memory
         self.current_file = None
         self.playback_task = None
         self.stop_event = asyncio.Event()
         self.send_midi_callback = None
+        self.send_midi_batch_callback = None
         self.midi_port = None
+        # Messages due within this many seconds of a send go out with it
+        self.coalesce_window = 0.005
+        # Port writes run in order on a writer thread, so a send that blocks
+        # in the MIDI driver doesn't stall the event loop
+        self._port_jobs = queue.SimpleQueue()
+        self._port_writer = None
     
     def set_midi_callback(self, callback: Callable) -> None:
         """Set the callback for sending MIDI messages"""
         self.send_midi_callback = callback
     
+    def set_midi_batch_callback(self, callback: Callable) -> None:
+        """Set the callback for sending a list of (type, params) MIDI messages
+        
+        When set, it is used instead of the per-message callback.
+        """
+        self.send_midi_batch_callback = callback
+    
     def set_midi_port(self, port) -> None:
         """Set the MIDI output port"""
         self.midi_port = port
     
+    def _queue_port_write(self, job: Callable[[], None]) -> None:
+        """Queue a port write for the writer thread, starting it if needed"""
+        if self._port_writer is None:
+            self._port_writer = threading.Thread(
+                target=self._write_port_jobs, name="midi-file-port-writer", daemon=True
+            )
+            self._port_writer.start()
+        self._port_jobs.put(job)
+    
+    def _write_port_jobs(self) -> None:
+        """Run queued port writes, in order, until the process exits"""
+        while True:
+            job = self._port_jobs.get()
+            try:
+                job()
+            except Exception as e:
+                logger.error(f"Error writing to MIDI port: {e}")
+    
+    @staticmethod
+    def default_name(path: str) -> str:
+        """Get the name a file is loaded under when none is given"""
+        name = os.path.basename(path)
+        # Remove extension if present
+        if name.lower().endswith('.mid') or name.lower().endswith('.midi'):
+            name = os.path.splitext(name)[0]
+        return name
+    
     def load_file(self, path: str, name: Optional[str] = None) -> bool:
         """Load a MIDI file from path"""
         try:
             # If name isn't provided, use the filename
             if name is None:
-                name = os.path.basename(path)
-                # Remove extension if present
-                if name.lower().endswith('.mid') or name.lower().endswith('.midi'):
-                    name = os.path.splitext(name)[0]
+                name = self.default_name(path)
             
-            # Load the MIDI file
-            midi_file = mido.MidiFile(path)
+            # Only check the header now; the file is parsed when first needed
+            with open(path, 'rb') as f:
+                if f.read(4) != b'MThd':
+                    raise ValueError("not a MIDI file (missing MThd header)")
             
+            self.timelines.pop(name, None)
+            self.file_data.pop(name, None)
             self.midi_files[name] = {
                 'path': path,
-                'midi': midi_file,
-                'ticks_per_beat': midi_file.ticks_per_beat,
-                'type': midi_file.type,
-                'tracks': len(midi_file.tracks),
-                'length': midi_file.length  # Length in seconds
+                'midi': None,
+                'ticks_per_beat': None,
+                'type': None,
+                'tracks': None,
+                'length': None  # Length in seconds
             }
             
             logger.info(f"Loaded MIDI file '{name}' from {path}")
-            logger.info(f"File details: Type {midi_file.type}, {len(midi_file.tracks)} tracks, " 
-                       f"{midi_file.length:.2f} seconds")
             
             return True
         
@@ -65,6 +207,23 @@ class MidiFilePlayer:
             logger.error(f"Error loading MIDI file from {path}: {e}")
             return False
     
+    def _get_midi(self, name: str) -> mido.MidiFile:
+        """Get a loaded file's parsed MIDI data, parsing it on first use"""
+        entry = self.midi_files[name]
+        if entry['midi'] is None:
+            midi_file = mido.MidiFile(entry['path'])
+            length = midi_file.length  # Walks every track, so only once
+            entry.update({
+                'midi': midi_file,
+                'ticks_per_beat': midi_file.ticks_per_beat,
+                'type': midi_file.type,
+                'tracks': len(midi_file.tracks),
+                'length': length  # Length in seconds
+            })
+            logger.info(f"File details for '{name}': Type {midi_file.type}, {len(midi_file.tracks)} tracks, " 
+                       f"{length:.2f} seconds")
+        return entry['midi']
+    
     def load_from_bytes(self, data: bytes, name: str = "uploaded_midi") -> bool:
         """Load a MIDI file from binary data"""
         try:
@@ -75,19 +234,22 @@ class MidiFilePlayer:
             
             # Load the MIDI file
             midi_file = mido.MidiFile(file=file_obj)
+            length = midi_file.length  # Walks every track, so only once
             
+            self.timelines.pop(name, None)
+            self.file_data[name] = data
             self.midi_files[name] = {
                 'path': "memory",
                 'midi': midi_file,
                 'ticks_per_beat': midi_file.ticks_per_beat,
                 'type': midi_file.type,
                 'tracks': len(midi_file.tracks),
-                'length': midi_file.length  # Length in seconds
+                'length': length  # Length in seconds
             }
             
             logger.info(f"Loaded MIDI file '{name}' from binary data")
             logger.info(f"File details: Type {midi_file.type}, {len(midi_file.tracks)} tracks, " 
-                       f"{midi_file.length:.2f} seconds")
+                       f"{length:.2f} seconds")
             
             return True
         
@@ -111,12 +273,38 @@ class MidiFilePlayer:
             return False
     
     def get_file_info(self, name: str) -> Optional[Dict]:
-        """Get information about a loaded MIDI file"""
-        return self.midi_files.get(name)
+        """Get information about a loaded MIDI file
+        
+        Files loaded from a path are parsed here if they haven't been yet. A
+        file that fails to parse is removed and None is returned.
+        """
+        if name not in self.midi_files:
+            return None
+        
+        try:
+            self._get_midi(name)
+        except Exception as e:
+            logger.error(f"Error reading MIDI file '{name}': {e}")
+            del self.midi_files[name]
+            self.timelines.pop(name, None)
+            return None
+        return self.midi_files[name]
     
     def list_files(self) -> Dict:
-        """List all loaded MIDI files"""
-        return {name: info for name, info in self.midi_files.items()}
+        """List all loaded MIDI files
+        
+        Returns the player's own mapping of name to file info, not a copy.
+        """
+        return self.midi_files
+    
+    def _read_smf(self, name: str):
+        """Read a loaded file's channel events and tempo changes with read_smf"""
+        if name in self.file_data:
+            return read_smf(self.file_data[name])
+        
+        with open(self.midi_files[name]['path'], 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return read_smf(data)
     
     def convert_to_song(self, name: str) -> Optional[Song]:
         """Convert a MIDI file to a Song object"""
@@ -125,73 +313,85 @@ class MidiFilePlayer:
             return None
         
         try:
-            midi_file = self.midi_files[name]['midi']
+            # Read the raw channel events, which skips building mido messages
+            ticks_per_beat, tracks, tempo_changes = self._read_smf(name)
             song = Song(name=name, tempo=120)  # Default tempo, will be updated
             
-            # Track the current time position in seconds for each track
-            track_time = 0.0
+            # Tick -> seconds conversion that follows the file's tempo changes
+            tempo_ticks, tempo_seconds, tempo_scales = _build_tempo_map(tempo_changes, ticks_per_beat)
+            song.tempo = round(mido.tempo2bpm(tempo_scales[0] * ticks_per_beat * 1e6))
+            
+            # Notes still waiting for their note_off, oldest first, by (channel, pitch)
+            pending_notes = defaultdict(deque)
+            
+            # Latest end time of any finished event, kept as events are finalized
+            max_end = 0.0
             
             # Process each message in the file
-            for track_idx, track in enumerate(midi_file.tracks):
+            for events in tracks:
+                time_tick = 0  # Tick that absolute_time was last converted at
                 absolute_time = 0.0  # Current time in seconds for this track
                 
-                for msg in track:
-                    # Update the time
-                    if msg.time > 0:
-                        # Convert MIDI ticks to seconds
-                        delta_time = mido.tick2second(
-                            msg.time, 
-                            midi_file.ticks_per_beat, 
-                            tempo=500000  # Default tempo = 120 BPM (500000 microseconds per beat)
-                        )
-                        absolute_time += delta_time
+                for absolute_tick, status, data1, data2 in events:
+                    # Convert MIDI ticks to seconds using the tempo in effect,
+                    # only when the time has moved
+                    if absolute_tick != time_tick:
+                        time_tick = absolute_tick
+                        i = bisect.bisect_right(tempo_ticks, absolute_tick) - 1
+                        absolute_time = tempo_seconds[i] + (absolute_tick - tempo_ticks[i]) * tempo_scales[i]
+                    
+                    kind = status & 0xF0
+                    channel = status & 0x0F
                     
                     # Process different message types
-                    if msg.type == 'note_on' and msg.velocity > 0:
+                    if kind == 0x90 and data2 > 0:
                         # Add note_on at the current time
                         song.add_note(
-                            pitch=msg.note,
+                            pitch=data1,
                             time=absolute_time,
                             duration=0.1,  # Temporary duration, will be updated when note_off is found
-                            velocity=msg.velocity,
-                            channel=msg.channel
+                            velocity=data2,
+                            channel=channel
                         )
+                        pending_notes[(channel, data1)].append(song.events[-1])
                     
-                    elif msg.type == 'note_off' or (msg.type == 'note_on' and msg.velocity == 0):
-                        # Find the corresponding note_on event and update its duration
-                        # This is a simplified approach and would need more complexity for a real implementation
-                        for event in song.events:
-                            if (hasattr(event, 'pitch') and event.pitch == msg.note and 
-                                event.channel == msg.channel and 
-                                event.time + event.duration > absolute_time - 0.001):
-                                # Update the duration
-                                event.duration = absolute_time - event.time
-                                break
+                    elif kind == 0x80 or kind == 0x90:
+                        # A note_on with velocity 0 is a note_off too; end the
+                        # oldest sounding note with this pitch and channel
+                        pending = pending_notes.get((channel, data1))
+                        if pending:
+                            event = pending.popleft()
+                            event.duration = absolute_time - event.time
+                            if absolute_time > max_end:
+                                max_end = absolute_time
                     
-                    elif msg.type == 'program_change':
+                    elif kind == 0xC0:
+                        if absolute_time > max_end:
+                            max_end = absolute_time
                         # Add program change at the current time
                         song.add_program_change(
-                            program=msg.program,
+                            program=data1,
                             time=absolute_time,
-                            channel=msg.channel
+                            channel=channel
                         )
                     
-                    elif msg.type == 'control_change':
+                    else:
+                        if absolute_time > max_end:
+                            max_end = absolute_time
                         # Add control change at the current time
                         song.add_control_change(
-                            control=msg.control,
-                            value=msg.value,
+                            control=data1,
+                            value=data2,
                             time=absolute_time,
-                            channel=msg.channel
+                            channel=channel
                         )
-                    
-                    elif msg.type == 'set_tempo':
-                        # TODO: Handle tempo changes
-                        # This would involve more complex time calculations
-                        pass
             
-            # Update the song's total duration
-            song.duration = max([event.time + event.duration for event in song.events if hasattr(event, 'duration')])
+            # Update the song's total duration; notes never turned off keep
+            # their temporary duration
+            for pending in pending_notes.values():
+                for event in pending:
+                    max_end = max(max_end, event.time + event.duration)
+            song.duration = max_end
             
             # Sort the events by time
             song.sort_events()
@@ -202,74 +402,86 @@ class MidiFilePlayer:
             logger.error(f"Error converting MIDI file '{name}' to Song: {e}")
             return None
     
+    async def _wait_until(self, deadline: float) -> bool:
+        """Wait until a loop.time() deadline, returning True if playback was stopped"""
+        delay = deadline - asyncio.get_running_loop().time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        return self.stop_event.is_set()
+    
+    def _send_batch(self, messages: List[mido.Message],
+                    callback_messages: List[Optional[Tuple[str, Dict[str, Any]]]]) -> None:
+        """Send messages that are due together, with their callback forms"""
+        if self.midi_port:
+            self._queue_port_write(partial(_send_messages, self.midi_port, messages))
+        
+        if self.send_midi_batch_callback:
+            batch = [params for params in callback_messages if params]
+            if batch:
+                self.send_midi_batch_callback(batch)
+        
+        elif self.send_midi_callback:
+            for params in callback_messages:
+                if params:
+                    self.send_midi_callback(*params)
+    
+    def _all_notes_off(self) -> None:
+        """Turn off all notes through every configured output
+        
+        The tracked notes are walked once for all outputs. Port messages are
+        collected and queued behind any pending writes, so no note_on can
+        follow them.
+        """
+        port_messages = []
+        collector = _MessageCollector(port_messages) if self.midi_port else None
+        
+        all_notes_off(collector, self.send_midi_callback, None, self.send_midi_batch_callback)
+        
+        if port_messages:
+            self._queue_port_write(partial(_send_messages, self.midi_port, port_messages))
+    
     async def play_file(self, name: str) -> bool:
         """Play a MIDI file directly"""
         if name not in self.midi_files:
             logger.warning(f"MIDI file '{name}' not found")
             return False
         
-        if not self.send_midi_callback and not self.midi_port:
+        if not self.send_midi_callback and not self.send_midi_batch_callback and not self.midi_port:
             logger.error("No MIDI output method available")
             return False
         
         try:
-            midi_file = self.midi_files[name]['midi']
+            if name not in self.timelines:
+                self.timelines[name] = _build_timeline(self._get_midi(name))
+            times, messages, callback_messages = self.timelines[name]
+            
             self.current_file = name
             self.stop_event.clear()
             
             logger.info(f"Starting playback of MIDI file '{name}'")
             
-            # Play through each message
-            for message in midi_file.play():
-                # Check if we should stop
-                if self.stop_event.is_set():
+            loop = asyncio.get_running_loop()
+            start_time = loop.time()
+            index = 0
+            
+            while index < len(times):
+                # Check if we should stop while waiting for the next message
+                if await self._wait_until(start_time + times[index]):
                     logger.info(f"Playback of MIDI file '{name}' stopped")
                     break
                 
-                # Skip meta messages
-                if not hasattr(message, 'type') or message.is_meta:
-                    continue
-                
-                # Send the message
-                if self.midi_port:
-                    self.midi_port.send(message)
-                
-                if self.send_midi_callback:
-                    msg_dict = {'channel': getattr(message, 'channel', 0)}
-                    
-                    if message.type == 'note_on':
-                        msg_dict.update({
-                            'note': message.note,
-                            'velocity': message.velocity
-                        })
-                        self.send_midi_callback('note_on', msg_dict)
-                    
-                    elif message.type == 'note_off':
-                        msg_dict.update({
-                            'note': message.note,
-                            'velocity': 0
-                        })
-                        self.send_midi_callback('note_off', msg_dict)
-                    
-                    elif message.type == 'program_change':
-                        msg_dict.update({
-                            'program': message.program
-                        })
-                        self.send_midi_callback('program_change', msg_dict)
-                    
-                    elif message.type == 'control_change':
-                        msg_dict.update({
-                            'control': message.control,
-                            'value': message.value
-                        })
-                        self.send_midi_callback('control_change', msg_dict)
+                # Send everything due within coalesce_window of now in one batch,
+                # which also catches up at once if the loop was running late
+                horizon = loop.time() - start_time + self.coalesce_window
+                end = bisect.bisect_right(times, horizon, index)
+                self._send_batch(messages[index:end], callback_messages[index:end])
+                index = end
             
             # Make sure all notes are off at the end
-            if self.midi_port:
-                all_notes_off(self.midi_port)
-            
-            if self.send_midi_callback:
-                all_notes_off(None, self.send_midi_callback)
+            self._all_notes_off()
             
             logger.info(f"Playback of MIDI file '{name}' completed")
             self.current_file = None
@@ -279,11 +491,7 @@ class MidiFilePlayer:
             logger.error(f"Error playing MIDI file '{name}': {e}")
             
             # Clean up
-            if self.midi_port:
-                all_notes_off(self.midi_port)
-            
-            if self.send_midi_callback:
-                all_notes_off(None, self.send_midi_callback)
+            self._all_notes_off()
             
             self.current_file = None
             return False
@@ -305,10 +513,6 @@ class MidiFilePlayer:
         self.stop_event.set()
         
         # Clean up
-        if self.midi_port:
-            all_notes_off(self.midi_port)
-        
-        if self.send_midi_callback:
-            all_notes_off(None, self.send_midi_callback)
+        self._all_notes_off()
         
         return True
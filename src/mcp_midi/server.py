@@ -1,11 +1,13 @@
 import os
 import sys
 import logging
+import queue
+import threading
+import time
 from contextlib import closing
 from pathlib import Path
-import mido
 import rtmidi
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, NamedTuple, Optional, Any, Callable, Tuple, Union
 from pydantic import AnyUrl
 
 from mcp_midi.song.song import Song
@@ -17,11 +19,13 @@ import mcp.types as types
 from mcp.server import NotificationOptions, Server
 import mcp.server.stdio
 
-# reconfigure UnicodeEncodeError prone default (i.e. windows-1252) to utf-8
-if sys.platform == "win32" and os.environ.get('PYTHONIOENCODING') is None:
-    sys.stdin.reconfigure(encoding="utf-8")
-    sys.stdout.reconfigure(encoding="utf-8")
-    sys.stderr.reconfigure(encoding="utf-8")
+def _reconfigure_windows_stdio() -> None:
+    """Switch stdio from the UnicodeEncodeError prone Windows default
+    (i.e. windows-1252) to utf-8, unless PYTHONIOENCODING is set"""
+    if os.environ.get('PYTHONIOENCODING') is None:
+        sys.stdin.reconfigure(encoding="utf-8")
+        sys.stdout.reconfigure(encoding="utf-8")
+        sys.stderr.reconfigure(encoding="utf-8")
 
 logger = logging.getLogger('mcp_midi_server')
 logger.setLevel(logging.INFO)
@@ -82,47 +86,318 @@ Tracker tools:
 - play_song: Play the created song
 """
 
+# Input schema properties that several tools share
+_NOTE_PROP = {"type": "integer", "description": "MIDI note number (0-127)"}
+_VELOCITY_PROP = {"type": "integer", "description": "Velocity (0-127)"}
+_CHANNEL_PROP = {"type": "integer", "description": "MIDI channel (0-15)"}
+_PROGRAM_PROP = {"type": "integer", "description": "Program/instrument number (0-127)"}
+_SONG_NAME_PROP = {"type": "string", "description": "Name of the song"}
+
+# Tools and prompts are fixed, so they are built once rather than per request.
+# Tuples, so a handler's caller can't change the shared definitions
+TOOLS = (
+    types.Tool(
+        name="discover_ports",
+        description="List all available MIDI output ports",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "refresh": {"type": "boolean", "description": "Enumerate the ports again instead of using the last result (default: false)"},
+            },
+        },
+    ),
+    types.Tool(
+        name="connect_port",
+        description="Connect to a specific MIDI output port",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "port_id": {"type": "integer", "description": "ID of the MIDI port to connect to"},
+            },
+            "required": ["port_id"],
+        },
+    ),
+    types.Tool(
+        name="note_on",
+        description="Play a note on the MIDI device",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "note": _NOTE_PROP,
+                "velocity": _VELOCITY_PROP,
+                "channel": _CHANNEL_PROP,
+            },
+            "required": ["note"],
+        },
+    ),
+    types.Tool(
+        name="note_off",
+        description="Stop a note on the MIDI device",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "note": _NOTE_PROP,
+                "channel": _CHANNEL_PROP,
+            },
+            "required": ["note"],
+        },
+    ),
+    types.Tool(
+        name="program_change",
+        description="Change the instrument sound on the MIDI device",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "program": _PROGRAM_PROP,
+                "channel": _CHANNEL_PROP,
+            },
+            "required": ["program"],
+        },
+    ),
+    types.Tool(
+        name="control_change",
+        description="Change a controller value on the MIDI device",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "control": {"type": "integer", "description": "Controller number (0-127)"},
+                "value": {"type": "integer", "description": "Control value (0-127)"},
+                "channel": _CHANNEL_PROP,
+            },
+            "required": ["control", "value"],
+        },
+    ),
+    # Song-related tools
+    types.Tool(
+        name="create_song",
+        description="Create a new empty song",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "name": _SONG_NAME_PROP,
+                "tempo": {"type": "integer", "description": "Tempo in BPM (beats per minute)"},
+            },
+            "required": ["name"],
+        },
+    ),
+    types.Tool(
+        name="create_scale",
+        description="Create a new song with a musical scale",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "name": _SONG_NAME_PROP,
+                "root_note": {"type": "integer", "description": "Root note of the scale (0-127)"},
+                "scale_type": {"type": "string", "description": "Type of scale (major, minor, pentatonic, blues, chromatic)"},
+                "octaves": {"type": "integer", "description": "Number of octaves"},
+                "duration": {"type": "number", "description": "Duration of each note in seconds"},
+            },
+            "required": ["name", "root_note", "scale_type"],
+        },
+    ),
+    types.Tool(
+        name="add_note",
+        description="Add a note to the current song",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "pitch": _NOTE_PROP,
+                "time": {"type": "number", "description": "Time in seconds when the note should start"},
+                "duration": {"type": "number", "description": "Duration of the note in seconds"},
+                "velocity": _VELOCITY_PROP,
+                "channel": _CHANNEL_PROP,
+            },
+            "required": ["pitch", "time", "duration"],
+        },
+    ),
+    types.Tool(
+        name="add_chord",
+        description="Add a chord to the current song",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "notes": {"type": "array", "items": {"type": "integer"}, "description": "List of MIDI note numbers"},
+                "time": {"type": "number", "description": "Time in seconds when the chord should start"},
+                "duration": {"type": "number", "description": "Duration of the chord in seconds"},
+                "velocity": _VELOCITY_PROP,
+                "channel": _CHANNEL_PROP,
+            },
+            "required": ["notes", "time", "duration"],
+        },
+    ),
+    types.Tool(
+        name="add_program_change",
+        description="Add a program change to the current song",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "program": _PROGRAM_PROP,
+                "time": {"type": "number", "description": "Time in seconds when the program change should occur"},
+                "channel": _CHANNEL_PROP,
+            },
+            "required": ["program", "time"],
+        },
+    ),
+    types.Tool(
+        name="play_song",
+        description="Play a song by name",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "description": "Name of the song to play"},
+            },
+            "required": ["name"],
+        },
+    ),
+    types.Tool(
+        name="stop_song",
+        description="Stop the currently playing song",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        },
+    ),
+    types.Tool(
+        name="list_songs",
+        description="List all available songs",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        },
+    ),
+    # Tracker tools
+    types.Tool(
+        name="load_tracker_content",
+        description="Load a tracker file from a text string",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "content": {"type": "string", "description": "Tracker file content as text"},
+                "name": {"type": "string", "description": "Name for the tracker song"},
+            },
+            "required": ["content", "name"],
+        },
+    ),
+)
+
+PROMPTS = (
+    types.Prompt(
+        name="midi-intro",
+        description="Introduction to controlling MIDI devices",
+        arguments=[],
+    ),
+)
+
+MIDI_INTRO_PROMPT = types.GetPromptResult(
+    description="Introduction to controlling MIDI devices",
+    messages=[
+        types.PromptMessage(
+            role="user",
+            content=types.TextContent(type="text", text=PROMPT_TEMPLATE.strip()),
+        )
+    ],
+)
+
+
+# Tools that send MIDI straight away, so need a connected port
+_SENDING_TOOLS = frozenset({"note_on", "note_off", "program_change", "control_change", "play_song"})
+
+# With MCP_MIDI_BRIEF_RESPONSES set, the note and controller tools answer a
+# successful send with a short "ok" instead of describing the message
+_VERBOSE_RESPONSES = not os.environ.get("MCP_MIDI_BRIEF_RESPONSES")
+_OK = types.TextContent(type="text", text="ok")
+
+# Reply from the song editing tools when no song is selected
+_NO_CURRENT_SONG = types.TextContent(type="text", text="No current song selected. Please create a song first.")
+
+# Status bytes for each channel, indexed by channel number
+_NOTE_OFF_STATUS = bytes(range(0x80, 0x90))
+_NOTE_ON_STATUS = bytes(range(0x90, 0xA0))
+_CONTROL_CHANGE_STATUS = bytes(range(0xB0, 0xC0))
+_PROGRAM_CHANGE_STATUS = bytes(range(0xC0, 0xD0))
+
+# All Notes Off (CC 123) and All Sound Off (CC 120) for every channel
+_SILENCE_MESSAGES = tuple(
+    (0xB0 | channel, control, 0) for channel in range(16) for control in (123, 120)
+)
+
+
+class Port(NamedTuple):
+    """A MIDI output port found by discover_ports"""
+    id: int
+    name: str
+    type: str = "output"
+
+
 class MidiManager:
+    # Fixed attributes, so they are read from slots rather than a __dict__
+    __slots__ = (
+        "ports", "active_port", "current_port_id", "_rt_send", "_send_queue",
+        "_sender", "_ports_cached_at", "_ports_ttl", "song_manager",
+    )
+    
     def __init__(self):
-        self.ports = {}
-        self.active_port = None
+        self.ports: List[Port] = []  # Indexed by port id
+        self.active_port = None  # rtmidi.MidiOut with the connected port open
         self.current_port_id = None
+        # The active port's send_message; None when no port is connected
+        self._rt_send = None
+        # Sends run in order on a sender thread, as (send function, messages)
+        # jobs, so request handling doesn't add jitter to MIDI output and a
+        # send that blocks in the driver doesn't stall the event loop
+        self._send_queue = queue.SimpleQueue()
+        self._sender = None
+        # When discover_ports last enumerated the ports, and for how long
+        # (seconds) that result is reused
+        self._ports_cached_at = None
+        self._ports_ttl = 5.0
         self.song_manager = SongManager()
         self.discover_ports()
         
-        # Set up the song manager with the MIDI sending callback
+        # Set up the song manager with the MIDI sending callbacks
         self.song_manager.set_midi_callback(self._handle_midi_message)
+        self.song_manager.set_midi_batch_callback(self.send_batch)
+        
+    def discover_ports(self, refresh: bool = False) -> List[Port]:
+        """Discover available MIDI output ports
+        
+        Enumerating ports can take seconds on some drivers, so the result is
+        reused for _ports_ttl seconds unless refresh is set.
+        """
+        if (not refresh and self._ports_cached_at is not None
+                and time.monotonic() - self._ports_cached_at < self._ports_ttl):
+            return self.ports
         
-    def discover_ports(self) -> Dict[int, Dict]:
-        """Discover available MIDI output ports"""
         try:
             midi_out = rtmidi.MidiOut()
             available_ports = midi_out.get_ports()
+            del midi_out  # Release the driver handle straight away
             
-            self.ports = {}
-            for i, port in enumerate(available_ports):
-                self.ports[i] = {
-                    "id": i,
-                    "name": port,
-                    "type": "output",
-                }
+            self.ports = [Port(i, name) for i, name in enumerate(available_ports)]
             
+            self._ports_cached_at = time.monotonic()
             logger.info(f"Discovered {len(self.ports)} MIDI ports")
             return self.ports
         except Exception as e:
             logger.error(f"Error discovering MIDI ports: {e}")
-            return {}
+            return []
     
     def connect_port(self, port_id: int) -> bool:
         """Connect to a MIDI output port"""
         try:
-            if port_id in self.ports:
+            if 0 <= port_id < len(self.ports):
                 if self.active_port is not None:
-                    self.active_port.close()
-                
-                self.active_port = mido.open_output(self.ports[port_id]["name"])
+                    self._flush_sends()
+                    self.active_port.close_port()
+                    self.active_port = None
+                    self._rt_send = None
+                
+                midi_out = rtmidi.MidiOut()
+                midi_out.open_port(port_id)
+                self.active_port = midi_out
+                self._rt_send = midi_out.send_message
                 self.current_port_id = port_id
-                logger.info(f"Connected to MIDI port {port_id}: {self.ports[port_id]['name']}")
+                logger.info(f"Connected to MIDI port {port_id}: {self.ports[port_id].name}")
                 return True
             else:
                 logger.error(f"MIDI port {port_id} not found")
@@ -131,73 +406,119 @@ class MidiManager:
             logger.error(f"Error connecting to MIDI port {port_id}: {e}")
             return False
     
+    def ensure_connected(self) -> bool:
+        """Connect to the first port if no port is connected yet
+        
+        Senders assume a connected port, so callers check this once before
+        sending rather than on every message.
+        """
+        if self.active_port is not None:
+            return True
+        if self.ports:
+            return self.connect_port(0)
+        logger.error("No MIDI ports available")
+        return False
+    
+    def _queue_send(self, send: Callable, messages) -> None:
+        """Queue messages for the sender thread, starting it if needed"""
+        if self._sender is None:
+            self._sender = threading.Thread(
+                target=self._sender_loop, name="midi-sender", daemon=True
+            )
+            self._sender.start()
+        self._send_queue.put((send, messages))
+    
+    def _sender_loop(self) -> None:
+        """Send queued messages, in order, until a None job is queued"""
+        while True:
+            job = self._send_queue.get()
+            if job is None:
+                break
+            send, messages = job
+            try:
+                for message in messages:
+                    send(message)
+            except Exception as e:
+                logger.error(f"Error writing to MIDI port: {e}")
+    
+    def _flush_sends(self) -> None:
+        """Wait for queued messages to be sent and stop the sender thread
+        
+        The join has no timeout: a second sender must not start while the
+        first is still writing, or messages could go out of order.
+        """
+        if self._sender is not None:
+            self._send_queue.put(None)
+            self._sender.join()
+            self._sender = None
+    
+    def _send_raw(self, *message: int) -> None:
+        """Queue a raw message for the rtmidi output's sender thread
+        
+        Raises RuntimeError when no port is connected (see ensure_connected).
+        """
+        send = self._rt_send
+        if send is None:
+            raise RuntimeError("No active MIDI port")
+        self._queue_send(send, (message,))
+    
+    # The send methods mask values to their 4-bit (channel) or 7-bit range,
+    # like send_batch, and let errors propagate to the caller
+    
     def send_note_on(self, note: int, velocity: int = 64, channel: int = 0) -> bool:
         """Send a note_on message"""
-        try:
-            if self.active_port is None:
-                if len(self.ports) > 0:
-                    self.connect_port(next(iter(self.ports)))
-                else:
-                    logger.error("No MIDI ports available")
-                    return False
-            
-            msg = mido.Message('note_on', note=note, velocity=velocity, channel=channel)
-            self.active_port.send(msg)
-            logger.info(f"Sent note_on: note={note}, velocity={velocity}, channel={channel}")
-            return True
-        except Exception as e:
-            logger.error(f"Error sending note_on: {e}")
-            return False
+        self._send_raw(_NOTE_ON_STATUS[channel & 0x0F], note & 0x7F, velocity & 0x7F)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sent note_on: note=%d, velocity=%d, channel=%d", note, velocity, channel)
+        return True
     
     def send_note_off(self, note: int, channel: int = 0) -> bool:
         """Send a note_off message"""
-        try:
-            if self.active_port is None:
-                logger.error("No active MIDI port")
-                return False
-            
-            msg = mido.Message('note_off', note=note, velocity=0, channel=channel)
-            self.active_port.send(msg)
-            logger.info(f"Sent note_off: note={note}, channel={channel}")
-            return True
-        except Exception as e:
-            logger.error(f"Error sending note_off: {e}")
-            return False
+        self._send_raw(_NOTE_OFF_STATUS[channel & 0x0F], note & 0x7F, 0)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sent note_off: note=%d, channel=%d", note, channel)
+        return True
     
     def send_program_change(self, program: int, channel: int = 0) -> bool:
         """Send a program_change message"""
-        try:
-            if self.active_port is None:
-                if len(self.ports) > 0:
-                    self.connect_port(next(iter(self.ports)))
-                else:
-                    logger.error("No MIDI ports available")
-                    return False
-            
-            msg = mido.Message('program_change', program=program, channel=channel)
-            self.active_port.send(msg)
-            logger.info(f"Sent program_change: program={program}, channel={channel}")
-            return True
-        except Exception as e:
-            logger.error(f"Error sending program_change: {e}")
-            return False
+        self._send_raw(_PROGRAM_CHANGE_STATUS[channel & 0x0F], program & 0x7F)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sent program_change: program=%d, channel=%d", program, channel)
+        return True
     
     def send_control_change(self, control: int, value: int, channel: int = 0) -> bool:
         """Send a control_change message"""
+        self._send_raw(_CONTROL_CHANGE_STATUS[channel & 0x0F], control & 0x7F, value & 0x7F)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sent control_change: control=%d, value=%d, channel=%d", control, value, channel)
+        return True
+    
+    def send_batch(self, messages: List[Tuple[int, ...]]) -> bool:
+        """Send raw channel messages that are due at the same time
+        
+        Each message is a (status, data1[, data2]) tuple with the channel
+        already in the status byte, e.g. (0x90 | channel, note, velocity).
+        Data bytes are masked to 7 bits, as in the single-message send
+        methods. A status byte that isn't a channel message rejects the
+        whole batch before anything is sent.
+        """
         try:
-            if self.active_port is None:
-                if len(self.ports) > 0:
-                    self.connect_port(next(iter(self.ports)))
-                else:
-                    logger.error("No MIDI ports available")
-                    return False
+            batch = []
+            for status, *data in messages:
+                if not 0x80 <= status <= 0xEF:
+                    raise ValueError(f"status must be a channel message, got {status:#x}")
+                batch.append((status, *[value & 0x7F for value in data]))
             
-            msg = mido.Message('control_change', control=control, value=value, channel=channel)
-            self.active_port.send(msg)
-            logger.info(f"Sent control_change: control={control}, value={value}, channel={channel}")
+            send = self._rt_send
+            if send is None:
+                raise RuntimeError("No active MIDI port")
+            self._queue_send(send, batch)
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sent batch of %d messages", len(messages))
             return True
         except Exception as e:
-            logger.error(f"Error sending control_change: {e}")
+            logger.error(f"Error sending MIDI batch: {e}")
             return False
     
     def _handle_midi_message(self, message_type: str, params: Dict[str, Any]) -> bool:
@@ -225,6 +546,8 @@ class MidiManager:
                     params.get("value", 0),
                     params.get("channel", 0)
                 )
+            elif message_type == "batch":
+                return self.send_batch(params.get("messages", []))
             else:
                 logger.warning(f"Unknown MIDI message type: {message_type}")
                 return False
@@ -232,19 +555,320 @@ class MidiManager:
             logger.error(f"Error handling MIDI message: {e}")
             return False
     
+    def all_notes_off(self) -> None:
+        """Send All Notes Off and All Sound Off on every channel
+        
+        Silences notes whose note_off never went out, e.g. from a song
+        stopped mid-playback. Does nothing when no port is connected.
+        """
+        send = self._rt_send
+        if send is not None:
+            self._queue_send(send, _SILENCE_MESSAGES)
+    
     def close(self):
         """Close all connections"""
         # Stop any playing songs
         self.song_manager.stop_current_song()
         
         if self.active_port is not None:
-            self.active_port.close()
+            self.all_notes_off()
+            self._flush_sends()
+            self.active_port.close_port()
             self.active_port = None
+            self._rt_send = None
             self.current_port_id = None
             logger.info("Closed MIDI connections")
 
+# Standard MIDI tools
+
+async def _tool_discover_ports(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """List the available MIDI output ports"""
+    refresh = bool(arguments and arguments.get("refresh", False))
+    ports = midi_manager.discover_ports(refresh=refresh)
+    return [types.TextContent(type="text", text=str([port._asdict() for port in ports]))]
+
+async def _tool_connect_port(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Connect to a MIDI output port"""
+    if not arguments or "port_id" not in arguments:
+        raise ValueError("Missing port_id argument")
+    
+    port_id = arguments["port_id"]
+    success = midi_manager.connect_port(port_id)
+    if success:
+        return [types.TextContent(type="text", text=f"Connected to MIDI port {port_id}: {midi_manager.ports[port_id].name}")]
+    else:
+        return [types.TextContent(type="text", text=f"Failed to connect to MIDI port {port_id}")]
+
+async def _tool_note_on(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Send a note_on message"""
+    if not arguments or "note" not in arguments:
+        raise ValueError("Missing note argument")
+    
+    note = arguments["note"]
+    velocity = arguments.get("velocity", 64)
+    channel = arguments.get("channel", 0)
+    
+    midi_manager.send_note_on(note, velocity, channel)
+    if not _VERBOSE_RESPONSES:
+        return [_OK]
+    return [types.TextContent(type="text", text=f"Played note {note} with velocity {velocity} on channel {channel}")]
+
+async def _tool_note_off(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Send a note_off message"""
+    if not arguments or "note" not in arguments:
+        raise ValueError("Missing note argument")
+    
+    note = arguments["note"]
+    channel = arguments.get("channel", 0)
+    
+    midi_manager.send_note_off(note, channel)
+    if not _VERBOSE_RESPONSES:
+        return [_OK]
+    return [types.TextContent(type="text", text=f"Stopped note {note} on channel {channel}")]
+
+async def _tool_program_change(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Send a program_change message"""
+    if not arguments or "program" not in arguments:
+        raise ValueError("Missing program argument")
+    
+    program = arguments["program"]
+    channel = arguments.get("channel", 0)
+    
+    midi_manager.send_program_change(program, channel)
+    if not _VERBOSE_RESPONSES:
+        return [_OK]
+    return [types.TextContent(type="text", text=f"Changed to program/instrument {program} on channel {channel}")]
+
+async def _tool_control_change(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Send a control_change message"""
+    if not arguments or "control" not in arguments or "value" not in arguments:
+        raise ValueError("Missing control or value argument")
+    
+    control = arguments["control"]
+    value = arguments["value"]
+    channel = arguments.get("channel", 0)
+    
+    midi_manager.send_control_change(control, value, channel)
+    if not _VERBOSE_RESPONSES:
+        return [_OK]
+    return [types.TextContent(type="text", text=f"Changed controller {control} to value {value} on channel {channel}")]
+
+# Song-related tools
+
+async def _tool_create_song(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Create an empty song and make it current"""
+    if not arguments or "name" not in arguments:
+        raise ValueError("Missing name argument")
+    
+    name = arguments["name"]
+    tempo = arguments.get("tempo", 120)
+    song_manager = midi_manager.song_manager
+    song_manager.add_song(Song(name=name, tempo=tempo))
+    song_manager.set_current_song(name)
+    
+    return [types.TextContent(type="text", text=f"Created new song '{name}' with tempo {tempo} BPM")]
+
+async def _tool_create_scale(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Create a song playing a scale and make it current"""
+    if not arguments or "name" not in arguments or "root_note" not in arguments or "scale_type" not in arguments:
+        raise ValueError("Missing required arguments")
+    
+    name = arguments["name"]
+    root_note = arguments["root_note"]
+    scale_type = arguments["scale_type"]
+    octaves = arguments.get("octaves", 1)
+    duration = arguments.get("duration", 0.5)
+    song_manager = midi_manager.song_manager
+    
+    song_manager.create_scale_song(
+        name=name,
+        root_note=root_note,
+        scale_type=scale_type,
+        octaves=octaves,
+        duration=duration
+    )
+    
+    song_manager.set_current_song(name)
+    
+    return [types.TextContent(type="text", text=f"Created scale song '{name}' with root note {root_note} ({scale_type} scale), {octaves} octaves, and note duration {duration}s")]
+
+async def _tool_add_note(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Add a note to the current song"""
+    if not arguments or "pitch" not in arguments or "time" not in arguments or "duration" not in arguments:
+        raise ValueError("Missing required arguments")
+    
+    song = midi_manager.song_manager.current_song
+    if not song:
+        return [_NO_CURRENT_SONG]
+    
+    pitch = arguments["pitch"]
+    start_time = arguments["time"]
+    duration = arguments["duration"]
+    velocity = arguments.get("velocity", 64)
+    channel = arguments.get("channel", 0)
+    
+    song.add_note(
+        pitch=pitch,
+        time=start_time,
+        duration=duration,
+        velocity=velocity,
+        channel=channel
+    )
+    
+    return [types.TextContent(type="text", text=f"Added note {pitch} at time {start_time}s with duration {duration}s to song '{song.name}'")]
+
+async def _tool_add_chord(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Add a chord to the current song"""
+    if not arguments or "notes" not in arguments or "time" not in arguments or "duration" not in arguments:
+        raise ValueError("Missing required arguments")
+    
+    song = midi_manager.song_manager.current_song
+    if not song:
+        return [_NO_CURRENT_SONG]
+    
+    notes = arguments["notes"]
+    start_time = arguments["time"]
+    duration = arguments["duration"]
+    velocity = arguments.get("velocity", 64)
+    channel = arguments.get("channel", 0)
+    
+    song.add_chord(
+        notes=notes,
+        time=start_time,
+        duration=duration,
+        velocity=velocity,
+        channel=channel
+    )
+    
+    return [types.TextContent(type="text", text=f"Added chord {notes} at time {start_time}s with duration {duration}s to song '{song.name}'")]
+
+async def _tool_add_program_change(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Add a program change to the current song"""
+    if not arguments or "program" not in arguments or "time" not in arguments:
+        raise ValueError("Missing required arguments")
+    
+    song = midi_manager.song_manager.current_song
+    if not song:
+        return [_NO_CURRENT_SONG]
+    
+    program = arguments["program"]
+    start_time = arguments["time"]
+    channel = arguments.get("channel", 0)
+    
+    song.add_program_change(
+        program=program,
+        time=start_time,
+        channel=channel
+    )
+    
+    return [types.TextContent(type="text", text=f"Added program change to {program} at time {start_time}s to song '{song.name}'")]
+
+async def _tool_play_song(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Play a song by name"""
+    if not arguments or "name" not in arguments:
+        raise ValueError("Missing name argument")
+    
+    name = arguments["name"]
+    success = midi_manager.song_manager.play_song(name)
+    if success:
+        return [types.TextContent(type="text", text=f"Playing song '{name}'")]
+    else:
+        return [types.TextContent(type="text", text=f"Failed to play song '{name}'. Make sure it exists.")]
+
+async def _tool_stop_song(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Stop the current song"""
+    success = midi_manager.song_manager.stop_current_song()
+    midi_manager.all_notes_off()
+    if success:
+        return [types.TextContent(type="text", text="Stopped the current song")]
+    else:
+        return [types.TextContent(type="text", text="No song is currently playing")]
+
+async def _tool_list_songs(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """List the loaded songs"""
+    songs = midi_manager.song_manager.get_all_songs()
+    if not songs:
+        return [types.TextContent(type="text", text="No songs available. Use create_song to create a new song.")]
+    
+    # join builds a list from a generator anyway, so hand it one directly
+    song_list = "\n".join([
+        f"- {name} (duration: {song.duration:.2f}s, tempo: {song.tempo} BPM)"
+        for name, song in songs.items()
+    ])
+    return [types.TextContent(type="text", text="Available songs:\n" + song_list)]
+
+# Tracker tools
+
+async def _tool_load_tracker_content(
+    midi_manager: MidiManager, arguments: Optional[Dict[str, Any]]
+) -> List[types.TextContent]:
+    """Create a song from tracker format text"""
+    if not arguments or "content" not in arguments or "name" not in arguments:
+        raise ValueError("Missing content or name argument")
+    
+    content = arguments["content"]
+    song_name = arguments["name"]
+    
+    result = create_midi_song(midi_manager.song_manager, song_name, content)
+    
+    if result["status"] == "success":
+        song_data = result["song_data"]
+        return [types.TextContent(type="text", text=f"{result['message']}\nSong: {song_data['name']}\nTempo: {song_data['tempo']} BPM\nNotes: {song_data['notes']}\n\nUse play_song name=\"{song_name}\" to play it")]
+    else:
+        return [types.TextContent(type="text", text=f"Error: {result['message']}")]
+
+# Tool name -> handler, each called with the MidiManager and the tool's arguments
+_TOOL_HANDLERS = {
+    "discover_ports": _tool_discover_ports,
+    "connect_port": _tool_connect_port,
+    "note_on": _tool_note_on,
+    "note_off": _tool_note_off,
+    "program_change": _tool_program_change,
+    "control_change": _tool_control_change,
+    "create_song": _tool_create_song,
+    "create_scale": _tool_create_scale,
+    "add_note": _tool_add_note,
+    "add_chord": _tool_add_chord,
+    "add_program_change": _tool_add_program_change,
+    "play_song": _tool_play_song,
+    "stop_song": _tool_stop_song,
+    "list_songs": _tool_list_songs,
+    "load_tracker_content": _tool_load_tracker_content,
+}
+
 async def main():
     """Main entry point for the MCP MIDI server"""
+    if sys.platform == "win32":
+        _reconfigure_windows_stdio()
+    
     logger.info("Starting MCP MIDI server")
     
     midi_manager = MidiManager()
@@ -263,13 +887,7 @@ async def main():
     async def handle_list_prompts() -> list[types.Prompt]:
         """List available prompts"""
         logger.debug("Handling list_prompts request")
-        return [
-            types.Prompt(
-                name="midi-intro",
-                description="Introduction to controlling MIDI devices",
-                arguments=[],
-            )
-        ]
+        return list(PROMPTS)
     
     @server.get_prompt()
     async def handle_get_prompt(name: str, arguments: dict[str, str] | None) -> types.GetPromptResult:
@@ -279,409 +897,30 @@ async def main():
             logger.error(f"Unknown prompt: {name}")
             raise ValueError(f"Unknown prompt: {name}")
         
-        prompt = PROMPT_TEMPLATE.strip()
-        
-        return types.GetPromptResult(
-            description="Introduction to controlling MIDI devices",
-            messages=[
-                types.PromptMessage(
-                    role="user",
-                    content=types.TextContent(type="text", text=prompt),
-                )
-            ],
-        )
+        return MIDI_INTRO_PROMPT
     
     @server.list_tools()
     async def handle_list_tools() -> list[types.Tool]:
         """List available tools"""
         logger.debug("Handling list_tools request")
-        return [
-            types.Tool(
-                name="discover_ports",
-                description="List all available MIDI output ports",
-                inputSchema={
-                    "type": "object",
-                    "properties": {},
-                },
-            ),
-            types.Tool(
-                name="connect_port",
-                description="Connect to a specific MIDI output port",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "port_id": {"type": "integer", "description": "ID of the MIDI port to connect to"},
-                    },
-                    "required": ["port_id"],
-                },
-            ),
-            types.Tool(
-                name="note_on",
-                description="Play a note on the MIDI device",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "note": {"type": "integer", "description": "MIDI note number (0-127)"},
-                        "velocity": {"type": "integer", "description": "Velocity (0-127)"},
-                        "channel": {"type": "integer", "description": "MIDI channel (0-15)"},
-                    },
-                    "required": ["note"],
-                },
-            ),
-            types.Tool(
-                name="note_off",
-                description="Stop a note on the MIDI device",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "note": {"type": "integer", "description": "MIDI note number (0-127)"},
-                        "channel": {"type": "integer", "description": "MIDI channel (0-15)"},
-                    },
-                    "required": ["note"],
-                },
-            ),
-            types.Tool(
-                name="program_change",
-                description="Change the instrument sound on the MIDI device",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "program": {"type": "integer", "description": "Program/instrument number (0-127)"},
-                        "channel": {"type": "integer", "description": "MIDI channel (0-15)"},
-                    },
-                    "required": ["program"],
-                },
-            ),
-            types.Tool(
-                name="control_change",
-                description="Change a controller value on the MIDI device",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "control": {"type": "integer", "description": "Controller number (0-127)"},
-                        "value": {"type": "integer", "description": "Control value (0-127)"},
-                        "channel": {"type": "integer", "description": "MIDI channel (0-15)"},
-                    },
-                    "required": ["control", "value"],
-                },
-            ),
-            # Song-related tools
-            types.Tool(
-                name="create_song",
-                description="Create a new empty song",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "name": {"type": "string", "description": "Name of the song"},
-                        "tempo": {"type": "integer", "description": "Tempo in BPM (beats per minute)"},
-                    },
-                    "required": ["name"],
-                },
-            ),
-            types.Tool(
-                name="create_scale",
-                description="Create a new song with a musical scale",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "name": {"type": "string", "description": "Name of the song"},
-                        "root_note": {"type": "integer", "description": "Root note of the scale (0-127)"},
-                        "scale_type": {"type": "string", "description": "Type of scale (major, minor, pentatonic, blues, chromatic)"},
-                        "octaves": {"type": "integer", "description": "Number of octaves"},
-                        "duration": {"type": "number", "description": "Duration of each note in seconds"},
-                    },
-                    "required": ["name", "root_note", "scale_type"],
-                },
-            ),
-            types.Tool(
-                name="add_note",
-                description="Add a note to the current song",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "pitch": {"type": "integer", "description": "MIDI note number (0-127)"},
-                        "time": {"type": "number", "description": "Time in seconds when the note should start"},
-                        "duration": {"type": "number", "description": "Duration of the note in seconds"},
-                        "velocity": {"type": "integer", "description": "Velocity (0-127)"},
-                        "channel": {"type": "integer", "description": "MIDI channel (0-15)"},
-                    },
-                    "required": ["pitch", "time", "duration"],
-                },
-            ),
-            types.Tool(
-                name="add_chord",
-                description="Add a chord to the current song",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "notes": {"type": "array", "items": {"type": "integer"}, "description": "List of MIDI note numbers"},
-                        "time": {"type": "number", "description": "Time in seconds when the chord should start"},
-                        "duration": {"type": "number", "description": "Duration of the chord in seconds"},
-                        "velocity": {"type": "integer", "description": "Velocity (0-127)"},
-                        "channel": {"type": "integer", "description": "MIDI channel (0-15)"},
-                    },
-                    "required": ["notes", "time", "duration"],
-                },
-            ),
-            types.Tool(
-                name="add_program_change",
-                description="Add a program change to the current song",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "program": {"type": "integer", "description": "Program/instrument number (0-127)"},
-                        "time": {"type": "number", "description": "Time in seconds when the program change should occur"},
-                        "channel": {"type": "integer", "description": "MIDI channel (0-15)"},
-                    },
-                    "required": ["program", "time"],
-                },
-            ),
-            types.Tool(
-                name="play_song",
-                description="Play a song by name",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "name": {"type": "string", "description": "Name of the song to play"},
-                    },
-                    "required": ["name"],
-                },
-            ),
-            types.Tool(
-                name="stop_song",
-                description="Stop the currently playing song",
-                inputSchema={
-                    "type": "object",
-                    "properties": {},
-                },
-            ),
-            types.Tool(
-                name="list_songs",
-                description="List all available songs",
-                inputSchema={
-                    "type": "object",
-                    "properties": {},
-                },
-            ),
-            # Tracker tools
-            types.Tool(
-                name="load_tracker_content",
-                description="Load a tracker file from a text string",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "content": {"type": "string", "description": "Tracker file content as text"},
-                        "name": {"type": "string", "description": "Name for the tracker song"},
-                    },
-                    "required": ["content", "name"],
-                },
-            ),
-        ]
+        return list(TOOLS)
     
     @server.call_tool()
     async def handle_call_tool(
         name: str, arguments: dict[str, Any] | None
     ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
         """Handle tool execution requests"""
-        logger.debug(f"Handling call_tool request for {name} with args {arguments}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Handling call_tool request for %s with args %s", name, arguments)
         try:
-            # Standard MIDI tools
-            if name == "discover_ports":
-                ports = midi_manager.discover_ports()
-                return [types.TextContent(type="text", text=str(ports))]
-            
-            elif name == "connect_port":
-                if not arguments or "port_id" not in arguments:
-                    raise ValueError("Missing port_id argument")
-                
-                success = midi_manager.connect_port(arguments["port_id"])
-                if success:
-                    return [types.TextContent(type="text", text=f"Connected to MIDI port {arguments['port_id']}: {midi_manager.ports[arguments['port_id']]['name']}")]
-                else:
-                    return [types.TextContent(type="text", text=f"Failed to connect to MIDI port {arguments['port_id']}")]
-            
-            elif name == "note_on":
-                if not arguments or "note" not in arguments:
-                    raise ValueError("Missing note argument")
-                
-                velocity = arguments.get("velocity", 64)
-                channel = arguments.get("channel", 0)
-                
-                success = midi_manager.send_note_on(arguments["note"], velocity, channel)
-                if success:
-                    return [types.TextContent(type="text", text=f"Played note {arguments['note']} with velocity {velocity} on channel {channel}")]
-                else:
-                    return [types.TextContent(type="text", text=f"Failed to play note {arguments['note']}")]
-            
-            elif name == "note_off":
-                if not arguments or "note" not in arguments:
-                    raise ValueError("Missing note argument")
-                
-                channel = arguments.get("channel", 0)
-                
-                success = midi_manager.send_note_off(arguments["note"], channel)
-                if success:
-                    return [types.TextContent(type="text", text=f"Stopped note {arguments['note']} on channel {channel}")]
-                else:
-                    return [types.TextContent(type="text", text=f"Failed to stop note {arguments['note']}")]
-            
-            elif name == "program_change":
-                if not arguments or "program" not in arguments:
-                    raise ValueError("Missing program argument")
-                
-                channel = arguments.get("channel", 0)
-                
-                success = midi_manager.send_program_change(arguments["program"], channel)
-                if success:
-                    return [types.TextContent(type="text", text=f"Changed to program/instrument {arguments['program']} on channel {channel}")]
-                else:
-                    return [types.TextContent(type="text", text=f"Failed to change to program/instrument {arguments['program']}")]
-            
-            elif name == "control_change":
-                if not arguments or "control" not in arguments or "value" not in arguments:
-                    raise ValueError("Missing control or value argument")
-                
-                channel = arguments.get("channel", 0)
-                
-                success = midi_manager.send_control_change(arguments["control"], arguments["value"], channel)
-                if success:
-                    return [types.TextContent(type="text", text=f"Changed controller {arguments['control']} to value {arguments['value']} on channel {channel}")]
-                else:
-                    return [types.TextContent(type="text", text=f"Failed to change controller {arguments['control']}")]
-            
-            # Song-related tools
-            elif name == "create_song":
-                if not arguments or "name" not in arguments:
-                    raise ValueError("Missing name argument")
-                
-                tempo = arguments.get("tempo", 120)
-                song = Song(name=arguments["name"], tempo=tempo)
-                midi_manager.song_manager.add_song(song)
-                midi_manager.song_manager.set_current_song(arguments["name"])
-                
-                return [types.TextContent(type="text", text=f"Created new song '{arguments['name']}' with tempo {tempo} BPM")]
-            
-            elif name == "create_scale":
-                if not arguments or "name" not in arguments or "root_note" not in arguments or "scale_type" not in arguments:
-                    raise ValueError("Missing required arguments")
-                
-                octaves = arguments.get("octaves", 1)
-                duration = arguments.get("duration", 0.5)
-                
-                song = midi_manager.song_manager.create_scale_song(
-                    name=arguments["name"],
-                    root_note=arguments["root_note"],
-                    scale_type=arguments["scale_type"],
-                    octaves=octaves,
-                    duration=duration
-                )
-                
-                midi_manager.song_manager.set_current_song(arguments["name"])
-                
-                return [types.TextContent(type="text", text=f"Created scale song '{arguments['name']}' with root note {arguments['root_note']} ({arguments['scale_type']} scale), {octaves} octaves, and note duration {duration}s")]
-            
-            elif name == "add_note":
-                if not arguments or "pitch" not in arguments or "time" not in arguments or "duration" not in arguments:
-                    raise ValueError("Missing required arguments")
-                
-                if not midi_manager.song_manager.current_song:
-                    return [types.TextContent(type="text", text="No current song selected. Please create a song first.")]
-                
-                velocity = arguments.get("velocity", 64)
-                channel = arguments.get("channel", 0)
-                
-                midi_manager.song_manager.current_song.add_note(
-                    pitch=arguments["pitch"],
-                    time=arguments["time"],
-                    duration=arguments["duration"],
-                    velocity=velocity,
-                    channel=channel
-                )
-                
-                return [types.TextContent(type="text", text=f"Added note {arguments['pitch']} at time {arguments['time']}s with duration {arguments['duration']}s to song '{midi_manager.song_manager.current_song.name}'")]
-            
-            elif name == "add_chord":
-                if not arguments or "notes" not in arguments or "time" not in arguments or "duration" not in arguments:
-                    raise ValueError("Missing required arguments")
-                
-                if not midi_manager.song_manager.current_song:
-                    return [types.TextContent(type="text", text="No current song selected. Please create a song first.")]
-                
-                velocity = arguments.get("velocity", 64)
-                channel = arguments.get("channel", 0)
-                
-                midi_manager.song_manager.current_song.add_chord(
-                    notes=arguments["notes"],
-                    time=arguments["time"],
-                    duration=arguments["duration"],
-                    velocity=velocity,
-                    channel=channel
-                )
-                
-                return [types.TextContent(type="text", text=f"Added chord {arguments['notes']} at time {arguments['time']}s with duration {arguments['duration']}s to song '{midi_manager.song_manager.current_song.name}'")]
-            
-            elif name == "add_program_change":
-                if not arguments or "program" not in arguments or "time" not in arguments:
-                    raise ValueError("Missing required arguments")
-                
-                if not midi_manager.song_manager.current_song:
-                    return [types.TextContent(type="text", text="No current song selected. Please create a song first.")]
-                
-                channel = arguments.get("channel", 0)
-                
-                midi_manager.song_manager.current_song.add_program_change(
-                    program=arguments["program"],
-                    time=arguments["time"],
-                    channel=channel
-                )
-                
-                return [types.TextContent(type="text", text=f"Added program change to {arguments['program']} at time {arguments['time']}s to song '{midi_manager.song_manager.current_song.name}'")]
-            
-            elif name == "play_song":
-                if not arguments or "name" not in arguments:
-                    raise ValueError("Missing name argument")
-                
-                success = midi_manager.song_manager.play_song(arguments["name"])
-                if success:
-                    return [types.TextContent(type="text", text=f"Playing song '{arguments['name']}'")]
-                else:
-                    return [types.TextContent(type="text", text=f"Failed to play song '{arguments['name']}'. Make sure it exists.")]
+            if name in _SENDING_TOOLS:
+                midi_manager.ensure_connected()
             
-            elif name == "stop_song":
-                success = midi_manager.song_manager.stop_current_song()
-                if success:
-                    return [types.TextContent(type="text", text="Stopped the current song")]
-                else:
-                    return [types.TextContent(type="text", text="No song is currently playing")]
-            
-            elif name == "list_songs":
-                songs = midi_manager.song_manager.get_all_songs()
-                if not songs:
-                    return [types.TextContent(type="text", text="No songs available. Use create_song to create a new song.")]
-                
-                song_list = []
-                for name, song in songs.items():
-                    song_list.append(f"- {name} (duration: {song.duration:.2f}s, tempo: {song.tempo} BPM)")
-                
-                return [types.TextContent(type="text", text="Available songs:\n" + "\n".join(song_list))]
-            
-            # Tracker tools
-            elif name == "load_tracker_content":
-                if not arguments or "content" not in arguments or "name" not in arguments:
-                    raise ValueError("Missing content or name argument")
-                
-                content = arguments["content"]
-                song_name = arguments["name"]
-                
-                result = create_midi_song(midi_manager.song_manager, song_name, content)
-                
-                if result["status"] == "success":
-                    return [types.TextContent(type="text", text=f"{result['message']}\nSong: {result['song_data']['name']}\nTempo: {result['song_data']['tempo']} BPM\nNotes: {result['song_data']['notes']}\n\nUse play_song name=\"{song_name}\" to play it")]
-                else:
-                    return [types.TextContent(type="text", text=f"Error: {result['message']}")]
-            
-            else:
+            handler = _TOOL_HANDLERS.get(name)
+            if handler is None:
                 raise ValueError(f"Unknown tool: {name}")
+            
+            return await handler(midi_manager, arguments)
         
         except Exception as e:
             logger.error(f"Error in tool {name}: {str(e)}")
@@ -0,0 +1,116 @@
+"""
+Standard MIDI File Reader
+Reads the channel messages and tempo changes of a MIDI file straight from
+its bytes, without building mido message objects
+"""
+import struct
+from typing import List, Tuple, Union
+
+# (absolute tick, status byte, first data byte, second data byte or 0)
+ChannelEvent = Tuple[int, int, int, int]
+
+# Channel message kinds read into events; others are skipped
+_KEPT_KINDS = frozenset((0x80, 0x90, 0xB0, 0xC0))
+
+# Data byte counts for system common messages (0xF1-0xF6)
+_SYSTEM_COMMON_LENGTHS = {0xF1: 1, 0xF2: 2, 0xF3: 1}
+
+def read_smf(
+    data: Union[bytes, memoryview]
+) -> Tuple[int, List[List[ChannelEvent]], List[Tuple[int, int]]]:
+    """Read a Standard MIDI File
+    
+    Args:
+        data: The file's bytes (anything indexable to ints, e.g. an mmap)
+    
+    Returns:
+        The ticks per beat, each track's note on/off, control change and
+        program change events in order, and (absolute tick, tempo) for every
+        set_tempo in the file
+    """
+    if data[:4] != b'MThd':
+        raise ValueError("not a MIDI file (missing MThd header)")
+    
+    header_length, _, track_count, ticks_per_beat = struct.unpack_from('>IHHH', data, 4)
+    pos = 8 + header_length
+    
+    tracks = []
+    tempo_changes = []
+    while len(tracks) < track_count and pos + 8 <= len(data):
+        chunk_type = data[pos:pos + 4]
+        (chunk_length,) = struct.unpack_from('>I', data, pos + 4)
+        pos += 8
+        end = pos + chunk_length
+        if chunk_type != b'MTrk':
+            pos = end
+            continue
+        
+        events = []
+        tick = 0
+        running_status = None
+        while pos < end:
+            # Delta time, as a variable-length quantity
+            byte = data[pos]
+            pos += 1
+            delta = byte & 0x7F
+            while byte & 0x80:
+                byte = data[pos]
+                pos += 1
+                delta = (delta << 7) | (byte & 0x7F)
+            tick += delta
+            
+            status = data[pos]
+            if status & 0x80:
+                pos += 1
+                if status < 0xF0:
+                    running_status = status
+            elif running_status is None:
+                raise ValueError("running status without a previous status byte")
+            else:
+                status = running_status
+            
+            if status == 0xFF:
+                # Meta event: type, length, data
+                meta_type = data[pos]
+                pos += 1
+                byte = data[pos]
+                pos += 1
+                length = byte & 0x7F
+                while byte & 0x80:
+                    byte = data[pos]
+                    pos += 1
+                    length = (length << 7) | (byte & 0x7F)
+                if meta_type == 0x51 and length == 3:
+                    tempo_changes.append((tick, (data[pos] << 16) | (data[pos + 1] << 8) | data[pos + 2]))
+                pos += length
+            
+            elif status == 0xF0 or status == 0xF7:
+                # Sysex: length, data
+                byte = data[pos]
+                pos += 1
+                length = byte & 0x7F
+                while byte & 0x80:
+                    byte = data[pos]
+                    pos += 1
+                    length = (length << 7) | (byte & 0x7F)
+                pos += length
+            
+            elif status >= 0xF0:
+                pos += _SYSTEM_COMMON_LENGTHS.get(status, 0)
+            
+            else:
+                kind = status & 0xF0
+                data1 = data[pos]
+                if kind == 0xC0 or kind == 0xD0:
+                    data2 = 0
+                    pos += 1
+                else:
+                    data2 = data[pos + 1]
+                    pos += 2
+                if kind in _KEPT_KINDS:
+                    events.append((tick, status, data1, data2))
+        
+        pos = end
+        tracks.append(events)
+    
+    return ticks_per_beat, tracks, tempo_changes
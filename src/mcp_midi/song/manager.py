@@ -6,26 +6,42 @@ import asyncio
 import json
 import logging
 import os
+import weakref
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union, Callable
+from typing import Dict, List, Optional, Any, Tuple, Union, Callable
 
-from .song import Song
+from .song import Song, Note, Chord
 
 logger = logging.getLogger("mcp_midi.song.manager")
 
+# Scale intervals (semitones), each ending on the octave
+_SCALE_INTERVALS = {
+    "major": (0, 2, 4, 5, 7, 9, 11, 12),  # Major scale intervals
+    "minor": (0, 2, 3, 5, 7, 8, 10, 12),  # Natural minor scale intervals
+    "pentatonic": (0, 2, 4, 7, 9, 12),    # Pentatonic scale intervals
+    "blues": (0, 3, 5, 6, 7, 10, 12),     # Blues scale intervals
+    "chromatic": tuple(range(13))         # Chromatic scale intervals
+}
+
 class SongManager:
     """Manages multiple songs for MCP-MIDI"""
     def __init__(self):
         self.songs: Dict[str, Song] = {}
         self.current_song: Optional[Song] = None
         self.send_midi_callback: Optional[Callable] = None
+        self.send_midi_batch_callback: Optional[Callable] = None
     
     def set_midi_callback(self, callback: Callable) -> None:
-        """Set the callback function for sending MIDI messages"""
+        """Set the callback function for sending MIDI messages
+        
+        Songs read the manager's callbacks through a weak reference to it,
+        so setting one doesn't need to visit every song.
+        """
         self.send_midi_callback = callback
-        # Update all songs with this callback
-        for song in self.songs.values():
-            song.set_midi_callback(callback)
+    
+    def set_midi_batch_callback(self, callback: Optional[Callable]) -> None:
+        """Set the callback function for sending raw messages due at the same time"""
+        self.send_midi_batch_callback = callback
     
     def add_song(self, song: Song) -> None:
         """Add a song to the manager"""
@@ -37,10 +53,7 @@ class SongManager:
             song.name = f"{song.name}_{i}"
         
         self.songs[song.name] = song
-        
-        # Set the MIDI callback if it exists
-        if self.send_midi_callback:
-            song.set_midi_callback(self.send_midi_callback)
+        song._manager_ref = weakref.ref(self)
     
     def remove_song(self, name: str) -> bool:
         """Remove a song from the manager"""
@@ -50,7 +63,7 @@ class SongManager:
                 self.stop_current_song()
                 self.current_song = None
             
-            del self.songs[name]
+            self.songs.pop(name)._manager_ref = None
             return True
         return False
     
@@ -73,22 +86,40 @@ class SongManager:
             return True
         return False
     
+    def _switch_current_song(self, song: Song) -> None:
+        """Make a song current, stopping the current one if it's another song and playing"""
+        current = self.current_song
+        if current is not None and current is not song and current._is_playing:
+            self.stop_current_song()
+        self.current_song = song
+    
     def play_song(self, name: str) -> bool:
         """Play a song by name"""
         if not self.send_midi_callback:
             logger.error("No MIDI callback set for playback")
             return False
         
-        if name in self.songs:
-            # Stop current song if it's different and playing
-            if self.current_song and self.current_song.name != name and self.current_song._is_playing:
-                self.stop_current_song()
-            
-            self.current_song = self.songs[name]
-            self.current_song.start_playback()
-            return True
+        song = self.songs.get(name)
+        if song is None:
+            return False
         
-        return False
+        self._switch_current_song(song)
+        song.start_playback()
+        return True
+    
+    async def play_song_async(self, name: str) -> bool:
+        """Play a song by name and wait until playback finishes"""
+        if not self.send_midi_callback:
+            logger.error("No MIDI callback set for playback")
+            return False
+        
+        song = self.songs.get(name)
+        if song is None:
+            return False
+        
+        self._switch_current_song(song)
+        await song.play()
+        return True
     
     def play_current_song(self) -> bool:
         """Play the current song"""
@@ -118,24 +149,28 @@ class SongManager:
             return False
         
         song = self.songs[name]
-        json_data = song.to_json()
         
         try:
-            with open(path, 'w') as f:
-                f.write(json_data)
+            with open(path, 'wb') as f:
+                song.dump_to(f)
             logger.info(f"Saved song '{name}' to {path}")
             return True
         except Exception as e:
             logger.error(f"Error saving song '{name}' to {path}: {e}")
             return False
     
+    @staticmethod
+    def _read_song(path: str) -> Song:
+        """Read and parse a song file, without adding it to the manager"""
+        with open(path, 'rb') as f:
+            json_data = f.read()
+        
+        return Song.from_json(json_data)
+    
     def load_song(self, path: str) -> Optional[Song]:
         """Load a song from a file"""
         try:
-            with open(path, 'r') as f:
-                json_data = f.read()
-            
-            song = Song.from_json(json_data)
+            song = self._read_song(path)
             self.add_song(song)
             logger.info(f"Loaded song '{song.name}' from {path}")
             return song
@@ -154,19 +189,76 @@ class SongManager:
         
         return results
     
+    @staticmethod
+    def _song_files(directory: str) -> Optional[List[Tuple[str, str]]]:
+        """List the (filename, path) of each song file in a directory
+        
+        Returns None, after logging, if the directory doesn't exist. The
+        directory is scanned once; scandir entries already know whether
+        they are files, so nothing is stat'ed separately.
+        """
+        try:
+            with os.scandir(directory) as entries:
+                return [
+                    (entry.name, entry.path) for entry in entries
+                    if entry.name.endswith('.json') and entry.is_file()
+                ]
+        except (FileNotFoundError, NotADirectoryError):
+            logger.error(f"Directory not found: {directory}")
+            return None
+    
     def load_all_songs(self, directory: str) -> Dict[str, bool]:
         """Load all songs from a directory"""
         results = {}
         
-        if not os.path.exists(directory) or not os.path.isdir(directory):
-            logger.error(f"Directory not found: {directory}")
+        song_files = self._song_files(directory)
+        if song_files is None:
+            return results
+        
+        for filename, path in song_files:
+            song = self.load_song(path)
+            results[filename] = song is not None
+        
+        return results
+    
+    async def save_all_songs_async(self, directory: str) -> Dict[str, bool]:
+        """Save all songs to a directory, writing the files concurrently"""
+        os.makedirs(directory, exist_ok=True)
+        
+        # Snapshot the names, since songs may be added while files are written
+        names = list(self.songs)
+        saved = await asyncio.gather(*(
+            asyncio.to_thread(self.save_song, name, os.path.join(directory, f"{name}.json"))
+            for name in names
+        ))
+        return dict(zip(names, saved))
+    
+    async def load_all_songs_async(self, directory: str) -> Dict[str, bool]:
+        """Load all songs from a directory, reading and parsing the files concurrently
+        
+        Songs are added to the manager on the calling thread, in directory
+        order, so renaming of duplicate names happens as with load_all_songs.
+        """
+        results = {}
+        
+        song_files = self._song_files(directory)
+        if song_files is None:
             return results
         
-        for filename in os.listdir(directory):
-            if filename.endswith('.json'):
-                path = os.path.join(directory, filename)
-                song = self.load_song(path)
-                results[filename] = song is not None
+        songs = await asyncio.gather(
+            *(asyncio.to_thread(self._read_song, path) for _, path in song_files),
+            return_exceptions=True
+        )
+        
+        for (filename, path), song in zip(song_files, songs):
+            if isinstance(song, Exception):
+                logger.error(f"Error loading song from {path}: {song}")
+                results[filename] = False
+                continue
+            
+            self.add_song(song)
+            logger.info(f"Loaded song '{song.name}' from {path}")
+            results[filename] = True
         
         return results
     
@@ -197,54 +289,34 @@ class SongManager:
         octaves: int = 1, duration: float = 0.5
     ) -> Song:
         """Create a song with a musical scale"""
-        # Define scale intervals (semitones)
-        scale_intervals = {
-            "major": [0, 2, 4, 5, 7, 9, 11, 12],  # Major scale intervals
-            "minor": [0, 2, 3, 5, 7, 8, 10, 12],  # Natural minor scale intervals
-            "pentatonic": [0, 2, 4, 7, 9, 12],    # Pentatonic scale intervals
-            "blues": [0, 3, 5, 6, 7, 10, 12],     # Blues scale intervals
-            "chromatic": list(range(13))          # Chromatic scale intervals
-        }
-        
-        if scale_type not in scale_intervals:
+        if scale_type not in _SCALE_INTERVALS:
             logger.warning(f"Unknown scale type: {scale_type}")
             scale_type = "major"  # Default to major scale
         
-        intervals = scale_intervals[scale_type]
-        song = Song(name=name, tempo=120)
+        intervals = _SCALE_INTERVALS[scale_type]
+        descending = intervals[::-1]
         
-        # Create ascending and descending scale
-        current_time = 0.0
-        
-        # Ascending scale
+        # Ascending scale, sharing each octave's top note with the next octave's root
+        pitches = []
         for octave in range(octaves):
-            for interval in intervals[:-1] if octave < octaves - 1 else intervals:
-                note = root_note + octave * 12 + interval
-                song.add_note(
-                    pitch=note,
-                    time=current_time,
-                    duration=duration,
-                    velocity=64,
-                    channel=0
-                )
-                current_time += duration
-        
-        # Descending scale (excluding the last note which is the same as the first note of the descent)
-        for octave in range(octaves-1, -1, -1):
-            for interval in reversed(intervals):
-                if octave == octaves-1 and interval == intervals[-1]:
-                    continue  # Skip the highest note (already played)
-                
-                note = root_note + octave * 12 + interval
-                song.add_note(
-                    pitch=note,
-                    time=current_time,
-                    duration=duration,
-                    velocity=64,
-                    channel=0
-                )
-                current_time += duration
+            base = root_note + octave * 12
+            pitches.extend(base + interval for interval in (intervals[:-1] if octave < octaves - 1 else intervals))
+        
+        # Descending scale, skipping the highest note (already played)
+        for octave in range(octaves - 1, -1, -1):
+            base = root_note + octave * 12
+            pitches.extend(base + interval for interval in (descending[1:] if octave == octaves - 1 else descending))
+        
+        # The notes are built directly and added in one go rather than
+        # through add_note per note
+        notes = []
+        current_time = 0.0
+        for pitch in pitches:
+            notes.append(Note(current_time, duration, 0, pitch, 64))
+            current_time += duration
         
+        song = Song(name=name, tempo=120)
+        song.add_events(notes)
         song.duration = current_time
         self.add_song(song)
         return song
@@ -254,22 +326,16 @@ class SongManager:
         durations: List[float]
     ) -> Song:
         """Create a song with a chord progression"""
-        song = Song(name=name, tempo=120)
-        
+        chords = []
         current_time = 0.0
         for chord_intervals, duration in zip(chord_progression, durations):
             # Create a chord from the intervals
             chord_notes = [root_note + interval for interval in chord_intervals]
-            
-            song.add_chord(
-                notes=chord_notes,
-                time=current_time,
-                duration=duration,
-                velocity=64,
-                channel=0
-            )
+            chords.append(Chord(current_time, duration, 0, chord_notes, 64))
             current_time += duration
         
+        song = Song(name=name, tempo=120)
+        song.add_events(chords)
         song.duration = current_time
         self.add_song(song)
         return song
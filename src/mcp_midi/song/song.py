@@ -5,17 +5,33 @@ Provides functionality for sequencing and playing back MIDI notes
 import asyncio
 import json
 import logging
-import time
+import weakref
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List, Optional, Any, Union, Callable
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import BinaryIO, ClassVar, Dict, List, Optional, Any, Union, Callable
 
 import mido
 
+try:
+    import orjson
+except ImportError:  # optional, the standard library is used without it
+    orjson = None
+
 from ..all_notes_off import register_note_on, register_note_off, all_notes_off
 
 logger = logging.getLogger("mcp_midi.song")
 
+# Order of messages at the same time in a playback timeline
+_NOTE_OFF_ORDER = 0
+_EVENT_ORDER = 1
+_ZERO_LENGTH_NOTE_OFF_ORDER = 2
+
+# Messages due sooner than this are sent straight away; waiting on the event
+# loop for a shorter gap costs more than the gap itself
+_MIN_WAIT = 0.001
+
 class NoteType(Enum):
     """Types of MIDI events in a song"""
     NOTE = "note"  # Note with duration (combines note_on and note_off)
@@ -25,62 +41,72 @@ class NoteType(Enum):
     CONTROL_CHANGE = "control_change"  # Change controller value
 
 
-@dataclass
+# Events are slotted: a song can hold thousands of them, and slots drop the
+# per-instance __dict__ and make attribute reads during playback cheaper.
+# Each class's event_type is a class attribute, not a field, so it isn't
+# passed to or set by every constructor call
+
+@dataclass(slots=True)
 class MidiEvent:
     """Base class for MIDI events in a song"""
-    event_type: NoteType
+    event_type: ClassVar[NoteType]
     time: float = 0.0  # Time in seconds (when to play this event)
     duration: float = 0.0  # Duration in seconds (for NOTE and CHORD types)
     channel: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Note(MidiEvent):
     """A single note with pitch, velocity, and duration"""
+    event_type: ClassVar[NoteType] = NoteType.NOTE
     pitch: int = 60  # MIDI note number (0-127)
     velocity: int = 64  # Velocity (0-127)
-    
-    def __post_init__(self):
-        self.event_type = NoteType.NOTE
 
 
-@dataclass
+@dataclass(slots=True)
 class Chord(MidiEvent):
     """Multiple notes played simultaneously"""
+    event_type: ClassVar[NoteType] = NoteType.CHORD
     notes: List[int] = None  # List of MIDI note numbers
     velocity: int = 64  # Velocity for all notes in the chord
     
     def __post_init__(self):
-        self.event_type = NoteType.CHORD
         if self.notes is None:
             self.notes = []
 
 
-@dataclass
+@dataclass(slots=True)
 class Rest(MidiEvent):
     """A period of silence"""
+    event_type: ClassVar[NoteType] = NoteType.REST
+    
     def __post_init__(self):
-        self.event_type = NoteType.REST
         self.duration = max(0.0, self.duration)
 
 
-@dataclass
+@dataclass(slots=True)
 class ProgramChange(MidiEvent):
     """Change the instrument sound"""
+    event_type: ClassVar[NoteType] = NoteType.PROGRAM_CHANGE
     program: int = 0  # Program/instrument number (0-127)
-    
-    def __post_init__(self):
-        self.event_type = NoteType.PROGRAM_CHANGE
 
 
-@dataclass
+@dataclass(slots=True)
 class ControlChange(MidiEvent):
     """Change a controller value"""
+    event_type: ClassVar[NoteType] = NoteType.CONTROL_CHANGE
     control: int = 0  # Controller number (0-127)
     value: int = 0  # Control value (0-127)
-    
-    def __post_init__(self):
-        self.event_type = NoteType.CONTROL_CHANGE
+
+
+_event_time = attrgetter("time")
+
+# NoteType values as stored in song JSON
+_NOTE_VALUE = NoteType.NOTE.value
+_CHORD_VALUE = NoteType.CHORD.value
+_REST_VALUE = NoteType.REST.value
+_PROGRAM_CHANGE_VALUE = NoteType.PROGRAM_CHANGE.value
+_CONTROL_CHANGE_VALUE = NoteType.CONTROL_CHANGE.value
 
 
 class Song:
@@ -90,21 +116,81 @@ class Song:
         self.tempo = tempo  # BPM (beats per minute)
         self.events: List[MidiEvent] = []
         self.sorted_events: List[MidiEvent] = []  # Events sorted by time
+        # The events list sorted_events was last built from, and how many of
+        # its events it holds, so a re-sort only has to place the new ones
+        self._sorted_source: Optional[List[MidiEvent]] = None
+        self._sorted_count = 0
+        # Messages to send, built from sorted_events by play (see _build_timeline)
+        self._timeline: Optional[List[tuple]] = None
         self.is_sorted = False
-        self.duration = 0.0  # Total duration in seconds
+        # Total duration in seconds, covering the first _duration_count events
+        # (see the duration property)
+        self._duration = 0.0
+        self._duration_count = 0
         self._task = None  # asyncio task for playback
-        self._stop_event = asyncio.Event()  # To signal playback to stop
+        # To signal playback to stop, created when the song is first played
+        self._stop_event: Optional[asyncio.Event] = None
         self._is_playing = False
-        self.send_midi_callback: Optional[Callable] = None
+        # The SongManager holding this song, whose callbacks it falls back to
+        self._manager_ref: Optional[weakref.ref] = None
+        self._send_midi_callback: Optional[Callable] = None
+        # Sends a list of raw (status, data...) tuples in one call
+        self._send_midi_batch_callback: Optional[Callable] = None
+    
+    @property
+    def send_midi_callback(self) -> Optional[Callable]:
+        """The song's own MIDI callback, or else its manager's"""
+        if self._send_midi_callback is not None or self._manager_ref is None:
+            return self._send_midi_callback
+        manager = self._manager_ref()
+        return manager.send_midi_callback if manager is not None else None
+    
+    @send_midi_callback.setter
+    def send_midi_callback(self, callback: Optional[Callable]) -> None:
+        self._send_midi_callback = callback
+    
+    @property
+    def send_midi_batch_callback(self) -> Optional[Callable]:
+        """The song's own batch callback, or else its manager's"""
+        if self._send_midi_batch_callback is not None or self._manager_ref is None:
+            return self._send_midi_batch_callback
+        manager = self._manager_ref()
+        return manager.send_midi_batch_callback if manager is not None else None
+    
+    @send_midi_batch_callback.setter
+    def send_midi_batch_callback(self, callback: Optional[Callable]) -> None:
+        self._send_midi_batch_callback = callback
+    
+    @property
+    def duration(self) -> float:
+        """Total duration in seconds
+        
+        Extended to the end of any events added since it was last read or
+        set, which are only looked at then, in one pass, rather than as
+        each is added.
+        """
+        events = self.events
+        if len(events) > self._duration_count:
+            end = max(event.time + event.duration for event in islice(events, self._duration_count, None))
+            if end > self._duration:
+                self._duration = end
+            self._duration_count = len(events)
+        return self._duration
+    
+    @duration.setter
+    def duration(self, duration: float) -> None:
+        self._duration = duration
+        self._duration_count = len(self.events)
     
     def add_event(self, event: MidiEvent) -> None:
         """Add an event to the song"""
         self.events.append(event)
         self.is_sorted = False
-        # Update duration if this event extends beyond current duration
-        potential_duration = event.time + event.duration
-        if potential_duration > self.duration:
-            self.duration = potential_duration
+    
+    def add_events(self, events: List[MidiEvent]) -> None:
+        """Add several events to the song at once"""
+        self.events.extend(events)
+        self.is_sorted = False
     
     def add_note(
         self, pitch: int, time: float, duration: float, 
@@ -112,7 +198,6 @@ class Song:
     ) -> None:
         """Add a note to the song"""
         note = Note(
-            event_type=NoteType.NOTE,
             pitch=pitch,
             time=time,
             duration=duration,
@@ -127,7 +212,6 @@ class Song:
     ) -> None:
         """Add a chord to the song"""
         chord = Chord(
-            event_type=NoteType.CHORD,
             notes=notes,
             time=time,
             duration=duration,
@@ -139,7 +223,6 @@ class Song:
     def add_rest(self, time: float, duration: float) -> None:
         """Add a rest to the song"""
         rest = Rest(
-            event_type=NoteType.REST,
             time=time,
             duration=duration
         )
@@ -150,7 +233,6 @@ class Song:
     ) -> None:
         """Add a program change to the song"""
         program_change = ProgramChange(
-            event_type=NoteType.PROGRAM_CHANGE,
             program=program,
             time=time,
             channel=channel
@@ -162,7 +244,6 @@ class Song:
     ) -> None:
         """Add a control change to the song"""
         control_change = ControlChange(
-            event_type=NoteType.CONTROL_CHANGE,
             control=control,
             value=value,
             time=time,
@@ -171,19 +252,34 @@ class Song:
         self.add_event(control_change)
     
     def sort_events(self) -> None:
-        """Sort events by time"""
-        self.sorted_events = sorted(self.events, key=lambda e: e.time)
+        """Sort events by time
+        
+        When events have only been added since the last sort, the sorted
+        events are sorted again with the new ones appended. The sort finds
+        the already ordered run and merges the new events into it, and as
+        it is stable the result is the same as sorting every event afresh.
+        """
+        events = self.events
+        sorted_count = self._sorted_count
+        if events is self._sorted_source and sorted_count <= len(events):
+            self.sorted_events = sorted(self.sorted_events + events[sorted_count:], key=_event_time)
+        else:
+            self.sorted_events = sorted(events, key=_event_time)
+        self._sorted_source = events
+        self._sorted_count = len(events)
+        self._timeline = None
         self.is_sorted = True
     
     def clear(self) -> None:
         """Clear all events from the song"""
         self.events = []
         self.sorted_events = []
+        self._timeline = None
         self.is_sorted = True
         self.duration = 0.0
     
-    def to_json(self) -> str:
-        """Convert the song to JSON format"""
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the song to a dict of JSON-compatible values"""
         song_dict = {
             "name": self.name,
             "tempo": self.tempo,
@@ -216,92 +312,192 @@ class Song:
             
             song_dict["events"].append(event_dict)
         
-        return json.dumps(song_dict)
+        return song_dict
+    
+    def to_json(self) -> str:
+        """Convert the song to JSON format"""
+        if orjson is not None:
+            return orjson.dumps(self.to_dict()).decode("utf-8")
+        return json.dumps(self.to_dict())
+    
+    def dump_to(self, fp: BinaryIO) -> None:
+        """Write the song as UTF-8 JSON to a file opened in binary mode
+        
+        With orjson the encoded bytes are written as they are, without
+        decoding them to a str first.
+        """
+        if orjson is not None:
+            fp.write(orjson.dumps(self.to_dict()))
+        else:
+            fp.write(json.dumps(self.to_dict()).encode("utf-8"))
     
     @classmethod
-    def from_json(cls, json_str: str) -> 'Song':
-        """Create a song from JSON format"""
-        data = json.loads(json_str)
+    def from_json(cls, json_str: Union[str, bytes]) -> 'Song':
+        """Create a song from JSON format, as a str or UTF-8 bytes"""
+        data = orjson.loads(json_str) if orjson is not None else json.loads(json_str)
         song = cls(name=data.get("name", "Untitled"), tempo=data.get("tempo", 120))
         
+        # Events are built straight into the list rather than through the
+        # add_* methods
+        events = []
+        append = events.append
         for event_data in data.get("events", []):
             event_type = event_data.get("type")
             time = event_data.get("time", 0.0)
             duration = event_data.get("duration", 0.0)
             channel = event_data.get("channel", 0)
             
-            if event_type == NoteType.NOTE.value:
-                song.add_note(
-                    pitch=event_data.get("pitch", 60),
-                    time=time,
-                    duration=duration,
-                    velocity=event_data.get("velocity", 64),
-                    channel=channel
-                )
+            # Positional arguments follow the dataclass field order:
+            # time, duration, channel, then the event's own fields
+            if event_type == _NOTE_VALUE:
+                append(Note(time, duration, channel,
+                            event_data.get("pitch", 60), event_data.get("velocity", 64)))
             
-            elif event_type == NoteType.CHORD.value:
-                song.add_chord(
-                    notes=event_data.get("notes", []),
-                    time=time,
-                    duration=duration,
-                    velocity=event_data.get("velocity", 64),
-                    channel=channel
-                )
+            elif event_type == _CHORD_VALUE:
+                append(Chord(time, duration, channel,
+                             event_data.get("notes", []), event_data.get("velocity", 64)))
             
-            elif event_type == NoteType.REST.value:
-                song.add_rest(time=time, duration=duration)
+            elif event_type == _REST_VALUE:
+                append(Rest(time, duration))
             
-            elif event_type == NoteType.PROGRAM_CHANGE.value:
-                song.add_program_change(
-                    program=event_data.get("program", 0),
-                    time=time,
-                    channel=channel
-                )
+            elif event_type == _PROGRAM_CHANGE_VALUE:
+                append(ProgramChange(time, 0.0, channel, event_data.get("program", 0)))
             
-            elif event_type == NoteType.CONTROL_CHANGE.value:
-                song.add_control_change(
-                    control=event_data.get("control", 0),
-                    value=event_data.get("value", 0),
-                    time=time,
-                    channel=channel
-                )
+            elif event_type == _CONTROL_CHANGE_VALUE:
+                append(ControlChange(time, 0.0, channel,
+                                     event_data.get("control", 0), event_data.get("value", 0)))
         
+        # The duration is worked out from the events when it's first read
+        song.events = events
         return song
     
     def set_midi_callback(self, callback: Callable) -> None:
         """Set the callback function for sending MIDI messages"""
         self.send_midi_callback = callback
     
+    def set_midi_batch_callback(self, callback: Optional[Callable]) -> None:
+        """Set the callback function for sending raw messages due at the same time
+        
+        When set, playback collects the note_on, program_change and
+        control_change messages of events with equal times and sends them
+        as one list of (status, data1[, data2]) tuples.
+        """
+        self.send_midi_batch_callback = callback
+    
+    def _build_timeline(self) -> List[tuple]:
+        """Expand the sorted events into the messages playback sends
+        
+        Returns (time, order, raw message, message type, callback params)
+        tuples in time order. At equal times note_offs go first, so a note
+        repeated back to back isn't cut short by the previous one's note_off,
+        except for notes with no duration, whose note_off follows their note_on.
+        """
+        timeline = []
+        append = timeline.append
+        
+        # Identical messages share one raw tuple and one params dict, so a
+        # song's repeated notes don't each allocate their own. Callbacks
+        # must not modify the params they're given
+        note_ons = {}
+        note_offs = {}
+        
+        for event in self.sorted_events:
+            event_type = event.event_type
+            time = event.time
+            # Channels are masked to 4 bits and data bytes to 7, as MidiManager's
+            # send methods do, so an out of range channel can't turn the status
+            # into another message kind, and the per-message and batch paths
+            # send the same bytes
+            channel = event.channel & 0x0F
+            
+            if event_type == NoteType.NOTE or event_type == NoteType.CHORD:
+                pitches = (event.pitch,) if event_type == NoteType.NOTE else event.notes
+                velocity = event.velocity & 0x7F
+                if event.duration > 0:
+                    end, off_order = time + event.duration, _NOTE_OFF_ORDER
+                else:
+                    end, off_order = time, _ZERO_LENGTH_NOTE_OFF_ORDER
+                for pitch in pitches:
+                    pitch &= 0x7F
+                    key = (pitch, velocity, channel)
+                    note_on = note_ons.get(key)
+                    if note_on is None:
+                        note_on = note_ons[key] = (
+                            (0x90 | channel, pitch, velocity),
+                            {"note": pitch, "velocity": velocity, "channel": channel},
+                        )
+                    key = (pitch, channel)
+                    note_off = note_offs.get(key)
+                    if note_off is None:
+                        note_off = note_offs[key] = (
+                            (0x80 | channel, pitch, 0),
+                            {"note": pitch, "channel": channel},
+                        )
+                    append((time, _EVENT_ORDER, note_on[0], "note_on", note_on[1]))
+                    append((end, off_order, note_off[0], "note_off", note_off[1]))
+            
+            elif event_type == NoteType.PROGRAM_CHANGE:
+                program = event.program & 0x7F
+                append((time, _EVENT_ORDER, (0xC0 | channel, program), "program_change",
+                        {"program": program, "channel": channel}))
+            
+            elif event_type == NoteType.CONTROL_CHANGE:
+                control = event.control & 0x7F
+                value = event.value & 0x7F
+                append((time, _EVENT_ORDER, (0xB0 | channel, control, value), "control_change",
+                        {"control": control, "value": value, "channel": channel}))
+        
+        # Stable, so events at the same time and order keep the song's order
+        timeline.sort(key=itemgetter(0, 1))
+        return timeline
+    
     async def play(self) -> None:
         """Play the song asynchronously"""
         if self._is_playing:
             logger.warning("Song is already playing")
             return
         
-        if not self.send_midi_callback:
+        # The callbacks are looked up once, rather than per message
+        send_midi_callback = self.send_midi_callback
+        send_midi_batch_callback = self.send_midi_batch_callback
+        if not send_midi_callback:
             logger.error("No MIDI callback set for playback")
             return
         
         if not self.is_sorted:
             self.sort_events()
+        if self._timeline is None:
+            self._timeline = self._build_timeline()
         
         self._is_playing = True
-        self._stop_event.clear()
+        if self._stop_event is None:
+            self._stop_event = asyncio.Event()
+        else:
+            self._stop_event.clear()
         
         logger.info(f"Playing song: {self.name} (duration: {self.duration:.2f}s)")
         
-        # Track active notes to ensure they're turned off if playback is stopped
-        active_notes = {}  # Dict of {(pitch, channel): stop_time}
+        # Every message is timed against the same start on the event loop's
+        # monotonic clock, so time spent sending doesn't accumulate as drift
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
         
-        start_time = time.time()
-        last_event_time = 0.0
+        # Messages for events at batch_time, when sending in batches
+        batch = [] if send_midi_batch_callback else None
+        batch_time = None
         
-        for i, event in enumerate(self.sorted_events):
-            # Calculate how long to wait until this event
-            wait_time = event.time - last_event_time
+        for time, _, message, message_type, params in self._timeline:
+            # Send the previous timestamp's messages before moving on
+            if batch and time != batch_time:
+                send_midi_batch_callback(batch)
+                batch = []
+            batch_time = time
+            
+            # Calculate how long to wait until this message
+            wait_time = start_time + time - loop.time()
             
-            if wait_time > 0:
-                # Wait until it's time to play this event
+            if wait_time >= _MIN_WAIT:
+                # Wait until it's time to send this message
                 try:
                     # Use asyncio.wait_for to allow cancellation
                     await asyncio.wait_for(
@@ -314,104 +510,39 @@ class Song:
                     # Timeout is expected, continue with playback
                     pass
             
-            last_event_time = event.time
+            if batch is not None:
+                batch.append(message)
+            else:
+                send_midi_callback(message_type, params)
             
-            # Process the event based on its type
-            if event.event_type == NoteType.NOTE:
-                note: Note = event
-                # Send note_on message
-                self.send_midi_callback("note_on", {
-                    "note": note.pitch,
-                    "velocity": note.velocity,
-                    "channel": note.channel
-                })
-                
-                # Register the note as active using our tracking utility
-                register_note_on(note.pitch, note.channel)
-                
-                # Schedule note_off after duration
-                # Store the note in active_notes to turn it off if playback is stopped
-                active_notes[(note.pitch, note.channel)] = event.time + note.duration
-                
-                # Schedule task to turn off the note
-                asyncio.create_task(self._schedule_note_off(
-                    note.pitch, note.channel, note.duration
-                ))
-            
-            elif event.event_type == NoteType.CHORD:
-                chord: Chord = event
-                # Send note_on messages for all notes in the chord
-                for pitch in chord.notes:
-                    self.send_midi_callback("note_on", {
-                        "note": pitch,
-                        "velocity": chord.velocity,
-                        "channel": chord.channel
-                    })
-                    
-                    # Store the note in active_notes
-                    active_notes[(pitch, chord.channel)] = event.time + chord.duration
-                    
-                    # Schedule task to turn off the note
-                    asyncio.create_task(self._schedule_note_off(
-                        pitch, chord.channel, chord.duration
-                    ))
-            
-            elif event.event_type == NoteType.PROGRAM_CHANGE:
-                program_change: ProgramChange = event
-                self.send_midi_callback("program_change", {
-                    "program": program_change.program,
-                    "channel": program_change.channel
-                })
-            
-            elif event.event_type == NoteType.CONTROL_CHANGE:
-                control_change: ControlChange = event
-                self.send_midi_callback("control_change", {
-                    "control": control_change.control,
-                    "value": control_change.value,
-                    "channel": control_change.channel
-                })
+            # Track sounding notes, so stopping can turn them off
+            kind = message[0] & 0xF0
+            if kind == 0x90:
+                register_note_on(message[1], message[0] & 0x0F)
+            elif kind == 0x80:
+                register_note_off(message[1], message[0] & 0x0F)
             
             # Check if we should stop
             if self._stop_event.is_set():
                 break
         
-        # If we get here, either all events played or playback was stopped
-        # Turn off any active notes
-        current_time = time.time() - start_time
-        for (pitch, channel), stop_time in active_notes.items():
-            if stop_time > current_time:
-                # This note is still playing, turn it off
-                self.send_midi_callback("note_off", {
-                    "note": pitch,
-                    "channel": channel
-                })
+        # Send the last timestamp's messages
+        if batch and not self._stop_event.is_set():
+            send_midi_batch_callback(batch)
         
+        # Wait out any trailing rest so playback ends with the song
+        if not self._stop_event.is_set():
+            remaining = start_time + self.duration - loop.time()
+            if remaining > 0:
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+        
+        # Notes still sounding after a stop were turned off by stop_playback
         self._is_playing = False
         logger.info(f"Song playback completed: {self.name}")
     
-    async def _schedule_note_off(self, pitch: int, channel: int, duration: float) -> None:
-        """Schedule a note_off message after the specified duration"""
-        try:
-            # Wait for the note duration or until stop is requested
-            await asyncio.wait_for(
-                self._stop_event.wait(),
-                timeout=duration
-            )
-        except asyncio.TimeoutError:
-            # Timeout is expected, send note_off
-            pass
-        
-        # If we haven't been stopped or the stop happened at exactly the note duration,
-        # send the note_off message
-        if not self._stop_event.is_set() or duration <= 0:
-            self.send_midi_callback("note_off", {
-                "note": pitch,
-                "channel": channel
-            })
-            
-            # Unregister the note using our tracking utility
-            register_note_off(pitch, channel)
-    
     def start_playback(self) -> None:
         """Start song playback"""
         if self._is_playing:
@@ -435,9 +566,8 @@ class Song:
         self._stop_event.set()
         logger.info(f"Stopping song playback: {self.name}")
         
-        # Make sure all notes are turned off
-        if self.send_midi_callback:
-            # Send all notes off messages
-            for channel in range(16):  # All MIDI channels
-                # Use our all_notes_off utility with callback
-                all_notes_off(None, self.send_midi_callback, [channel])
+        # Make sure all notes are turned off, on every channel: the notes
+        # still sounding are read from the tracked bits, not the timeline
+        send_midi_callback = self.send_midi_callback
+        if send_midi_callback:
+            all_notes_off(None, send_midi_callback)
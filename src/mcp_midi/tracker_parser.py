@@ -3,37 +3,79 @@ A minimal tracker parser that converts tracker notation directly to MIDI events.
 """
 
 import re
-from typing import Dict, List, Optional, Any, Tuple, Union
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Union
 
+from .song.song import Note, ProgramChange, Song
 
+# Patterns used for every row, compiled once at import
+_ROW_RE = re.compile(r'Row\s+(\d+)')
+_DIGIT_RE = re.compile(r'(\d+)')
+
+# Placeholders for an empty cell, an empty note and an empty instrument or
+# volume. Cells made only of placeholders hold nothing, so they're skipped
+_EMPTY_NOTES = frozenset(('...', '---'))
+_EMPTY_FIELDS = frozenset(('..', '--'))
+_EMPTY_CELLS = frozenset(('', '.....')) | _EMPTY_NOTES | _EMPTY_FIELDS
+
+# Semitones above C for each note name
+_NOTE_VALUES = {'C': 0, 'C#': 1, 'Db': 1, 'D': 2, 'D#': 3, 'Eb': 3,
+                'E': 4, 'F': 5, 'F#': 6, 'Gb': 6, 'G': 7, 'G#': 8,
+                'Ab': 8, 'A': 9, 'A#': 10, 'Bb': 10, 'B': 11}
+
+
+def _note_number(token: str) -> Optional[int]:
+    """
+    Convert a note token like 'C-4', 'F#2' or 'Bb_3' to a MIDI note number.
+    Reads a letter, an optional '#' or 'b', an optional '-' or '_', then
+    the octave digits, by indexing rather than with a regex.
+    Returns None if the token doesn't start with a known note.
+    """
+    if not token or token[0] not in 'ABCDEFG':
+        return None
+    
+    end = len(token)
+    index = 2 if end > 1 and token[1] in '#b' else 1
+    name = token[:index]
+    if index < end and token[index] in '-_':
+        index += 1
+    
+    octave_end = index
+    while octave_end < end and token[octave_end].isdecimal():
+        octave_end += 1
+    if octave_end == index or name not in _NOTE_VALUES:
+        return None
+    
+    return (int(token[index:octave_end]) + 1) * 12 + _NOTE_VALUES[name]
+
+
+# Patterns repeat the same cells many times over, and the result is an
+# immutable tuple, so parsed cells are cached
+@lru_cache(maxsize=4096)
 def parse_note(note_str: str) -> Tuple[Optional[int], Optional[int], Optional[int]]:
     """
     Parse a note string in tracker format (e.g., 'C-4 01 40')
     Returns (midi_note, instrument, volume) or None for empty cells
     """
-    if not note_str or note_str.strip() == '.....' or note_str.strip() == '---':
+    if not note_str:
         return None, None, None
     
-    parts = note_str.strip().split()
+    note_str = note_str.strip()
+    if note_str in _EMPTY_CELLS:
+        return None, None, None
+    
+    parts = note_str.split()
     
     # Parse the note (e.g., C-4)
     midi_note = None
-    if len(parts) > 0 and parts[0] not in ('...', '---'):
-        note_pattern = r'([A-G][#b]?)[\-_]?(\d+)'
-        match = re.match(note_pattern, parts[0])
-        if match:
-            note_name, octave = match.groups()
-            # Convert note name to MIDI number
-            note_values = {'C': 0, 'C#': 1, 'Db': 1, 'D': 2, 'D#': 3, 'Eb': 3, 
-                          'E': 4, 'F': 5, 'F#': 6, 'Gb': 6, 'G': 7, 'G#': 8, 
-                          'Ab': 8, 'A': 9, 'A#': 10, 'Bb': 10, 'B': 11}
-            
-            if note_name in note_values:
-                midi_note = (int(octave) + 1) * 12 + note_values[note_name]
+    if len(parts) > 0 and parts[0] not in _EMPTY_NOTES:
+        midi_note = _note_number(parts[0])
     
     # Parse instrument
     instrument = None
-    if len(parts) > 1 and parts[1] not in ('..', '--'):
+    if len(parts) > 1 and parts[1] not in _EMPTY_FIELDS:
         try:
             instrument = int(parts[1])
         except ValueError:
@@ -41,7 +83,7 @@ def parse_note(note_str: str) -> Tuple[Optional[int], Optional[int], Optional[in
     
     # Parse volume
     volume = None
-    if len(parts) > 2 and parts[2] not in ('..', '--'):
+    if len(parts) > 2 and parts[2] not in _EMPTY_FIELDS:
         try:
             volume = int(parts[2])
         except ValueError:
@@ -50,12 +92,17 @@ def parse_note(note_str: str) -> Tuple[Optional[int], Optional[int], Optional[in
     return midi_note, instrument, volume
 
 
-def parse_tracker_content(content: str) -> Dict[str, Any]:
+def parse_tracker_content(content: Union[str, Iterable[str]]) -> Dict[str, Any]:
     """
     Parse tracker content into a structured format.
-    Returns a dictionary with song metadata and note events.
+    Accepts the content as a string, or any iterable of lines (such as an
+    open file), which is consumed one line at a time.
+    Returns a dictionary with song metadata and note events, and whether
+    the notes are already in row then channel order ("notes_sorted").
     """
-    lines = content.strip().split('\n')
+    if isinstance(content, str):
+        content = content.strip().split('\n')
+    lines = iter(content)
     
     # Extract header information
     title = "Untitled"
@@ -63,11 +110,14 @@ def parse_tracker_content(content: str) -> Dict[str, Any]:
     speed = 4
     instruments = {}
     
-    line_index = 0
-    
-    # Parse header
-    while line_index < len(lines) and not lines[line_index].startswith('|'):
-        line = lines[line_index].strip()
+    # Parse header, up to the first pattern line
+    header_line = None
+    for line in lines:
+        if line.startswith('|'):
+            header_line = line
+            break
+        
+        line = line.strip()
         if line.startswith('TITLE:'):
             title = line[6:].strip()
         elif line.startswith('TEMPO:'):
@@ -89,51 +139,55 @@ def parse_tracker_content(content: str) -> Dict[str, Any]:
                 instruments[instr_num] = instr_name
             except ValueError:
                 pass
-        line_index += 1
     
-    # Skip any blank lines before pattern
-    while line_index < len(lines) and not lines[line_index].startswith('|'):
-        line_index += 1
-    
-    if line_index >= len(lines):
+    if header_line is None:
         return {
             "title": title,
             "tempo": tempo,
             "speed": speed,
             "instruments": instruments,
-            "notes": []
+            "notes": [],
+            "notes_sorted": True
         }
     
     # Parse the channel headers to determine number of channels
-    header_line = lines[line_index]
     channel_headers = [h.strip() for h in header_line.split('|')[1:-1]]
     num_channels = len(channel_headers)
     
     # Skip separator line if present
-    line_index += 1
-    if line_index < len(lines) and lines[line_index].startswith('|---'):
-        line_index += 1
+    line = next(lines, None)
+    if line is not None and line.startswith('|---'):
+        line = next(lines, None)
+    if line is not None:
+        lines = chain((line,), lines)
     
     # Parse pattern data into notes
     notes = []  # List of (row, channel, midi_note, instrument, volume)
     
     current_row = 0
-    while line_index < len(lines) and lines[line_index].startswith('|'):
-        line = lines[line_index]
-        cells = [cell.strip() for cell in line.split('|')[1:-1]]
+    # Notes come out in row then channel order unless a row indicator
+    # jumps back to an earlier row
+    notes_sorted = True
+    # The pattern runs until the first line that doesn't start with '|'
+    for line in lines:
+        if not line.startswith('|'):
+            break
+        cells = line.split('|')[1:-1]
         
         # Skip row indicator lines
-        if len(cells) > 0 and 'Row' in line:
+        if cells and 'Row' in line:
             # Extract row number if it exists
-            row_match = re.search(r'Row\s+(\d+)', line)
+            row_match = _ROW_RE.search(line)
             if row_match:
-                current_row = int(row_match.group(1))
-            line_index += 1
+                row = int(row_match.group(1))
+                if row < current_row:
+                    notes_sorted = False
+                current_row = row
             continue
         
         # Process each cell in the row
-        for channel_index, cell in enumerate(cells):
-            if channel_index < num_channels and cell and cell.strip() != '.....':
+        for channel_index, cell in enumerate(map(str.strip, cells[:num_channels])):
+            if cell not in _EMPTY_CELLS:
                 midi_note, instrument, volume = parse_note(cell)
                 if midi_note is not None:
                     notes.append({
@@ -145,14 +199,14 @@ def parse_tracker_content(content: str) -> Dict[str, Any]:
                     })
         
         current_row += 1
-        line_index += 1
     
     return {
         "title": title,
         "tempo": tempo,
         "speed": speed,
         "instruments": instruments,
-        "notes": notes
+        "notes": notes,
+        "notes_sorted": notes_sorted
     }
 
 
@@ -170,8 +224,9 @@ def tracker_to_midi_commands(tracker_data: Dict[str, Any]) -> List[Dict[str, Any
     rows_per_beat = speed
     seconds_per_row = seconds_per_beat / rows_per_beat
     
-    # Sort notes by row and channel
-    notes = sorted(notes, key=lambda n: (n["row"], n["channel"]))
+    # Sort notes by row and channel, unless the parser found them in order
+    if not tracker_data.get("notes_sorted"):
+        notes = sorted(notes, key=itemgetter("row", "channel"))
     
     midi_commands = []
     
@@ -181,7 +236,7 @@ def tracker_to_midi_commands(tracker_data: Dict[str, Any]) -> List[Dict[str, Any
         program = channel
         if isinstance(instrument, str):
             # If it's a string, try to extract a number from it
-            match = re.search(r'(\d+)', instrument)
+            match = _DIGIT_RE.search(instrument)
             if match:
                 program = int(match.group(1))
         else:
@@ -194,25 +249,19 @@ def tracker_to_midi_commands(tracker_data: Dict[str, Any]) -> List[Dict[str, Any
             "channel": channel
         })
     
-    # Add note events
-    for note in notes:
-        row = note["row"]
-        time = row * seconds_per_row
-        
-        # Calculate note duration (default to one row)
-        duration = seconds_per_row
-        
-        # Convert tracker volume (0-64) to MIDI velocity (0-127)
-        velocity = min(127, note["volume"] * 2) if note["volume"] is not None else 64
-        
-        midi_commands.append({
+    # Add note events, each lasting one row, in one pass. Tracker volume
+    # (0-64) is converted to MIDI velocity (0-127)
+    midi_commands.extend([
+        {
             "command": "note",
             "pitch": note["note"],
-            "time": time,
-            "duration": duration,
-            "velocity": velocity,
+            "time": note["row"] * seconds_per_row,
+            "duration": seconds_per_row,
+            "velocity": min(127, note["volume"] * 2) if note["volume"] is not None else 64,
             "channel": note["channel"]
-        })
+        }
+        for note in notes
+    ])
     
     return midi_commands
 
@@ -234,49 +283,36 @@ def create_midi_song(song_manager, name: str, tracker_content: str) -> Dict[str,
         tracker_data = parse_tracker_content(tracker_content)
         
         # Create a new song
-        song = song_manager.create_song(name=name, tempo=tracker_data["tempo"])
+        song = Song(name=name, tempo=tracker_data["tempo"])
         
         # Convert tracker data to MIDI commands
         midi_commands = tracker_to_midi_commands(tracker_data)
         
-        # Add all commands to the song
+        # Build the song's events directly and add them in one call, rather
+        # than calling add_program_change/add_note once per command
+        events = []
+        channels = set()
+        note_count = 0
         for cmd in midi_commands:
+            channels.add(cmd["channel"])
             if cmd["command"] == "program_change":
-                song.add_program_change(
-                    program=cmd["program"],
-                    time=cmd["time"],
-                    channel=cmd["channel"]
-                )
+                events.append(ProgramChange(cmd["time"], 0.0, cmd["channel"], cmd["program"]))
             elif cmd["command"] == "note":
-                song.add_note(
-                    pitch=cmd["pitch"],
-                    time=cmd["time"],
-                    duration=cmd["duration"],
-                    velocity=cmd["velocity"],
-                    channel=cmd["channel"]
-                )
-        
-        return {
-            "status": "success",
-            "message": f"Created MIDI song '{name}' from tracker content",
-            "song_data": {
-                "name": name,
-                "title": tracker_data["title"],
-                "tempo": tracker_data["tempo"],
-                "channels": len(set(cmd["channel"] for cmd in midi_commands if "channel" in cmd)),
-                "notes": len([cmd for cmd in midi_commands if cmd["command"] == "note"])
-            }
-        }
+                events.append(Note(cmd["time"], cmd["duration"], cmd["channel"],
+                                   cmd["pitch"], cmd["velocity"]))
+                note_count += 1
+        song.add_events(events)
+        song_manager.add_song(song)
         
         return {
             "status": "success",
-            "message": f"Created MIDI song '{name}' from tracker content",
+            "message": f"Created MIDI song '{song.name}' from tracker content",
             "song_data": {
-                "name": name,
+                "name": song.name,
                 "title": tracker_data["title"],
                 "tempo": tracker_data["tempo"],
-                "channels": len(set(cmd["channel"] for cmd in midi_commands if "channel" in cmd)),
-                "notes": len([cmd for cmd in midi_commands if cmd["command"] == "note"])
+                "channels": len(channels),
+                "notes": note_count
             }
         }
     except Exception as e:
@@ -4,19 +4,27 @@ MCP MIDI Server - Bridge between Claude and USB MIDI devices
 """
 import argparse
 import asyncio
+import heapq
 import json
 import logging
-import os
 import sys
+import threading
+import time
 from typing import Dict, List, Optional, Any, Tuple, Union
 
 import mido
 import rtmidi
 from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel, Field
 import uvicorn
 
+try:
+    import orjson
+except ImportError:  # optional, the standard library is used without it
+    orjson = None
+
+from mcp_midi import messages
 from mcp_midi.all_notes_off import register_note_on, register_note_off, all_notes_off
 from mcp_midi.midi_file import MidiFilePlayer
 
@@ -27,37 +35,50 @@ logging.basicConfig(
 )
 logger = logging.getLogger("mcp_midi")
 
-# Create FastAPI app
-app = FastAPI(title="MCP MIDI Server")
+# Create FastAPI app, rendering responses with orjson when it is installed
+app = FastAPI(
+    title="MCP MIDI Server",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
+)
 
 # Helper function to create a MIDI callback
 def create_midi_callback():
     """Create a callback function for sending MIDI messages
     This is a workaround for the async issue in the Song class
+    
+    The callback logs send errors rather than raising them, and returns
+    whether the message was sent.
     """
     def send_midi_callback(cmd_type, params, port_id=0):
         try:
             port = connect_to_port(port_id)
             
             if cmd_type == "note_on":
-                msg = mido.Message('note_on', note=params["note"], velocity=params["velocity"], channel=params["channel"])
+                msg = messages.note_on(params["note"], params["velocity"], params["channel"])
             elif cmd_type == "note_off":
-                msg = mido.Message('note_off', note=params["note"], velocity=params.get("velocity", 0), channel=params["channel"])
+                msg = messages.note_off(params["note"], params.get("velocity", 0), params["channel"])
             elif cmd_type == "control_change":
-                msg = mido.Message('control_change', control=params["control"], value=params["value"], channel=params["channel"])
+                msg = messages.control_change(params["control"], params["value"], params["channel"])
             elif cmd_type == "program_change":
-                msg = mido.Message('program_change', program=params["program"], channel=params["channel"])
+                msg = messages.program_change(params["program"], params["channel"])
             else:
-                return
+                return False
             
             port.send(msg)
+            return True
         except Exception as e:
             logger.error(f"Error in MIDI callback: {e}")
+            return False
     
     return send_midi_callback
 
 # Global state for MIDI connections
 midi_ports = {}
+use_mido_ports = False  # Open ports through mido instead of RtMidiPort (--safe)
+# Enumerating ports can take seconds on some drivers, so a scan is reused
+# for _PORTS_TTL seconds
+_PORTS_TTL = 5.0
+_ports_scanned_at = None  # time.monotonic() of the last scan
 active_ports = {}
 current_instrument = 0  # Default General MIDI instrument
 midi_file_player = MidiFilePlayer()  # MIDI file player instance
@@ -102,11 +123,48 @@ class MidiProgramChange(BaseModel):
     channel: int = 0
 
 
-def discover_midi_ports():
-    """Discover available MIDI output ports"""
+class RtMidiPort:
+    """An rtmidi output port that can stand in for a mido output port
+    
+    mido's send() checks and copies every message before converting it to
+    bytes. The messages sent here come from mcp_midi.messages, which are
+    validated when first built and never modified, so their bytes go
+    straight to rtmidi.
+    """
+    
+    def __init__(self, port_id: int):
+        self._midi_out = rtmidi.MidiOut()
+        self._midi_out.open_port(port_id)
+        self._send_message = self._midi_out.send_message
+        # Ports are written from the event loop and from MidiFilePlayer's
+        # writer thread, so sends are serialized as mido's are
+        self._lock = threading.Lock()
+    
+    def send(self, msg: mido.Message) -> None:
+        """Send a message"""
+        with self._lock:
+            self._send_message(msg.bytes())
+    
+    def close(self) -> None:
+        """Close the port"""
+        self._midi_out.close_port()
+
+
+def discover_midi_ports(refresh: bool = False):
+    """Discover available MIDI output ports
+    
+    The previous scan is returned if it is less than _PORTS_TTL seconds
+    old, unless refresh is set.
+    """
+    global _ports_scanned_at
+    if (not refresh and _ports_scanned_at is not None
+            and time.monotonic() - _ports_scanned_at < _PORTS_TTL):
+        return midi_ports
+    
     try:
         midi_out = rtmidi.MidiOut()
         available_ports = midi_out.get_ports()
+        del midi_out  # Release the driver handle straight away
         
         midi_ports.clear()
         for i, port in enumerate(available_ports):
@@ -116,6 +174,7 @@ def discover_midi_ports():
                 "type": "output",
             }
         
+        _ports_scanned_at = time.monotonic()
         return midi_ports
     except Exception as e:
         logger.error(f"Error in discover_midi_ports: {e}")
@@ -128,11 +187,15 @@ def connect_to_port(port_id: int):
         return active_ports[port_id]
     
     if port_id not in midi_ports:
-        discover_midi_ports()
+        # Rescan, since the port may have appeared since the cached scan
+        discover_midi_ports(refresh=True)
         if port_id not in midi_ports:
             raise ValueError(f"MIDI port {port_id} not found")
     
-    midi_out = mido.open_output(midi_ports[port_id]["name"])
+    if use_mido_ports:
+        midi_out = mido.open_output(midi_ports[port_id]["name"])
+    else:
+        midi_out = RtMidiPort(port_id)
     active_ports[port_id] = midi_out
     return midi_out
 
@@ -179,7 +242,8 @@ async def root():
 @app.get("/midi/ports")
 async def get_midi_ports():
     """Get available MIDI ports"""
-    ports = discover_midi_ports()
+    # An explicit discovery request always rescans
+    ports = discover_midi_ports(refresh=True)
     return {"ports": list(ports.values())}
 
 
@@ -206,7 +270,7 @@ async def set_instrument(instrument_id: int, port_id: int = 0):
         current_instrument = instrument_id
         
         # Send program change message
-        msg = mido.Message('program_change', program=instrument_id, channel=0)
+        msg = messages.program_change(instrument_id, 0)
         port.send(msg)
         
         return {
@@ -225,12 +289,7 @@ async def send_note_on(note_data: MidiNoteOn, port_id: int = 0):
     """Send a note_on message"""
     try:
         port = connect_to_port(port_id)
-        msg = mido.Message(
-            'note_on',
-            note=note_data.note,
-            velocity=note_data.velocity,
-            channel=note_data.channel
-        )
+        msg = messages.note_on(note_data.note, note_data.velocity, note_data.channel)
         port.send(msg)
         
         # Register the note as active
@@ -249,12 +308,7 @@ async def send_note_off(note_data: MidiNoteOff, port_id: int = 0):
     """Send a note_off message"""
     try:
         port = connect_to_port(port_id)
-        msg = mido.Message(
-            'note_off',
-            note=note_data.note,
-            velocity=note_data.velocity,
-            channel=note_data.channel
-        )
+        msg = messages.note_off(note_data.note, note_data.velocity, note_data.channel)
         port.send(msg)
         
         # Unregister the note
@@ -273,12 +327,7 @@ async def send_control_change(cc_data: MidiControlChange, port_id: int = 0):
     """Send a control_change message"""
     try:
         port = connect_to_port(port_id)
-        msg = mido.Message(
-            'control_change',
-            control=cc_data.control,
-            value=cc_data.value,
-            channel=cc_data.channel
-        )
+        msg = messages.control_change(cc_data.control, cc_data.value, cc_data.channel)
         port.send(msg)
         return {"message": f"Sent control_change: {cc_data}"}
     except Exception as e:
@@ -293,11 +342,7 @@ async def send_program_change(pc_data: MidiProgramChange, port_id: int = 0):
     """Send a program_change message"""
     try:
         port = connect_to_port(port_id)
-        msg = mido.Message(
-            'program_change',
-            program=pc_data.program,
-            channel=pc_data.channel
-        )
+        msg = messages.program_change(pc_data.program, pc_data.channel)
         port.send(msg)
         return {"message": f"Sent program_change: {pc_data}"}
     except Exception as e:
@@ -589,13 +634,13 @@ async def load_midi_file(request: LoadMidiRequest):
         midi_file_player.set_midi_callback(lambda cmd_type, params: 
             asyncio.create_task(_send_midi_message(cmd_type, params)))
         
-        success = midi_file_player.load_file(request.path, request.name)
+        name = request.name if request.name else midi_file_player.default_name(request.path)
+        success = midi_file_player.load_file(request.path, name)
         
-        if success:
-            # Get the file info
-            file_info = midi_file_player.get_file_info(
-                request.name if request.name else os.path.basename(request.path)
-            )
+        # The file is parsed when its info is first read, so a corrupt file
+        # is only found here
+        file_info = midi_file_player.get_file_info(name) if success else None
+        if file_info is not None:
             return {"message": "MIDI file loaded successfully", "info": file_info}
         else:
             return JSONResponse(
@@ -635,6 +680,33 @@ async def load_midi_content(request: LoadMidiContentRequest):
         )
 
 
+@app.post("/midi/load_binary")
+async def load_midi_binary(request: Request, name: str = "uploaded_midi"):
+    """Load a MIDI file from a raw binary request body"""
+    try:
+        # Configure the MIDI file player
+        midi_file_player.set_midi_callback(lambda cmd_type, params: 
+            asyncio.create_task(_send_midi_message(cmd_type, params)))
+        
+        data = await request.body()
+        success = midi_file_player.load_from_bytes(data, name)
+        
+        if success:
+            # Get the file info
+            file_info = midi_file_player.get_file_info(name)
+            return {"message": "MIDI content loaded successfully", "info": file_info}
+        else:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Failed to load MIDI content from binary data"},
+            )
+    except Exception as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": str(e)},
+        )
+
+
 @app.get("/midi/list_files")
 async def list_midi_files():
     """List all loaded MIDI files"""
@@ -663,6 +735,8 @@ async def play_midi_file(request: PlayMidiRequest):
         midi_file_player.set_midi_port(port)
         midi_file_player.set_midi_callback(lambda cmd_type, params: 
             asyncio.create_task(_send_midi_message(cmd_type, params)))
+        midi_file_player.set_midi_batch_callback(lambda batch: 
+            asyncio.create_task(_send_midi_batch(batch)))
         
         success = midi_file_player.start_playback(request.name)
         
@@ -753,6 +827,124 @@ async def _send_midi_message(cmd_type, params):
         logger.error(f"Error in _send_midi_message: {e}")
 
 
+async def _send_midi_batch(batch):
+    """Internal function to send a batch of (type, params) MIDI messages in order"""
+    for cmd_type, params in batch:
+        await _send_midi_message(cmd_type, params)
+
+
+# Timestamped MIDI event scheduling
+# Heap of (due time, sequence number, command type, params, port_id); due times
+# are on the event loop's monotonic clock
+scheduled_events: List[Tuple[float, int, str, Dict[str, Any], int]] = []
+schedule_sequence = 0
+schedule_wakeup: Optional[asyncio.Event] = None
+scheduler_task: Optional[asyncio.Task] = None
+
+# Default parameters for each schedulable command type
+SCHEDULE_DEFAULTS = {
+    "note_on": {"velocity": 64, "channel": 0},
+    "note_off": {"velocity": 0, "channel": 0},
+    "program_change": {"program": 0, "channel": 0},
+    "control_change": {"control": 0, "value": 0, "channel": 0},
+}
+
+# Highest value allowed for each schedulable parameter (the lowest is 0)
+SCHEDULE_LIMITS = {
+    "note": 127,
+    "velocity": 127,
+    "program": 127,
+    "control": 127,
+    "value": 127,
+    "channel": 15,
+}
+
+
+def schedule_midi_events(events: List[Dict[str, Any]], port_id: int = 0) -> int:
+    """Queue MIDI events for dispatch at times relative to now
+    
+    Args:
+        events: Events with a ``t`` offset in seconds, a ``type`` and the
+            message parameters (e.g. ``{"t": 0.5, "type": "note_off", "note": 60}``)
+        port_id: MIDI port to send the events to
+    
+    Returns:
+        Number of events queued
+    """
+    global schedule_sequence, schedule_wakeup, scheduler_task
+    
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    
+    # Check and build every entry before queuing any, so a bad event rejects
+    # the whole request rather than leaving the events before it queued
+    entries = []
+    for event in events:
+        cmd_type = event.get("type")
+        if cmd_type not in SCHEDULE_DEFAULTS:
+            raise ValueError(f"Unsupported event type: {cmd_type}")
+        if cmd_type in ("note_on", "note_off") and "note" not in event:
+            raise ValueError(f"{cmd_type} event is missing 'note'")
+        try:
+            due = start + float(event.get("t", 0.0))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid event time: {event.get('t')!r}") from None
+        
+        params = dict(SCHEDULE_DEFAULTS[cmd_type])
+        params.update({k: v for k, v in event.items() if k not in ("t", "type")})
+        for key, value in params.items():
+            limit = SCHEDULE_LIMITS.get(key)
+            if limit is not None and not (type(value) is int and 0 <= value <= limit):
+                raise ValueError(f"{cmd_type} {key} must be an integer from 0 to {limit}, got {value!r}")
+        
+        schedule_sequence += 1
+        entries.append((due, schedule_sequence, cmd_type, params, port_id))
+    
+    for entry in entries:
+        heapq.heappush(scheduled_events, entry)
+    
+    if schedule_wakeup is None:
+        schedule_wakeup = asyncio.Event()
+    
+    # Wake the scheduler in case the new events are due before the one it is waiting on
+    schedule_wakeup.set()
+    
+    if scheduler_task is None or scheduler_task.done():
+        scheduler_task = asyncio.create_task(_run_midi_scheduler())
+    
+    return len(entries)
+
+
+async def _run_midi_scheduler():
+    """Dispatch scheduled MIDI events as they fall due"""
+    loop = asyncio.get_running_loop()
+    midi_callback = create_midi_callback()
+    
+    while scheduled_events:
+        delay = scheduled_events[0][0] - loop.time()
+        if delay > 0:
+            schedule_wakeup.clear()
+            try:
+                await asyncio.wait_for(schedule_wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        
+        _, _, cmd_type, params, port_id = heapq.heappop(scheduled_events)
+        # One failing event must not stop the events queued after it
+        try:
+            # Only notes that were sent are tracked for all_notes_off
+            if not midi_callback(cmd_type, params, port_id):
+                continue
+            
+            if cmd_type == "note_on":
+                register_note_on(params["note"], params["channel"])
+            elif cmd_type == "note_off":
+                register_note_off(params["note"], params["channel"])
+        except Exception as e:
+            logger.error(f"Error dispatching scheduled {cmd_type} event: {e}")
+
+
 # MCP Protocol implementation
 class MCPRequest(BaseModel):
     """MCP Request Model"""
@@ -772,477 +964,612 @@ class MCPResponse(BaseModel):
 
 @app.post("/mcp")
 async def mcp_endpoint(request: Request):
-    """Handle MCP requests"""
-    try:
+    """Handle MCP requests (single or JSON-RPC batch)"""
+    if orjson is not None:
+        data = orjson.loads(await request.body())
+    else:
         data = await request.json()
-        mcp_request = MCPRequest(**data)
-        
-        # Handle different MCP methods
-        if mcp_request.method == "midi.discover":
-            ports = discover_midi_ports()
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"ports": list(ports.values())}
-            )
-        
-        elif mcp_request.method == "midi.connect":
-            port_id = mcp_request.params.get("port_id", 0)
-            connect_to_port(port_id)
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Connected to port {port_id}"}
-            )
-        
-        elif mcp_request.method == "midi.note_on":
-            port_id = mcp_request.params.get("port_id", 0)
-            note = mcp_request.params.get("note")
-            velocity = mcp_request.params.get("velocity", 64)
-            channel = mcp_request.params.get("channel", 0)
-            
-            port = connect_to_port(port_id)
-            msg = mido.Message('note_on', note=note, velocity=velocity, channel=channel)
-            port.send(msg)
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Note on: {note}, velocity: {velocity}"}
-            )
-        
-        elif mcp_request.method == "midi.note_off":
-            port_id = mcp_request.params.get("port_id", 0)
-            note = mcp_request.params.get("note")
-            velocity = mcp_request.params.get("velocity", 0)
-            channel = mcp_request.params.get("channel", 0)
-            
-            port = connect_to_port(port_id)
-            msg = mido.Message('note_off', note=note, velocity=velocity, channel=channel)
-            port.send(msg)
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Note off: {note}"}
-            )
-        
-        elif mcp_request.method == "midi.program_change":
-            port_id = mcp_request.params.get("port_id", 0)
-            program = mcp_request.params.get("program", 0)
-            channel = mcp_request.params.get("channel", 0)
-            
-            port = connect_to_port(port_id)
-            msg = mido.Message('program_change', program=program, channel=channel)
-            port.send(msg)
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Program change: {program}"}
-            )
-        
-        elif mcp_request.method == "midi.control_change":
-            port_id = mcp_request.params.get("port_id", 0)
-            control = mcp_request.params.get("control")
-            value = mcp_request.params.get("value")
-            channel = mcp_request.params.get("channel", 0)
-            
-            port = connect_to_port(port_id)
-            msg = mido.Message('control_change', control=control, value=value, channel=channel)
-            port.send(msg)
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Control change: {control}, value: {value}"}
-            )
-            
-        elif mcp_request.method == "midi.all_notes_off":
-            port_id = mcp_request.params.get("port_id", 0)
-            channels = mcp_request.params.get("channels")
-            
-            port = connect_to_port(port_id)
-            all_notes_off(port, None, channels)
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"All notes off sent for channels: {channels or 'all'}"}
-            )
-            
-        elif mcp_request.method == "midi.load_file":
-            path = mcp_request.params.get("path")
-            name = mcp_request.params.get("name")
-            
-            # Configure the MIDI file player
-            midi_file_player.set_midi_callback(lambda cmd_type, params: 
-                asyncio.create_task(_send_midi_message(cmd_type, params)))
-            
-            success = midi_file_player.load_file(path, name)
-            
-            if success:
-                # Get the file info
-                file_info = midi_file_player.get_file_info(
-                    name if name else os.path.basename(path)
-                )
-                return MCPResponse(
-                    id=mcp_request.id,
-                    result={"message": "MIDI file loaded successfully", "info": file_info}
-                )
-            else:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32000,
-                        "message": f"Failed to load MIDI file from {path}"
-                    }
-                )
-        
-        elif mcp_request.method == "midi.load_content":
-            data = mcp_request.params.get("data")  # Base64-encoded MIDI data
-            name = mcp_request.params.get("name", "uploaded_midi")
-            
-            # Configure the MIDI file player
-            midi_file_player.set_midi_callback(lambda cmd_type, params: 
-                asyncio.create_task(_send_midi_message(cmd_type, params)))
-            
-            success = midi_file_player.load_from_base64(data, name)
-            
-            if success:
-                # Get the file info
-                file_info = midi_file_player.get_file_info(name)
-                return MCPResponse(
-                    id=mcp_request.id,
-                    result={"message": "MIDI content loaded successfully", "info": file_info}
-                )
-            else:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32000,
-                        "message": "Failed to load MIDI content from base64 data"
-                    }
-                )
-            
-        elif mcp_request.method == "midi.list_files":
-            files = midi_file_player.list_files()
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"files": files}
-            )
-            
-        elif mcp_request.method == "midi.play_file":
-            name = mcp_request.params.get("name")
-            port_id = mcp_request.params.get("port_id", 0)
-            
-            # Configure the MIDI file player
+    
+    # A JSON-RPC batch is an array of requests, answered with an array of responses
+    if isinstance(data, list):
+        return [await _process_mcp_request(item) for item in data]
+    
+    return await _process_mcp_request(data)
+
+
+def _mcp_midi_discover(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.discover"""
+    ports = discover_midi_ports(refresh=True)
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"ports": list(ports.values())}
+    )
+
+
+def _mcp_midi_connect(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.connect"""
+    port_id = mcp_request.params.get("port_id", 0)
+    connect_to_port(port_id)
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Connected to port {port_id}"}
+    )
+
+
+def _mcp_midi_note_on(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.note_on"""
+    port_id = mcp_request.params.get("port_id", 0)
+    note = mcp_request.params.get("note")
+    velocity = mcp_request.params.get("velocity", 64)
+    channel = mcp_request.params.get("channel", 0)
+    
+    port = connect_to_port(port_id)
+    msg = messages.note_on(note, velocity, channel)
+    port.send(msg)
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Note on: {note}, velocity: {velocity}"}
+    )
+
+
+def _mcp_midi_note_off(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.note_off"""
+    port_id = mcp_request.params.get("port_id", 0)
+    note = mcp_request.params.get("note")
+    velocity = mcp_request.params.get("velocity", 0)
+    channel = mcp_request.params.get("channel", 0)
+    
+    port = connect_to_port(port_id)
+    msg = messages.note_off(note, velocity, channel)
+    port.send(msg)
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Note off: {note}"}
+    )
+
+
+def _mcp_midi_chord_on(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.chord_on"""
+    port_id = mcp_request.params.get("port_id", 0)
+    notes = mcp_request.params.get("notes", [])
+    velocity = mcp_request.params.get("velocity", 64)
+    channel = mcp_request.params.get("channel", 0)
+    
+    # Build every message first so the notes go out back to back
+    port = connect_to_port(port_id)
+    msgs = [messages.note_on(note, velocity, channel) for note in notes]
+    for msg in msgs:
+        port.send(msg)
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Chord on: {notes}, velocity: {velocity}"}
+    )
+
+
+def _mcp_midi_chord_off(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.chord_off"""
+    port_id = mcp_request.params.get("port_id", 0)
+    notes = mcp_request.params.get("notes", [])
+    velocity = mcp_request.params.get("velocity", 0)
+    channel = mcp_request.params.get("channel", 0)
+    
+    port = connect_to_port(port_id)
+    msgs = [messages.note_off(note, velocity, channel) for note in notes]
+    for msg in msgs:
+        port.send(msg)
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Chord off: {notes}"}
+    )
+
+
+def _mcp_midi_program_change(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.program_change"""
+    port_id = mcp_request.params.get("port_id", 0)
+    program = mcp_request.params.get("program", 0)
+    channel = mcp_request.params.get("channel", 0)
+    
+    port = connect_to_port(port_id)
+    msg = messages.program_change(program, channel)
+    port.send(msg)
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Program change: {program}"}
+    )
+
+
+def _mcp_midi_control_change(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.control_change"""
+    port_id = mcp_request.params.get("port_id", 0)
+    control = mcp_request.params.get("control")
+    value = mcp_request.params.get("value")
+    channel = mcp_request.params.get("channel", 0)
+    
+    port = connect_to_port(port_id)
+    msg = messages.control_change(control, value, channel)
+    port.send(msg)
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Control change: {control}, value: {value}"}
+    )
+
+
+def _mcp_midi_all_notes_off(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.all_notes_off"""
+    port_id = mcp_request.params.get("port_id", 0)
+    channels = mcp_request.params.get("channels")
+    
+    port = connect_to_port(port_id)
+    all_notes_off(port, None, channels)
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"All notes off sent for channels: {channels or 'all'}"}
+    )
+
+
+def _mcp_midi_schedule(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.schedule"""
+    port_id = mcp_request.params.get("port_id", 0)
+    events = mcp_request.params.get("events", [])
+    
+    count = schedule_midi_events(events, port_id)
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Scheduled {count} MIDI events"}
+    )
+
+
+def _mcp_midi_load_file(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.load_file"""
+    path = mcp_request.params.get("path")
+    name = mcp_request.params.get("name")
+    
+    # Configure the MIDI file player
+    midi_file_player.set_midi_callback(lambda cmd_type, params: 
+        asyncio.create_task(_send_midi_message(cmd_type, params)))
+    
+    name = name if name else midi_file_player.default_name(path)
+    success = midi_file_player.load_file(path, name)
+    
+    # The file is parsed when its info is first read, so a corrupt file is
+    # only found here
+    file_info = midi_file_player.get_file_info(name) if success else None
+    if file_info is not None:
+        return MCPResponse(
+            id=mcp_request.id,
+            result={"message": "MIDI file loaded successfully", "info": file_info}
+        )
+    else:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32000,
+                "message": f"Failed to load MIDI file from {path}"
+            }
+        )
+
+
+def _mcp_midi_load_content(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.load_content"""
+    data = mcp_request.params.get("data")  # Base64-encoded MIDI data
+    name = mcp_request.params.get("name", "uploaded_midi")
+    
+    # Configure the MIDI file player
+    midi_file_player.set_midi_callback(lambda cmd_type, params: 
+        asyncio.create_task(_send_midi_message(cmd_type, params)))
+    
+    success = midi_file_player.load_from_base64(data, name)
+    
+    if success:
+        # Get the file info
+        file_info = midi_file_player.get_file_info(name)
+        return MCPResponse(
+            id=mcp_request.id,
+            result={"message": "MIDI content loaded successfully", "info": file_info}
+        )
+    else:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32000,
+                "message": "Failed to load MIDI content from base64 data"
+            }
+        )
+
+
+def _mcp_midi_list_files(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.list_files"""
+    files = midi_file_player.list_files()
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"files": files}
+    )
+
+
+def _mcp_midi_play_file(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.play_file"""
+    name = mcp_request.params.get("name")
+    port_id = mcp_request.params.get("port_id", 0)
+    
+    # Configure the MIDI file player
+    port = connect_to_port(port_id)
+    midi_file_player.set_midi_port(port)
+    midi_file_player.set_midi_callback(lambda cmd_type, params: 
+        asyncio.create_task(_send_midi_message(cmd_type, params)))
+    
+    success = midi_file_player.start_playback(name)
+    
+    if success:
+        return MCPResponse(
+            id=mcp_request.id,
+            result={"message": f"Playing MIDI file: {name}"}
+        )
+    else:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32000,
+                "message": f"Failed to play MIDI file: {name}"
+            }
+        )
+
+
+def _mcp_midi_stop_file(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.stop_file"""
+    success = midi_file_player.stop_playback()
+    
+    if success:
+        return MCPResponse(
+            id=mcp_request.id,
+            result={"message": "MIDI file playback stopped"}
+        )
+    else:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32000,
+                "message": "No MIDI file currently playing"
+            }
+        )
+
+
+def _mcp_midi_convert_to_song(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle midi.convert_to_song"""
+    name = mcp_request.params.get("name")
+    
+    song = midi_file_player.convert_to_song(name)
+    
+    if song:
+        # Add the song to the song manager
+        from mcp_midi.song.manager import SongManager
+        song_manager = SongManager()
+    
+        # Set the callback
+        song.set_midi_callback(lambda cmd_type, params: 
+            asyncio.create_task(_send_midi_message(cmd_type, params)))
+    
+        song_manager.add_song(song)
+    
+        return MCPResponse(
+            id=mcp_request.id,
+            result={
+                "message": f"Converted MIDI file to song: {name}",
+                "song_info": {
+                    "name": song.name,
+                    "duration": song.duration,
+                    "event_count": len(song.events)
+                }
+            }
+        )
+    else:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32000,
+                "message": f"Failed to convert MIDI file: {name}"
+            }
+        )
+
+
+# Song-related MCP methods
+
+def _mcp_create_song(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle create_song"""
+    name = mcp_request.params.get("name", "Untitled")
+    tempo = mcp_request.params.get("tempo", 120)
+    
+    song = Song(name=name, tempo=tempo)
+    
+    # Set MIDI callback for the song
+    midi_callback = create_midi_callback()
+    song.set_midi_callback(midi_callback)
+    song_manager.add_song(song)
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Created song: {name}"}
+    )
+
+
+def _mcp_create_scale(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle create_scale"""
+    name = mcp_request.params.get("name", "Scale")
+    root_note = mcp_request.params.get("root_note", 60)  # Middle C
+    scale_type = mcp_request.params.get("scale_type", "major")
+    octaves = mcp_request.params.get("octaves", 1)
+    duration = mcp_request.params.get("duration", 0.5)
+    
+    # Set MIDI callback for the song manager if not already set
+    if not song_manager.send_midi_callback:
+        async def send_midi_callback(cmd_type, params, port_id=0):
             port = connect_to_port(port_id)
-            midi_file_player.set_midi_port(port)
-            midi_file_player.set_midi_callback(lambda cmd_type, params: 
-                asyncio.create_task(_send_midi_message(cmd_type, params)))
-            
-            success = midi_file_player.start_playback(name)
-            
-            if success:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    result={"message": f"Playing MIDI file: {name}"}
-                )
-            else:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32000,
-                        "message": f"Failed to play MIDI file: {name}"
-                    }
-                )
-            
-        elif mcp_request.method == "midi.stop_file":
-            success = midi_file_player.stop_playback()
             
-            if success:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    result={"message": "MIDI file playback stopped"}
-                )
-            else:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32000,
-                        "message": "No MIDI file currently playing"
-                    }
-                )
-            
-        elif mcp_request.method == "midi.convert_to_song":
-            name = mcp_request.params.get("name")
-            
-            song = midi_file_player.convert_to_song(name)
-            
-            if song:
-                # Add the song to the song manager
-                from mcp_midi.song.manager import SongManager
-                song_manager = SongManager()
-                
-                # Set the callback
-                song.set_midi_callback(lambda cmd_type, params: 
-                    asyncio.create_task(_send_midi_message(cmd_type, params)))
-                
-                song_manager.add_song(song)
-                
-                return MCPResponse(
-                    id=mcp_request.id,
-                    result={
-                        "message": f"Converted MIDI file to song: {name}",
-                        "song_info": {
-                            "name": song.name,
-                            "duration": song.duration,
-                            "event_count": len(song.events)
-                        }
-                    }
-                )
+            if cmd_type == "note_on":
+                msg = messages.note_on(params["note"], params["velocity"], params["channel"])
+            elif cmd_type == "note_off":
+                msg = messages.note_off(params["note"], params.get("velocity", 0), params["channel"])
+            elif cmd_type == "control_change":
+                msg = messages.control_change(params["control"], params["value"], params["channel"])
+            elif cmd_type == "program_change":
+                msg = messages.program_change(params["program"], params["channel"])
             else:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32000,
-                        "message": f"Failed to convert MIDI file: {name}"
-                    }
-                )
-        
-        # Song-related MCP methods
-        elif mcp_request.method == "create_song":
-            name = mcp_request.params.get("name", "Untitled")
-            tempo = mcp_request.params.get("tempo", 120)
-            
-            song = Song(name=name, tempo=tempo)
-            
-            # Set MIDI callback for the song
-            midi_callback = create_midi_callback()
-            song.set_midi_callback(midi_callback)
-            song_manager.add_song(song)
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Created song: {name}"}
-            )
-        
-        elif mcp_request.method == "create_scale":
-            name = mcp_request.params.get("name", "Scale")
-            root_note = mcp_request.params.get("root_note", 60)  # Middle C
-            scale_type = mcp_request.params.get("scale_type", "major")
-            octaves = mcp_request.params.get("octaves", 1)
-            duration = mcp_request.params.get("duration", 0.5)
-            
-            # Set MIDI callback for the song manager if not already set
-            if not song_manager.send_midi_callback:
-                async def send_midi_callback(cmd_type, params, port_id=0):
-                    port = connect_to_port(port_id)
-                    
-                    if cmd_type == "note_on":
-                        msg = mido.Message('note_on', note=params["note"], velocity=params["velocity"], channel=params["channel"])
-                    elif cmd_type == "note_off":
-                        msg = mido.Message('note_off', note=params["note"], velocity=params.get("velocity", 0), channel=params["channel"])
-                    elif cmd_type == "control_change":
-                        msg = mido.Message('control_change', control=params["control"], value=params["value"], channel=params["channel"])
-                    elif cmd_type == "program_change":
-                        msg = mido.Message('program_change', program=params["program"], channel=params["channel"])
-                    else:
-                        return
-                    
-                    port.send(msg)
-                
-                song_manager.set_midi_callback(send_midi_callback)
-            
-            song = song_manager.create_scale_song(
-                name=name,
-                root_note=root_note,
-                scale_type=scale_type,
-                octaves=octaves,
-                duration=duration
-            )
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={
-                    "message": f"Created scale song: {name}",
-                    "song": {
-                        "name": song.name,
-                        "duration": song.duration
-                    }
-                }
-            )
-        
-        elif mcp_request.method == "add_note":
-            song_name = mcp_request.params.get("name")
-            pitch = mcp_request.params.get("pitch")
-            time = mcp_request.params.get("time")
-            duration = mcp_request.params.get("duration")
-            velocity = mcp_request.params.get("velocity", 64)
-            channel = mcp_request.params.get("channel", 0)
-            
-            if not song_name:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32602,
-                        "message": "Required parameter 'name' missing"
-                    }
-                )
-            
-            song = song_manager.get_song(song_name)
-            if not song:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32602,
-                        "message": f"Song not found: {song_name}"
-                    }
-                )
-            
-            song.add_note(
-                pitch=pitch,
-                time=time,
-                duration=duration,
-                velocity=velocity,
-                channel=channel
-            )
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Added note to song: {song_name}"}
-            )
-        
-        elif mcp_request.method == "add_chord":
-            song_name = mcp_request.params.get("name")
-            notes = mcp_request.params.get("notes")
-            time = mcp_request.params.get("time")
-            duration = mcp_request.params.get("duration")
-            velocity = mcp_request.params.get("velocity", 64)
-            channel = mcp_request.params.get("channel", 0)
-            
-            if not song_name:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32602,
-                        "message": "Required parameter 'name' missing"
-                    }
-                )
-            
-            song = song_manager.get_song(song_name)
-            if not song:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32602,
-                        "message": f"Song not found: {song_name}"
-                    }
-                )
-            
-            song.add_chord(
-                notes=notes,
-                time=time,
-                duration=duration,
-                velocity=velocity,
-                channel=channel
-            )
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Added chord to song: {song_name}"}
-            )
-        
-        elif mcp_request.method == "add_program_change":
-            song_name = mcp_request.params.get("name")
-            program = mcp_request.params.get("program")
-            time = mcp_request.params.get("time")
-            channel = mcp_request.params.get("channel", 0)
-            
-            if not song_name:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32602,
-                        "message": "Required parameter 'name' missing"
-                    }
-                )
-            
-            song = song_manager.get_song(song_name)
-            if not song:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32602,
-                        "message": f"Song not found: {song_name}"
-                    }
-                )
-            
-            song.add_program_change(
-                program=program,
-                time=time,
-                channel=channel
-            )
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Added program change to song: {song_name}"}
-            )
-        
-        elif mcp_request.method == "play_song":
-            song_name = mcp_request.params.get("name")
-            
-            if not song_name:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32602,
-                        "message": "Required parameter 'name' missing"
-                    }
-                )
-            
-            success = song_manager.play_song(song_name)
-            if not success:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32602,
-                        "message": f"Song not found or could not be played: {song_name}"
-                    }
-                )
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": f"Playing song: {song_name}"}
-            )
-        
-        elif mcp_request.method == "stop_song":
-            success = song_manager.stop_current_song()
-            if not success:
-                return MCPResponse(
-                    id=mcp_request.id,
-                    error={
-                        "code": -32602,
-                        "message": "No song is currently playing"
-                    }
-                )
-            
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"message": "Stopped current song"}
-            )
-        
-        elif mcp_request.method == "list_songs":
-            songs = song_manager.get_all_songs()
-            song_list = [
-                {
-                    "name": name,
-                    "duration": song.duration,
-                    "tempo": song.tempo
-                }
-                for name, song in songs.items()
-            ]
+                return
             
-            return MCPResponse(
-                id=mcp_request.id,
-                result={"songs": song_list}
-            )
+            port.send(msg)
+    
+        song_manager.set_midi_callback(send_midi_callback)
+    
+    song = song_manager.create_scale_song(
+        name=name,
+        root_note=root_note,
+        scale_type=scale_type,
+        octaves=octaves,
+        duration=duration
+    )
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={
+            "message": f"Created scale song: {name}",
+            "song": {
+                "name": song.name,
+                "duration": song.duration
+            }
+        }
+    )
+
+
+def _mcp_add_note(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle add_note"""
+    song_name = mcp_request.params.get("name")
+    pitch = mcp_request.params.get("pitch")
+    time = mcp_request.params.get("time")
+    duration = mcp_request.params.get("duration")
+    velocity = mcp_request.params.get("velocity", 64)
+    channel = mcp_request.params.get("channel", 0)
+    
+    if not song_name:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32602,
+                "message": "Required parameter 'name' missing"
+            }
+        )
+    
+    song = song_manager.get_song(song_name)
+    if not song:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32602,
+                "message": f"Song not found: {song_name}"
+            }
+        )
+    
+    song.add_note(
+        pitch=pitch,
+        time=time,
+        duration=duration,
+        velocity=velocity,
+        channel=channel
+    )
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Added note to song: {song_name}"}
+    )
+
+
+def _mcp_add_chord(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle add_chord"""
+    song_name = mcp_request.params.get("name")
+    notes = mcp_request.params.get("notes")
+    time = mcp_request.params.get("time")
+    duration = mcp_request.params.get("duration")
+    velocity = mcp_request.params.get("velocity", 64)
+    channel = mcp_request.params.get("channel", 0)
+    
+    if not song_name:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32602,
+                "message": "Required parameter 'name' missing"
+            }
+        )
+    
+    song = song_manager.get_song(song_name)
+    if not song:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32602,
+                "message": f"Song not found: {song_name}"
+            }
+        )
+    
+    song.add_chord(
+        notes=notes,
+        time=time,
+        duration=duration,
+        velocity=velocity,
+        channel=channel
+    )
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Added chord to song: {song_name}"}
+    )
+
+
+def _mcp_add_program_change(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle add_program_change"""
+    song_name = mcp_request.params.get("name")
+    program = mcp_request.params.get("program")
+    time = mcp_request.params.get("time")
+    channel = mcp_request.params.get("channel", 0)
+    
+    if not song_name:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32602,
+                "message": "Required parameter 'name' missing"
+            }
+        )
+    
+    song = song_manager.get_song(song_name)
+    if not song:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32602,
+                "message": f"Song not found: {song_name}"
+            }
+        )
+    
+    song.add_program_change(
+        program=program,
+        time=time,
+        channel=channel
+    )
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Added program change to song: {song_name}"}
+    )
+
+
+def _mcp_play_song(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle play_song"""
+    song_name = mcp_request.params.get("name")
+    
+    if not song_name:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32602,
+                "message": "Required parameter 'name' missing"
+            }
+        )
+    
+    success = song_manager.play_song(song_name)
+    if not success:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32602,
+                "message": f"Song not found or could not be played: {song_name}"
+            }
+        )
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": f"Playing song: {song_name}"}
+    )
+
+
+def _mcp_stop_song(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle stop_song"""
+    success = song_manager.stop_current_song()
+    if not success:
+        return MCPResponse(
+            id=mcp_request.id,
+            error={
+                "code": -32602,
+                "message": "No song is currently playing"
+            }
+        )
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"message": "Stopped current song"}
+    )
+
+
+def _mcp_list_songs(mcp_request: MCPRequest) -> MCPResponse:
+    """Handle list_songs"""
+    songs = song_manager.get_all_songs()
+    song_list = [
+        {
+            "name": name,
+            "duration": song.duration,
+            "tempo": song.tempo
+        }
+        for name, song in songs.items()
+    ]
+    
+    return MCPResponse(
+        id=mcp_request.id,
+        result={"songs": song_list}
+    )
+
+
+# MCP method name -> handler
+_MCP_HANDLERS = {
+    "midi.discover": _mcp_midi_discover,
+    "midi.connect": _mcp_midi_connect,
+    "midi.note_on": _mcp_midi_note_on,
+    "midi.note_off": _mcp_midi_note_off,
+    "midi.chord_on": _mcp_midi_chord_on,
+    "midi.chord_off": _mcp_midi_chord_off,
+    "midi.program_change": _mcp_midi_program_change,
+    "midi.control_change": _mcp_midi_control_change,
+    "midi.all_notes_off": _mcp_midi_all_notes_off,
+    "midi.schedule": _mcp_midi_schedule,
+    "midi.load_file": _mcp_midi_load_file,
+    "midi.load_content": _mcp_midi_load_content,
+    "midi.list_files": _mcp_midi_list_files,
+    "midi.play_file": _mcp_midi_play_file,
+    "midi.stop_file": _mcp_midi_stop_file,
+    "midi.convert_to_song": _mcp_midi_convert_to_song,
+    "create_song": _mcp_create_song,
+    "create_scale": _mcp_create_scale,
+    "add_note": _mcp_add_note,
+    "add_chord": _mcp_add_chord,
+    "add_program_change": _mcp_add_program_change,
+    "play_song": _mcp_play_song,
+    "stop_song": _mcp_stop_song,
+    "list_songs": _mcp_list_songs,
+}
+
+async def _process_mcp_request(data: Dict[str, Any]) -> MCPResponse:
+    """Process a single MCP request"""
+    mcp_request = None
+    try:
+        mcp_request = MCPRequest(**data)
         
-        else:
+        handler = _MCP_HANDLERS.get(mcp_request.method)
+        if handler is None:
             return MCPResponse(
                 id=mcp_request.id,
                 error={
@@ -1250,6 +1577,8 @@ async def mcp_endpoint(request: Request):
                     "message": f"Method not found: {mcp_request.method}"
                 }
             )
+        
+        return handler(mcp_request)
     
     except Exception as e:
         logger.error(f"Error processing MCP request: {e}")
@@ -1263,64 +1592,97 @@ async def mcp_endpoint(request: Request):
 
 
 # WebSocket implementation for real-time MIDI control
+
+async def _handle_ws_midi(midi_data: Dict[str, Any]) -> Optional[str]:
+    """Run one WebSocket MIDI command, returning its command type"""
+    cmd_type = midi_data.get("command")
+    
+    if cmd_type == "note_on":
+        await send_note_on(
+            MidiNoteOn(**midi_data["params"]),
+            midi_data.get("port_id", 0)
+        )
+    
+    elif cmd_type == "note_off":
+        await send_note_off(
+            MidiNoteOff(**midi_data["params"]),
+            midi_data.get("port_id", 0)
+        )
+    
+    elif cmd_type == "control_change":
+        await send_control_change(
+            MidiControlChange(**midi_data["params"]),
+            midi_data.get("port_id", 0)
+        )
+    
+    elif cmd_type == "program_change":
+        await send_program_change(
+            MidiProgramChange(**midi_data["params"]),
+            midi_data.get("port_id", 0)
+        )
+    
+    elif cmd_type == "load_file":
+        await load_midi_file(
+            LoadMidiRequest(**midi_data["params"])
+        )
+    
+    elif cmd_type == "play_file":
+        await play_midi_file(
+            PlayMidiRequest(**midi_data["params"])
+        )
+    
+    elif cmd_type == "stop_file":
+        await stop_midi_file()
+    
+    return cmd_type
+
+
+async def _send_ws_json(websocket: WebSocket, data: Dict[str, Any]) -> None:
+    """Send a JSON message, encoded with orjson when it is installed"""
+    if orjson is not None:
+        await websocket.send_text(orjson.dumps(data).decode("utf-8"))
+    else:
+        await websocket.send_json(data)
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    """Run MIDI commands sent over a WebSocket
+    
+    Each {"type": "midi", "data": {...}} message gets its own response. A
+    {"type": "midi_batch", "data": [...]} message runs its commands in
+    order and gets one response for all of them, so a client streaming
+    notes can send several per message.
+    """
     await websocket.accept()
     try:
         while True:
             data = await websocket.receive_text()
             try:
-                command = json.loads(data)
+                command = orjson.loads(data) if orjson is not None else json.loads(data)
                 
                 if command["type"] == "midi":
-                    midi_data = command["data"]
-                    cmd_type = midi_data.get("command")
+                    cmd_type = await _handle_ws_midi(command["data"])
                     
-                    if cmd_type == "note_on":
-                        await send_note_on(
-                            MidiNoteOn(**midi_data["params"]),
-                            midi_data.get("port_id", 0)
-                        )
-                    
-                    elif cmd_type == "note_off":
-                        await send_note_off(
-                            MidiNoteOff(**midi_data["params"]),
-                            midi_data.get("port_id", 0)
-                        )
-                    
-                    elif cmd_type == "control_change":
-                        await send_control_change(
-                            MidiControlChange(**midi_data["params"]),
-                            midi_data.get("port_id", 0)
-                        )
-                    
-                    elif cmd_type == "program_change":
-                        await send_program_change(
-                            MidiProgramChange(**midi_data["params"]),
-                            midi_data.get("port_id", 0)
-                        )
-                    
-                    elif cmd_type == "load_file":
-                        await load_midi_file(
-                            LoadMidiRequest(**midi_data["params"])
-                        )
-                    
-                    elif cmd_type == "play_file":
-                        await play_midi_file(
-                            PlayMidiRequest(**midi_data["params"])
-                        )
-                    
-                    elif cmd_type == "stop_file":
-                        await stop_midi_file()
-                    
-                    await websocket.send_json({
+                    await _send_ws_json(websocket, {
                         "type": "response",
                         "status": "success",
                         "message": f"Processed {cmd_type}"
                     })
                 
+                elif command["type"] == "midi_batch":
+                    batch = command["data"]
+                    for midi_data in batch:
+                        await _handle_ws_midi(midi_data)
+                    
+                    await _send_ws_json(websocket, {
+                        "type": "response",
+                        "status": "success",
+                        "message": f"Processed {len(batch)} commands"
+                    })
+                
                 else:
-                    await websocket.send_json({
+                    await _send_ws_json(websocket, {
                         "type": "response",
                         "status": "error",
                         "message": f"Unknown command type: {command['type']}"
@@ -1328,7 +1690,7 @@ async def websocket_endpoint(websocket: WebSocket):
             
             except Exception as e:
                 logger.error(f"Error processing WebSocket message: {e}")
-                await websocket.send_json({
+                await _send_ws_json(websocket, {
                     "type": "response",
                     "status": "error",
                     "message": str(e)
@@ -1344,12 +1706,16 @@ def main():
     parser.add_argument("--host", default="127.0.0.1", help="Host to bind to")
     parser.add_argument("--port", type=int, default=8080, help="Port to bind to")
     parser.add_argument("--debug", action="store_true", help="Enable debug mode")
+    parser.add_argument("--safe", action="store_true", help="Send through mido ports, which check and copy every message")
     
     args = parser.parse_args()
     
     if args.debug:
         logger.setLevel(logging.DEBUG)
     
+    global use_mido_ports
+    use_mido_ports = args.safe
+    
     # Run the server
     uvicorn.run(app, host=args.host, port=args.port)
 
@@ -86,16 +86,16 @@ class TestClaudeClient(unittest.TestCase):
         
         self.assertEqual(len(commands), 0)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_send_mcp_request(self, mock_post):
         """Test sending an MCP request"""
         # Mock the response
         mock_response = MagicMock()
-        mock_response.json.return_value = {
+        mock_response.content = json.dumps({
             "jsonrpc": "2.0",
             "id": "claude-1",
             "result": {"message": "Note on: 60, velocity: 100"}
-        }
+        }).encode("utf-8")
         mock_post.return_value = mock_response
         
         # Send the request
@@ -112,17 +112,49 @@ class TestClaudeClient(unittest.TestCase):
         mock_post.assert_called_once()
         args, kwargs = mock_post.call_args
         self.assertEqual(args[0], "http://localhost:8080/mcp")
-        self.assertEqual(kwargs["json"]["method"], "midi.note_on")
+        self.assertEqual(json.loads(kwargs["data"])["method"], "midi.note_on")
+    
+    @patch('requests.Session.post')
+    def test_send_mcp_batch(self, mock_post):
+        """Test sending a batch of MCP requests"""
+        # Mock the response, deliberately out of order
+        mock_response = MagicMock()
+        mock_response.content = json.dumps([
+            {"jsonrpc": "2.0", "id": "claude-2", "result": {"message": "Note off: 60"}},
+            {"jsonrpc": "2.0", "id": "claude-1", "result": {"message": "Note on: 60, velocity: 100"}}
+        ]).encode("utf-8")
+        mock_post.return_value = mock_response
+        
+        # Send the batch
+        results = self.client.send_mcp_batch([
+            ("midi.note_on", {"note": 60, "velocity": 100, "channel": 0}),
+            ("midi.note_off", {"note": 60, "channel": 0})
+        ])
+        
+        # Check that the results are matched back to their requests
+        self.assertEqual(results[0]["result"]["message"], "Note on: 60, velocity: 100")
+        self.assertEqual(results[1]["result"]["message"], "Note off: 60")
+        
+        # Check that a single post was made with a JSON-RPC batch array
+        mock_post.assert_called_once()
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args[0], "http://localhost:8080/mcp")
+        batch = json.loads(kwargs["data"])
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(batch[0]["method"], "midi.note_on")
+        self.assertEqual(batch[1]["method"], "midi.note_off")
     
-    @patch.object(ClaudeClient, 'send_mcp_request')
-    def test_process_claude_response(self, mock_send_mcp_request):
+    @patch.object(ClaudeClient, 'send_mcp_batch')
+    def test_process_claude_response(self, mock_send_mcp_batch):
         """Test processing a Claude response"""
         # Mock the response
-        mock_send_mcp_request.return_value = {
-            "jsonrpc": "2.0",
-            "id": "claude-1",
-            "result": {"message": "Note on: 60, velocity: 100"}
-        }
+        mock_send_mcp_batch.return_value = [
+            {
+                "jsonrpc": "2.0",
+                "id": "claude-1",
+                "result": {"message": "Note on: 60, velocity: 100"}
+            }
+        ] * 3
         
         # Process the response
         text = """
@@ -158,19 +190,40 @@ class TestClaudeClient(unittest.TestCase):
         
         results = self.client.process_claude_response(text)
         
-        # Check that send_mcp_request was called 3 times
-        self.assertEqual(mock_send_mcp_request.call_count, 3)
+        # Check that all three commands went out in a single batch
+        mock_send_mcp_batch.assert_called_once()
+        self.assertEqual(len(results), 3)
         
         # Check the methods and params
-        calls = mock_send_mcp_request.call_args_list
-        self.assertEqual(calls[0][0][0], "midi.note_on")
-        self.assertEqual(calls[0][0][1]["note"], 60)
+        calls = mock_send_mcp_batch.call_args[0][0]
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(calls[0][0], "midi.note_on")
+        self.assertEqual(calls[0][1]["note"], 60)
+        
+        self.assertEqual(calls[1][0], "midi.note_on")
+        self.assertEqual(calls[1][1]["note"], 64)
         
-        self.assertEqual(calls[1][0][0], "midi.note_on")
-        self.assertEqual(calls[1][0][1]["note"], 64)
+        self.assertEqual(calls[2][0], "midi.note_on")
+        self.assertEqual(calls[2][1]["note"], 67)
+    
+    @patch('src.claude_client.MIDI_BATCH_SIZE', 2)
+    @patch.object(ClaudeClient, 'send_mcp_batch')
+    def test_process_claude_response_flushes_batches(self, mock_send_mcp_batch):
+        """Test that long responses are sent in batches of MIDI_BATCH_SIZE"""
+        mock_send_mcp_batch.side_effect = lambda calls: [{"result": {}}] * len(calls)
+        
+        text = "".join(
+            f'```midi\n{{"type": "note_on", "note": {note}}}\n```\n'
+            for note in (60, 62, 64)
+        )
+        
+        results = self.client.process_claude_response(text)
         
-        self.assertEqual(calls[2][0][0], "midi.note_on")
-        self.assertEqual(calls[2][0][1]["note"], 67)
+        # Three commands with a batch size of 2: one full batch, then the rest
+        self.assertEqual(len(results), 3)
+        batches = [call[0][0] for call in mock_send_mcp_batch.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(batches[1][0][1]["note"], 64)
 
 
 if __name__ == "__main__":
@@ -2,12 +2,17 @@
 Tests for the MCP MIDI server
 """
 import json
+import os
+import tempfile
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
 from fastapi.testclient import TestClient
 
-from src.server import app
+import src.server as server
+from mcp_midi.all_notes_off import active_notes
+from src.server import active_ports, app, midi_file_player, scheduled_events
 
 
 class TestMCPServer(unittest.TestCase):
@@ -16,6 +21,12 @@ class TestMCPServer(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures"""
         self.client = TestClient(app)
+        # Ports opened by earlier tests are cached; start each test without them
+        active_ports.clear()
+        # Scheduler state is bound to the event loop of the client that created it
+        scheduled_events.clear()
+        server.scheduler_task = None
+        server.schedule_wakeup = None
     
     @patch('mido.open_output')
     @patch('rtmidi.MidiOut')
@@ -75,6 +86,32 @@ class TestMCPServer(unittest.TestCase):
         # Check the response
         self.assertEqual(response.status_code, 200)
         
+        # Check that the note_on bytes were sent straight to rtmidi
+        mock_instance.send_message.assert_called_once_with([0x90, 60, 100])
+        mock_open_output.assert_not_called()
+    
+    @patch('src.server.use_mido_ports', True)
+    @patch('mido.open_output')
+    @patch('rtmidi.MidiOut')
+    def test_note_on_safe_ports(self, mock_midi_out, mock_open_output):
+        """Test sending a note_on message through a mido port (--safe)"""
+        # Mock the MidiOut.get_ports() method
+        mock_instance = mock_midi_out.return_value
+        mock_instance.get_ports.return_value = ["Test MIDI Port"]
+        
+        # Mock the open_output function
+        mock_port = MagicMock()
+        mock_open_output.return_value = mock_port
+        
+        # Make the request
+        response = self.client.post(
+            "/midi/note_on",
+            json={"note": 60, "velocity": 100, "channel": 0}
+        )
+        
+        # Check the response
+        self.assertEqual(response.status_code, 200)
+        
         # Check that the port.send method was called
         mock_port.send.assert_called_once()
         args = mock_port.send.call_args[0]
@@ -116,14 +153,187 @@ class TestMCPServer(unittest.TestCase):
         self.assertEqual(data["id"], "test-1")
         self.assertIn("result", data)
         
-        # Check that the port.send method was called
-        mock_port.send.assert_called_once()
-        args = mock_port.send.call_args[0]
-        self.assertEqual(args[0].type, "note_on")
-        self.assertEqual(args[0].note, 60)
-        self.assertEqual(args[0].velocity, 100)
-        self.assertEqual(args[0].channel, 0)
+        # Check that the note_on bytes were sent straight to rtmidi
+        mock_instance.send_message.assert_called_once_with([0x90, 60, 100])
+        mock_open_output.assert_not_called()
 
+    
+    @patch('mido.open_output')
+    @patch('rtmidi.MidiOut')
+    def test_mcp_endpoint_batch(self, mock_midi_out, mock_open_output):
+        """Test the MCP endpoint with a JSON-RPC batch"""
+        # Mock the MidiOut.get_ports() method
+        mock_instance = mock_midi_out.return_value
+        mock_instance.get_ports.return_value = ["Test MIDI Port"]
+        
+        # Mock the open_output function
+        mock_port = MagicMock()
+        mock_open_output.return_value = mock_port
+        
+        # Make the request
+        response = self.client.post(
+            "/mcp",
+            json=[
+                {
+                    "jsonrpc": "2.0",
+                    "id": "test-1",
+                    "method": "midi.note_on",
+                    "params": {"note": 60, "velocity": 100, "channel": 0}
+                },
+                {
+                    "jsonrpc": "2.0",
+                    "id": "test-2",
+                    "method": "midi.note_off",
+                    "params": {"note": 60, "channel": 0}
+                }
+            ]
+        )
+        
+        # Check the response
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]["id"], "test-1")
+        self.assertEqual(data[1]["id"], "test-2")
+        
+        # Check that both messages were sent
+        self.assertEqual(mock_instance.send_message.call_count, 2)
+        args = mock_instance.send_message.call_args_list
+        self.assertEqual(args[0][0][0], [0x90, 60, 100])
+        self.assertEqual(args[1][0][0], [0x80, 60, 0])
+    
+    def _write_midi(self, data):
+        """Write MIDI bytes to a temporary .mid file and return its path"""
+        fd, path = tempfile.mkstemp(suffix=".mid")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self.addCleanup(os.remove, path)
+        return path
+    
+    def test_load_midi_file(self):
+        """Test loading a MIDI file by path under its default name"""
+        # Format 0, one track holding a single note
+        track = b'\x00\x90\x3c\x40\x60\x80\x3c\x00\x00\xff\x2f\x00'
+        path = self._write_midi(
+            b'MThd\x00\x00\x00\x06\x00\x00\x00\x01\x01\xe0'
+            + b'MTrk' + len(track).to_bytes(4, 'big') + track
+        )
+        
+        response = self.client.post("/midi/load_file", json={"path": path})
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["info"]["tracks"], 1)
+        self.assertEqual(data["info"]["ticks_per_beat"], 480)
+    
+    def test_load_corrupt_midi_file(self):
+        """Test that a file with a MIDI header but a broken body fails to load"""
+        path = self._write_midi(b'MThd\x00\x00\x00\x06\x00\x01\x00\x02\x01\xe0MTrk\xff')
+        name = os.path.splitext(os.path.basename(path))[0]
+        
+        response = self.client.post("/midi/load_file", json={"path": path})
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Failed to load MIDI file", response.json()["error"])
+        self.assertNotIn(name, midi_file_player.list_files())
+    
+    def _schedule(self, client, events):
+        """Post a midi.schedule request and return the response body"""
+        response = client.post(
+            "/mcp",
+            json={
+                "jsonrpc": "2.0",
+                "id": "schedule-1",
+                "method": "midi.schedule",
+                "params": {"events": events}
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def _wait_for_schedule(self):
+        """Wait for the scheduler to send every queued event"""
+        deadline = time.monotonic() + 2.0
+        while scheduled_events and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+    
+    @patch('rtmidi.MidiOut')
+    def test_mcp_schedule_order(self, mock_midi_out):
+        """Test that scheduled events are sent in time order"""
+        mock_instance = mock_midi_out.return_value
+        mock_instance.get_ports.return_value = ["Test MIDI Port"]
+        
+        # The scheduler runs on the app's event loop, which the context keeps alive
+        with TestClient(app) as client:
+            data = self._schedule(client, [
+                {"t": 0.1, "type": "note_off", "note": 60},
+                {"t": 0.0, "type": "note_on", "note": 60, "velocity": 100},
+                {"t": 0.05, "type": "control_change", "control": 7, "value": 90},
+            ])
+            self.assertEqual(data["result"]["message"], "Scheduled 3 MIDI events")
+            self._wait_for_schedule()
+        
+        sent = [call[0][0] for call in mock_instance.send_message.call_args_list]
+        self.assertEqual(sent, [[0x90, 60, 100], [0xB0, 7, 90], [0x80, 60, 0]])
+    
+    @patch('rtmidi.MidiOut')
+    def test_mcp_schedule_unknown_type(self, mock_midi_out):
+        """Test that an unknown event type rejects the whole request"""
+        mock_midi_out.return_value.get_ports.return_value = ["Test MIDI Port"]
+        
+        with TestClient(app) as client:
+            data = self._schedule(client, [
+                {"type": "note_on", "note": 60},
+                {"type": "bogus"},
+            ])
+        
+        self.assertIn("Unsupported event type: bogus", data["error"]["message"])
+        self.assertEqual(scheduled_events, [])
+    
+    @patch('rtmidi.MidiOut')
+    def test_mcp_schedule_missing_note(self, mock_midi_out):
+        """Test that a note event without a note rejects the whole request"""
+        mock_midi_out.return_value.get_ports.return_value = ["Test MIDI Port"]
+        
+        with TestClient(app) as client:
+            data = self._schedule(client, [
+                {"type": "note_on", "note": 60},
+                {"t": 0.5, "type": "note_off"},
+            ])
+        
+        self.assertIn("missing 'note'", data["error"]["message"])
+        self.assertEqual(scheduled_events, [])
+    
+    @patch('rtmidi.MidiOut')
+    def test_mcp_schedule_out_of_range(self, mock_midi_out):
+        """Test that an out of range value rejects the whole request"""
+        mock_midi_out.return_value.get_ports.return_value = ["Test MIDI Port"]
+        
+        with TestClient(app) as client:
+            data = self._schedule(client, [
+                {"type": "note_on", "note": 60, "channel": 3},
+                {"type": "note_on", "note": 200},
+            ])
+        
+        self.assertIn("note must be an integer from 0 to 127", data["error"]["message"])
+        self.assertEqual(scheduled_events, [])
+    
+    @patch('rtmidi.MidiOut')
+    def test_mcp_schedule_failed_send_not_registered(self, mock_midi_out):
+        """Test that a note that fails to send isn't tracked as sounding"""
+        mock_instance = mock_midi_out.return_value
+        mock_instance.get_ports.return_value = ["Test MIDI Port"]
+        mock_instance.send_message.side_effect = OSError("port closed")
+        active_notes[3] = 0
+        
+        with TestClient(app) as client:
+            data = self._schedule(client, [{"type": "note_on", "note": 60, "channel": 3}])
+            self.assertEqual(data["result"]["message"], "Scheduled 1 MIDI events")
+            self._wait_for_schedule()
+        
+        mock_instance.send_message.assert_called_once()
+        self.assertEqual(active_notes[3], 0)
 
 if __name__ == "__main__":
     unittest.main()
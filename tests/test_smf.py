@@ -0,0 +1,142 @@
+"""
+Tests for the Standard MIDI File reader
+"""
+import io
+import unittest
+
+import mido
+
+from mcp_midi.smf import read_smf
+
+# Message types read_smf keeps
+KEPT_TYPES = ("note_on", "note_off", "control_change", "program_change")
+
+
+def mido_events(data):
+    """Read a file with mido into the same shape read_smf returns"""
+    midi_file = mido.MidiFile(file=io.BytesIO(data))
+    tracks = []
+    tempo_changes = []
+    for track in midi_file.tracks:
+        events = []
+        tick = 0
+        for msg in track:
+            tick += msg.time
+            if msg.type == "set_tempo":
+                tempo_changes.append((tick, msg.tempo))
+            elif msg.type in KEPT_TYPES:
+                status, data1, *rest = msg.bytes()
+                events.append((tick, status, data1, rest[0] if rest else 0))
+        tracks.append(events)
+    return midi_file.ticks_per_beat, tracks, tempo_changes
+
+
+def save(midi_file):
+    """Get a mido MidiFile's bytes"""
+    buffer = io.BytesIO()
+    midi_file.save(file=buffer)
+    return buffer.getvalue()
+
+
+class TestReadSMF(unittest.TestCase):
+    """Test cases for read_smf"""
+    
+    def test_running_status(self):
+        """Test a track that relies on running status"""
+        midi_file = mido.MidiFile(ticks_per_beat=96)
+        track = mido.MidiTrack()
+        track.append(mido.Message("program_change", program=5, time=0))
+        for note in (60, 62, 64):
+            # Consecutive note_ons, and note_offs written as note_on velocity 0,
+            # share one status byte
+            track.append(mido.Message("note_on", note=note, velocity=90, time=0))
+            track.append(mido.Message("note_on", note=note, velocity=0, time=48))
+        # Channel pressure and pitch bend aren't kept, but their data bytes
+        # must still be skipped
+        track.append(mido.Message("aftertouch", value=30, time=10))
+        track.append(mido.Message("aftertouch", value=20, time=10))
+        track.append(mido.Message("pitchwheel", pitch=1000, time=10))
+        track.append(mido.Message("control_change", control=7, value=100, channel=3, time=300))
+        track.append(mido.Message("control_change", control=10, value=64, channel=3, time=0))
+        midi_file.tracks.append(track)
+        data = save(midi_file)
+        
+        # The file really is written with running status
+        self.assertLess(len(data), 14 + 8 + 4 * len(track))
+        self.assertEqual(read_smf(data), mido_events(data))
+    
+    def test_tempo_changes(self):
+        """Test tempo changes across the tracks of a format 1 file"""
+        midi_file = mido.MidiFile(type=1, ticks_per_beat=480)
+        
+        conductor = mido.MidiTrack()
+        conductor.append(mido.MetaMessage("track_name", name="Conductor", time=0))
+        conductor.append(mido.MetaMessage("set_tempo", tempo=500000, time=0))
+        conductor.append(mido.MetaMessage("set_tempo", tempo=400000, time=1920))
+        conductor.append(mido.MetaMessage("time_signature", numerator=3, denominator=4, time=0))
+        conductor.append(mido.MetaMessage("set_tempo", tempo=600000, time=960))
+        midi_file.tracks.append(conductor)
+        
+        melody = mido.MidiTrack()
+        for note in range(60, 72):
+            melody.append(mido.Message("note_on", note=note, velocity=100, time=0))
+            melody.append(mido.Message("note_off", note=note, velocity=64, time=240))
+        # A second tempo change in another track, after a long delta (a
+        # multi-byte variable-length quantity)
+        melody.append(mido.MetaMessage("set_tempo", tempo=250000, time=20000))
+        midi_file.tracks.append(melody)
+        
+        data = save(midi_file)
+        ticks_per_beat, tracks, tempo_changes = read_smf(data)
+        
+        self.assertEqual((ticks_per_beat, tracks, tempo_changes), mido_events(data))
+        self.assertEqual(
+            tempo_changes,
+            [(0, 500000), (1920, 400000), (2880, 600000), (22880, 250000)]
+        )
+    
+    def test_sysex_and_unknown_chunks(self):
+        """Test that sysex messages and unknown chunks are skipped"""
+        midi_file = mido.MidiFile(type=1, ticks_per_beat=120)
+        for channel in (0, 1):
+            track = mido.MidiTrack()
+            # A sysex message, with a multi-byte length, breaks running status
+            track.append(mido.Message("note_on", note=60, channel=channel, time=0))
+            track.append(mido.Message("sysex", data=[i % 128 for i in range(200)], time=5))
+            track.append(mido.Message("note_on", note=64, channel=channel, time=5))
+            track.append(mido.Message("note_off", note=60, channel=channel, time=60))
+            midi_file.tracks.append(track)
+        data = save(midi_file)
+        
+        # Insert an unknown chunk after the header, and another between tracks
+        header_end = 14
+        first_track_end = header_end + 8 + int.from_bytes(data[18:22], "big")
+        unknown = b"XFIH" + (5).to_bytes(4, "big") + b"\x01\x02\x03\x04\x05"
+        with_chunks = (
+            data[:header_end] + unknown
+            + data[header_end:first_track_end] + unknown
+            + data[first_track_end:]
+        )
+        
+        # mido doesn't skip unknown chunks, so compare with the file without them
+        self.assertEqual(read_smf(with_chunks), mido_events(data))
+        self.assertEqual(len(read_smf(with_chunks)[1]), 2)
+    
+    def test_missing_header(self):
+        """Test that data without an MThd header is rejected"""
+        with self.assertRaises(ValueError):
+            read_smf(b"RIFF\x00\x00\x00\x06\x00\x00\x00\x01\x00\x60")
+    
+    def test_running_status_without_status(self):
+        """Test that a data byte with no previous status byte is rejected"""
+        track = b"\x00\x3c\x40"
+        data = (
+            b"MThd" + (6).to_bytes(4, "big") + b"\x00\x00\x00\x01\x00\x60"
+            + b"MTrk" + len(track).to_bytes(4, "big") + track
+        )
+        with self.assertRaises(ValueError):
+            read_smf(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Tests for the tracker parser
+"""
+import unittest
+
+from mcp_midi.song.manager import SongManager
+from mcp_midi.song.song import Note, ProgramChange
+from mcp_midi.tracker_parser import create_midi_song
+
+TRACKER_CONTENT = """TITLE: Test Song
+TEMPO: 120
+SPEED: 4
+INSTRUMENT 0: 1
+INSTRUMENT 1: 33
+
+|Ch1      |Ch2      |
+|---------|---------|
+|C-4 00 40|.....    |
+|.....    |E-3 01 20|
+|G-4 00 32|C-3 01 ..|
+"""
+
+
+class TestCreateMidiSong(unittest.TestCase):
+    """Test cases for create_midi_song"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.song_manager = SongManager()
+    
+    def test_create_midi_song(self):
+        """Test creating a song from tracker content"""
+        result = create_midi_song(self.song_manager, "test", TRACKER_CONTENT)
+        
+        self.assertEqual(result["status"], "success", result["message"])
+        self.assertEqual(result["song_data"], {
+            "name": "test",
+            "title": "Test Song",
+            "tempo": 120,
+            "channels": 2,
+            "notes": 4
+        })
+        
+        # The song is registered with the manager, one row lasting 0.125s
+        song = self.song_manager.get_song("test")
+        self.assertIsNotNone(song)
+        self.assertEqual(song.tempo, 120)
+        self.assertEqual(song.events, [
+            ProgramChange(0.0, 0.0, 0, 1),
+            ProgramChange(0.0, 0.0, 1, 33),
+            Note(0.0, 0.125, 0, 60, 80),
+            Note(0.125, 0.125, 1, 52, 40),
+            Note(0.25, 0.125, 0, 67, 64),
+            Note(0.25, 0.125, 1, 48, 127),
+        ])
+    
+    def test_create_midi_song_duplicate_name(self):
+        """Test that a second song with the same name is renamed"""
+        create_midi_song(self.song_manager, "test", TRACKER_CONTENT)
+        result = create_midi_song(self.song_manager, "test", TRACKER_CONTENT)
+        
+        self.assertEqual(result["status"], "success", result["message"])
+        self.assertEqual(result["song_data"]["name"], "test_1")
+        self.assertEqual(sorted(self.song_manager.get_all_songs()), ["test", "test_1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
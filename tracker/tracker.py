@@ -3,7 +3,7 @@ A simple module to parse and play tracker files with MCP-MIDI.
 """
 
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Tuple, Union, Any
+from typing import Iterable, List, Dict, Optional, Tuple, Union, Any
 import re
 
 
@@ -74,9 +74,15 @@ def note_to_midi(note: str, octave: int) -> int:
     return None
 
 
-def parse_tracker_file(file_content: str) -> TrackerSong:
-    """Parse a simple tracker file format."""
-    lines = file_content.strip().split('\n')
+def parse_tracker_file(file_content: Union[str, Iterable[str]]) -> TrackerSong:
+    """Parse a simple tracker file format.
+    
+    Accepts the file content as a string, or any iterable of lines (such as
+    an open file), which is consumed one line at a time.
+    """
+    if isinstance(file_content, str):
+        file_content = file_content.strip().split('\n')
+    lines = iter(file_content)
     
     # Extract header information
     title = "Untitled"
@@ -84,11 +90,14 @@ def parse_tracker_file(file_content: str) -> TrackerSong:
     speed = 6
     instruments = {}
     
-    line_index = 0
-    
-    # Parse header
-    while line_index < len(lines) and not lines[line_index].startswith('|'):
-        line = lines[line_index].strip()
+    # Parse header, up to the first pattern line
+    header_line = None
+    for line in lines:
+        if line.startswith('|'):
+            header_line = line
+            break
+        
+        line = line.strip()
         if line.startswith('TITLE:'):
             title = line[6:].strip()
         elif line.startswith('TEMPO:'):
@@ -110,36 +119,33 @@ def parse_tracker_file(file_content: str) -> TrackerSong:
                 instruments[instr_num] = instr_name
             except ValueError:
                 pass
-        line_index += 1
-    
-    # Skip any blank lines before pattern
-    while line_index < len(lines) and not lines[line_index].startswith('|'):
-        line_index += 1
     
-    if line_index >= len(lines):
+    if header_line is None:
         return TrackerSong(title=title, initial_tempo=tempo, initial_speed=speed, instruments=instruments)
     
     # Parse the channel headers to determine number of channels
-    header_line = lines[line_index]
     channel_headers = [h.strip() for h in header_line.split('|')[1:-1]]
     num_channels = len(channel_headers)
     
-    # Skip separator line if present
-    line_index += 1
-    if line_index < len(lines) and lines[line_index].startswith('|---'):
-        line_index += 1
-    
     # Parse pattern data
     pattern_data = []
     row_index = 0
+    first_line = True
     
-    while line_index < len(lines) and lines[line_index].startswith('|'):
-        line = lines[line_index]
+    for line in lines:
+        if not line.startswith('|'):
+            break
+        
+        # Skip separator line if present
+        if first_line:
+            first_line = False
+            if line.startswith('|---'):
+                continue
+        
         cells = [cell.strip() for cell in line.split('|')[1:-1]]
         
         # If this is a row indicator line
         if len(cells) > 0 and all(c.strip() == '' for c in cells):
-            line_index += 1
             continue
         
         # Create a new row of notes if needed
@@ -180,7 +186,6 @@ def parse_tracker_file(file_content: str) -> TrackerSong:
                 pattern_data[row_index][channel_index] = note
         
         row_index += 1
-        line_index += 1
     
     # Create the pattern
     pattern = TrackerPattern(rows=len(pattern_data), channels=num_channels, notes=pattern_data)
@@ -268,12 +273,9 @@ def play_tracker_file(file_path: str) -> str:
     import mcp.midi.core as midi
     import os
     
-    # Read the file content
+    # Parse the tracker file as it is read
     with open(file_path, 'r') as f:
-        content = f.read()
-    
-    # Parse the tracker file
-    song = parse_tracker_file(content)
+        song = parse_tracker_file(f)
     
     # Convert to MIDI
     midi_song_name = os.path.basename(file_path).replace('.', '_')